@@ -15,8 +15,12 @@ setup(
     description="SWORDv3 Client Library",
     license="Apache2",
     classifiers=[],
+    entry_points={
+        'console_scripts': ['sword3 = sword3client.cli:main'],
+    },
     extras_require={
         'docs': ['Sphinx', 'sphinx-autodoc-annotation'],
         'test': ['nose'],
+        'http2': ['httpx[http2]'],
     },
 )
@@ -1,8 +1,31 @@
-from sword3client.models.sword_response import SWORDResponse
-from sword3client.client import SWORD3Client
+import typing
+import importlib
 
-# Make this package the canonical "import from" location
-SWORDResponse.__module__ = __name__
-SWORD3Client.__module__ = __name__
+# The client, and through it requests and the sword3common models, are only imported when first used, so that
+# importing the package (or any of its lightweight modules) is fast
+_LAZY = {
+    "SWORD3Client": "sword3client.client",
+    "SWORDResponse": "sword3client.models.sword_response",
+}
 
-__all__ = ['SWORD3Client', 'SWORDResponse']
\ No newline at end of file
+if typing.TYPE_CHECKING:
+    from sword3client.models.sword_response import SWORDResponse
+    from sword3client.client import SWORD3Client
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError("module {m!r} has no attribute {n!r}".format(m=__name__, n=name))
+    value = getattr(importlib.import_module(module), name)
+    # Make this package the canonical "import from" location
+    value.__module__ = __name__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(_LAZY.keys()))
+
+
+__all__ = ['SWORD3Client', 'SWORDResponse']
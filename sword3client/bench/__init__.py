@@ -0,0 +1,4 @@
+from sword3client.bench.server import BenchServer
+from sword3client.bench.suite import run_suite, Scenario
+
+__all__ = ['BenchServer', 'run_suite', 'Scenario']
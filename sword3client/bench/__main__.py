@@ -0,0 +1,77 @@
+"""Benchmark the client against a local stand-in SWORD server.
+
+    python -m sword3client.bench --output results.json
+
+With the ``memory`` transport the server is called in-process, with no HTTP at all.
+"""
+from sword3client import SWORD3Client
+from sword3client.bench.server import BenchServer
+from sword3client.bench.suite import run_suite, MB
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+
+import sys
+import contextlib
+import json
+import argparse
+
+
+@contextlib.contextmanager
+def _transport(name):
+    """The HttpLayer for the named transport, and the service URL of a server for it to talk to"""
+    if name == "memory":
+        server = SWORDServer()
+        yield MemoryHttpLayer(server), server.service_url
+    elif name == "requests":
+        from sword3client.connection.connection_requests import RequestsHttpLayer
+        with BenchServer() as server:
+            yield RequestsHttpLayer(), server.service_url
+    else:
+        raise ValueError("Unknown transport {x}".format(x=name))
+
+
+TRANSPORTS = ["requests", "memory"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sword3client.bench", description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="iterations of each small operation")
+    parser.add_argument("--large-iterations", type=int, default=3, help="iterations of each large transfer")
+    parser.add_argument("--large-mb", type=int, default=32, help="size of the large transfers, in MB")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="threads making requests at once")
+    parser.add_argument("-t", "--transport", choices=TRANSPORTS, default="requests")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("scenarios", nargs="*", help="only run these scenarios")
+    args = parser.parse_args(argv)
+
+    def progress(name, result):
+        line = "{n:<48} {o:>10.1f} ops/s  p50 {p50:>8.2f}ms  p95 {p95:>8.2f}ms  p99 {p99:>8.2f}ms".format(
+            n=name, o=result["ops_per_sec"], p50=result["p50_ms"], p95=result["p95_ms"], p99=result["p99_ms"]
+        )
+        if "mb_per_sec" in result:
+            line += "  {m:>8.1f} MB/s".format(m=result["mb_per_sec"])
+        print(line, file=sys.stderr)
+
+    with _transport(args.transport) as (http, service_url):
+        client = SWORD3Client(http=http)
+        results = run_suite(
+            client,
+            service_url,
+            iterations=args.iterations,
+            large_iterations=args.large_iterations,
+            concurrency=args.concurrency,
+            large_size=args.large_mb * MB,
+            only=args.scenarios,
+            transport=args.transport,
+            progress=progress,
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""Micro-benchmark the CPU work the client does around each request, and compare it against a baseline.
+
+    python -m sword3client.bench.micro --save baseline.json
+    python -m sword3client.bench.micro --baseline baseline.json --threshold 10
+
+Exits with status 1 if any benchmark is slower than the baseline by more than the threshold.
+"""
+from sword3client import SWORD3Client, SWORDResponse
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer, MemoryHttpResponse
+from sword3client.lib import jsonstream
+from sword3client.models.link_index import LinkIndex, link_index
+
+from sword3common import Metadata, ByReference, MetadataAndByReference, ContentDisposition, constants, exceptions
+
+import os
+import sys
+import json
+import time
+import typing
+import argparse
+import datetime
+import platform
+import subprocess
+
+DEFAULT_THRESHOLD = 10.0
+
+
+class Micro(object):
+    """One micro-benchmark.  ``setup`` is called once, untimed, and returns the function to be timed, which takes
+    no arguments.  If the benchmark can't be timed by calling a function over and over, ``measure`` is given
+    instead, and called with ``min_time`` and ``repeat`` to produce the result itself"""
+
+    def __init__(
+        self,
+        name: str,
+        setup: typing.Callable[[], typing.Callable[[], typing.Any]] = None,
+        measure: typing.Callable[..., dict] = None,
+    ):
+        self.name = name
+        self.setup = setup
+        self.measure = measure
+
+
+class Regression(object):
+    def __init__(self, name: str, baseline_us: float, current_us: float):
+        self.name = name
+        self.baseline_us = baseline_us
+        self.current_us = current_us
+
+    @property
+    def change_pct(self) -> float:
+        return (self.current_us - self.baseline_us) / self.baseline_us * 100.0
+
+    def __str__(self):
+        return "{n}: {b:.2f}us -> {c:.2f}us ({p:+.1f}%)".format(
+            n=self.name, b=self.baseline_us, c=self.current_us, p=self.change_pct
+        )
+
+
+def _metadata(fields: int) -> Metadata:
+    metadata = Metadata()
+    for i in range(fields):
+        metadata.add_field("ex:field{i}".format(i=i), "Field {i} of a metadata record with many fields".format(i=i))
+    return metadata
+
+
+def _by_reference(files: int) -> ByReference:
+    br = ByReference()
+    for i in range(files):
+        br.add_file(
+            "http://example.com/files/{i}/data.csv".format(i=i), "data-{i}.csv".format(i=i), "text/csv", True,
+            content_length=1024 * i
+        )
+    return br
+
+
+def _mdbr(fields: int, files: int) -> MetadataAndByReference:
+    return MetadataAndByReference(_metadata(fields), _by_reference(files))
+
+
+DIGEST = {constants.DIGEST_SHA_256: "47DEQpj8HBSa+/TImW+5JCeuQeRkm5NMpJWZG3hSuFU="}
+
+
+def _metadata_properties(fields):
+    def setup():
+        client = SWORD3Client(http=MemoryHttpLayer())
+        metadata = _metadata(fields)
+        return lambda: client._metadata_deposit_properties(metadata, None, None, in_progress=False)
+    return setup
+
+
+def _binary_properties():
+    client = SWORD3Client(http=MemoryHttpLayer())
+    disposition = ContentDisposition.binary_upload("a file with spaces.bin")
+    return lambda: client._binary_deposit_properties(
+        None, None, DIGEST, disposition, 1024 * 1024, in_progress=False
+    )
+
+
+def _by_reference_properties(files):
+    def setup():
+        client = SWORD3Client(http=MemoryHttpLayer())
+        br = _by_reference(files)
+        return lambda: client._by_reference_deposit_properties(br, None, in_progress=False)
+    return setup
+
+
+def _mdbr_properties(fields, files):
+    def setup():
+        client = SWORD3Client(http=MemoryHttpLayer())
+        mdbr = _mdbr(fields, files)
+        return lambda: client._mdbr_deposit_properties(mdbr, None, in_progress=False)
+    return setup
+
+
+def _content_disposition():
+    return lambda: ContentDisposition.binary_upload("a file with spaces.bin").serialise()
+
+
+def _digest_header():
+    client = SWORD3Client(http=MemoryHttpLayer())
+    digest = dict(DIGEST)
+    digest[constants.DIGEST_MD5] = "1B2M2Y8AsgTpgAmY7PhCfg=="
+    return lambda: client._make_digest_header(digest)
+
+
+def _raise_for_status_code(with_error_doc):
+    def setup():
+        client = SWORD3Client(http=MemoryHttpLayer())
+        if with_error_doc:
+            server = SWORDServer()
+            resp = MemoryHttpResponse(*server.handle("GET", server.base_url + "/objects/missing", {}, b""))
+        else:
+            resp = MemoryHttpResponse(412, {}, b"")
+
+        def run():
+            try:
+                client._raise_for_status_code(resp, "http://localhost/objects/missing", request_context="object")
+            except exceptions.SwordException:
+                pass
+        return run
+    return setup
+
+
+def _sword_response(files):
+    def setup():
+        server = SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+        location = client.create_object_with_metadata_and_by_reference(
+            server.service_url, _mdbr(20, files)
+        ).location
+        resp = MemoryHttpResponse(*server.handle("GET", location, {}, b""))
+        return lambda: SWORDResponse(resp).status_document
+    return setup
+
+
+def _iter_links(files):
+    def setup():
+        server = SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+        location = client.create_object_with_metadata_and_by_reference(
+            server.service_url, _mdbr(20, files)
+        ).location
+        resp = MemoryHttpResponse(*server.handle("GET", location, {}, b""))
+        return lambda: sum(1 for _ in jsonstream.iter_links(resp.stream, [constants.Rel.FileSetFile]))
+    return setup
+
+
+def import_time(statement: str, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Time ``statement`` (typically an import) in a fresh interpreter, ``repeat`` times, as importing is only
+    slow the first time"""
+    code = "import time; _s = time.perf_counter(); {x}; print(time.perf_counter() - _s)".format(x=statement)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([p for p in sys.path if p] + [env.get("PYTHONPATH", "")])
+    rounds = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], env=env, check=True, stdout=subprocess.PIPE)
+        rounds.append(float(out.stdout.decode("ascii").strip()))
+    rounds.sort()
+    return {
+        "per_call_us": rounds[0] * 1e6,
+        "median_us": rounds[len(rounds) // 2] * 1e6,
+        "calls": repeat,
+    }
+
+
+def _import(statement):
+    return lambda min_time, repeat: import_time(statement, min_time=min_time, repeat=repeat)
+
+
+def _list_links(files, index=None):
+    """Finding a document's files, by scanning its links, or with its ``index``: ``"cached"`` is the index which
+    :func:`link_index` keeps for the document, so only the lookup is timed, and ``"build"`` builds a new index
+    each time, as the first lookup on a document would"""
+    def setup():
+        server = SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+        status = client.get_object(client.create_object_with_metadata_and_by_reference(
+            server.service_url, _mdbr(0, files)
+        ).location)
+        if index == "cached":
+            return lambda: (link_index(status).with_rel(constants.Rel.FileSetFile),
+                            client._get_url(status, "metadata_url"))
+        if index == "build":
+            return lambda: (LinkIndex(status).with_rel(constants.Rel.FileSetFile),
+                            client._get_url(status, "metadata_url"))
+        return lambda: (status.list_links([constants.Rel.FileSetFile]), client._get_url(status, "metadata_url"))
+    return setup
+
+
+class _CannedHttpLayer(MemoryHttpLayer):
+    """Answers every request with the same response, without a server, so that only the client's own work around
+    the request is timed"""
+
+    def __init__(self, status_code: int, body: bytes = b""):
+        super(_CannedHttpLayer, self).__init__()
+        self._resp = MemoryHttpResponse(status_code, {"Location": OBJECT_URL}, body)
+
+    def _request(self, method, url, data, headers):
+        return self._resp
+
+
+OBJECT_URL = "http://localhost/objects/1"
+METADATA_URL = OBJECT_URL + "/metadata"
+
+
+def _operation(status_code, call):
+    """A whole protocol operation, against an HTTP layer which answers at once with ``status_code``"""
+    def setup():
+        client = SWORD3Client(http=_CannedHttpLayer(status_code))
+        metadata = _metadata(10)
+
+        def run():
+            try:
+                call(client, metadata)
+            except exceptions.SwordException:
+                pass
+        return run
+    return setup
+
+
+def benchmarks() -> typing.List[Micro]:
+    return [
+        Micro("metadata_properties[10]", _metadata_properties(10)),
+        Micro("metadata_properties[500]", _metadata_properties(500)),
+        Micro("binary_properties", _binary_properties),
+        Micro("by_reference_properties[10]", _by_reference_properties(10)),
+        Micro("by_reference_properties[2000]", _by_reference_properties(2000)),
+        Micro("mdbr_properties[100,1000]", _mdbr_properties(100, 1000)),
+        Micro("content_disposition_serialise", _content_disposition),
+        Micro("make_digest_header", _digest_header),
+        Micro("raise_for_status_code[error_doc]", _raise_for_status_code(True)),
+        Micro("raise_for_status_code[status_only]", _raise_for_status_code(False)),
+        Micro("sword_response[10]", _sword_response(10)),
+        Micro("sword_response[1000]", _sword_response(1000)),
+        Micro("iter_links[1000]", _iter_links(1000)),
+        Micro("list_links[1000]", _list_links(1000)),
+        Micro("link_index[1000,cached]", _list_links(1000, "cached")),
+        Micro("link_index[1000,build]", _list_links(1000, "build")),
+        Micro("operation[delete_metadata]", _operation(204, lambda c, md: c.delete_metadata(METADATA_URL))),
+        Micro("operation[replace_metadata]", _operation(204, lambda c, md: c.replace_metadata(METADATA_URL, md))),
+        Micro("operation[add_binary]", _operation(
+            202, lambda c, md: c.add_binary(OBJECT_URL, b"content", "file.bin", DIGEST, content_length=7)
+        )),
+        Micro("operation[get_metadata,error]", _operation(404, lambda c, md: c.get_metadata(METADATA_URL))),
+        Micro("import[sword3client]", measure=_import("import sword3client")),
+        Micro("import[SWORD3Client]", measure=_import("from sword3client import SWORD3Client")),
+    ]
+
+
+def measure(func: typing.Callable, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Time ``func``.  The number of calls in each of the ``repeat`` rounds is chosen so that a round takes at
+    least ``min_time / repeat`` seconds.  The fastest round is the figure to compare, as it is the one least
+    disturbed by everything else the machine was doing"""
+    number = 1
+    target = min_time / repeat
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target:
+            break
+        number = number * 10 if elapsed == 0 else max(number + 1, int(number * target / elapsed * 1.1))
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    rounds.sort()
+    return {
+        "per_call_us": rounds[0] * 1e6,
+        "median_us": rounds[len(rounds) // 2] * 1e6,
+        "calls": number * repeat,
+    }
+
+
+def run(only: typing.Sequence[str] = None, min_time: float = 0.2, repeat: int = 5, progress=None) -> dict:
+    results = {}
+    for micro in benchmarks():
+        if only and micro.name not in only:
+            continue
+        if micro.measure is not None:
+            result = micro.measure(min_time=min_time, repeat=repeat)
+        else:
+            result = measure(micro.setup(), min_time=min_time, repeat=repeat)
+        results[micro.name] = result
+        if progress is not None:
+            progress(micro.name, result)
+    return {
+        "meta": {
+            "date": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> typing.List[Regression]:
+    """The benchmarks which are more than ``threshold`` percent slower than the baseline.  Benchmarks missing
+    from either side are ignored"""
+    regressions = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        regression = Regression(name, base["per_call_us"], result["per_call_us"])
+        if regression.change_pct > threshold:
+            regressions.append(regression)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sword3client.bench.micro", description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="compare the results against the baseline in this file")
+    parser.add_argument("--save", help="write the results to this file, as a new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="percentage slowdown which counts as a regression")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend timing each benchmark")
+    parser.add_argument("benchmarks", nargs="*", help="only run these benchmarks")
+    args = parser.parse_args(argv)
+
+    def progress(name, result):
+        print("{n:<40} {p:>12.2f}us  (median {m:.2f}us, {c} calls)".format(
+            n=name, p=result["per_call_us"], m=result["median_us"], c=result["calls"]
+        ), file=sys.stderr)
+
+    results = run(only=args.benchmarks, min_time=args.min_time, progress=progress)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + str(regression), file=sys.stderr)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+from sword3client.connection.connection_memory import SWORDServer
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import threading
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and body go out in separate writes, so with Nagle's algorithm on, each response on a kept-alive
+    # connection would wait for the client's delayed ACK (~40ms), and the benchmarks would measure that
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def do_PUT(self):
+        self._respond("PUT")
+
+    def do_DELETE(self):
+        self._respond("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length > 0 else b""
+
+    def _respond(self, method):
+        body = self._read_body()
+        headers = {k: v for k, v in self.headers.items()}
+        code, resp_headers, resp_body = self.server.sword.handle(method, self.path, headers, body)
+        self.send_response(code)
+        for k, v in resp_headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(resp_body)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(resp_body)
+
+
+class BenchServer(object):
+    """Serves an in-memory :class:`~sword3client.connection.connection_memory.SWORDServer` over HTTP on a local
+    port, on a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **kwargs):
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = "http://{h}:{p}".format(h=host, p=self._httpd.server_address[1])
+        self.sword = SWORDServer(self.base_url, **kwargs)
+        self._httpd.sword = self.sword
+        self._thread = None
+
+    @property
+    def service_url(self):
+        return self.sword.service_url
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="sword3-bench-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
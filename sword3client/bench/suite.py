@@ -0,0 +1,223 @@
+from sword3client import SWORD3Client
+from sword3client.packaging import SWORDBagIt
+
+from sword3common import Metadata, ByReference, MetadataAndByReference, constants
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import os
+import sys
+import time
+import base64
+import typing
+import hashlib
+import datetime
+import platform
+
+MB = 1000 * 1000
+
+
+def sha256(data: bytes) -> dict:
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def percentile(ordered: typing.List[float], p: float) -> float:
+    """The nearest-rank percentile of an ordered list"""
+    if len(ordered) == 0:
+        return 0.0
+    rank = max(1, int(round(p / 100.0 * len(ordered) + 0.4999)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Scenario(object):
+    """One benchmarked operation (or flow of operations).  ``setup`` is called once, untimed, with the client and
+    the service URL, and returns the context passed to each timed call of ``run``, along with the iteration
+    number.  ``transfer`` is the number of bytes moved by each run, for scenarios measured in MB/s"""
+
+    def __init__(self, name, run, setup=None, transfer=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.transfer = transfer
+
+
+def _metadata():
+    metadata = Metadata()
+    metadata.add_dc_field("title", "Benchmark deposit")
+    metadata.add_dc_field("creator", "sword3client.bench")
+    return metadata
+
+
+def _object(client, service_url):
+    return client.create_object_with_metadata(service_url, _metadata()).location
+
+
+def _by_reference(url="http://example.com/files/data.csv"):
+    br = ByReference()
+    br.add_file(url, "data.csv", "text/csv", True, content_length=1024)
+    return br
+
+
+def _package(payload: bytes):
+    bag = SWORDBagIt(_metadata())
+    bag.add_bytes(payload, "data.bin")
+    data = bag.stream().read()
+    return data, sha256(data)
+
+
+def _segmented(client, ctx, i):
+    data, digest, segment_size = ctx["data"], ctx["digest"], ctx["segment_size"]
+    count = (len(data) + segment_size - 1) // segment_size
+    temporary_url = client.initialise_segmented_upload(
+        ctx["service"], len(data), count, segment_size, digest
+    ).location
+    for n in range(count):
+        segment = data[n * segment_size:(n + 1) * segment_size]
+        client.upload_file_segment(temporary_url, BytesIO(segment), n + 1, content_length=len(segment))
+    client.create_object_with_temporary_file(
+        ctx["service"], temporary_url, "segmented.bin", "application/octet-stream", len(data), digest=digest
+    )
+
+
+def _download(client, ctx, i):
+    with client.get_file(ctx["file_url"]) as stream:
+        while stream.read(1024 * 1024):
+            pass
+
+
+def scenarios(small_size: int = 4096, large_size: int = 32 * MB, segment_size: int = 1024 * 1024):
+    small = os.urandom(small_size)
+    small_digest = sha256(small)
+    package, package_digest = _package(small)
+    large_payload = []
+
+    def large():
+        # generated only once a large scenario is run, so that runs of the small ones don't pay for it
+        if len(large_payload) == 0:
+            data = os.urandom(large_size)
+            large_payload.append((data, sha256(data)))
+        return large_payload[0]
+
+    def with_object(client, service_url):
+        return {"object": _object(client, service_url), "service": service_url}
+
+    def with_large(client, service_url):
+        data, digest = large()
+        return {"object": _object(client, service_url), "data": data, "digest": digest}
+
+    def with_file(client, service_url):
+        data, digest = large()
+        resp = client.add_binary(_object(client, service_url), BytesIO(data), "large.bin", digest, len(data))
+        return {"file_url": resp.location}
+
+    def with_segments(client, service_url):
+        data, digest = large()
+        return {"service": client.get_service(service_url), "data": data, "digest": digest,
+                "segment_size": segment_size}
+
+    return [
+        Scenario("get_service", lambda c, ctx, i: c.get_service(ctx["service"]),
+                 lambda c, s: {"service": s}),
+        Scenario("create_object_with_metadata", lambda c, ctx, i: c.create_object_with_metadata(ctx["service"], _metadata()),
+                 lambda c, s: {"service": s}),
+        Scenario("get_object", lambda c, ctx, i: c.get_object(ctx["object"]), with_object),
+        Scenario("append_metadata", lambda c, ctx, i: c.append_metadata(ctx["object"], _metadata()), with_object),
+        Scenario("create_object_with_binary",
+                 lambda c, ctx, i: c.create_object_with_binary(ctx["service"], BytesIO(small), "small.bin",
+                                                               small_digest, len(small)),
+                 lambda c, s: {"service": s}),
+        Scenario("create_object_with_package",
+                 lambda c, ctx, i: c.create_object_with_package(ctx["service"], BytesIO(package), "package.zip",
+                                                                package_digest, len(package), "application/zip",
+                                                                constants.PACKAGE_SWORDBAGIT),
+                 lambda c, s: {"service": s}),
+        Scenario("create_object_by_reference",
+                 lambda c, ctx, i: c.create_object_by_reference(ctx["service"], _by_reference()),
+                 lambda c, s: {"service": s}),
+        Scenario("create_object_with_metadata_and_by_reference",
+                 lambda c, ctx, i: c.create_object_with_metadata_and_by_reference(
+                     ctx["service"], MetadataAndByReference(_metadata(), _by_reference())),
+                 lambda c, s: {"service": s}),
+        Scenario("segmented_upload", _segmented,
+                 lambda c, s: {"service": c.get_service(s), "data": small * 4, "digest": sha256(small * 4),
+                               "segment_size": small_size}),
+        Scenario("large_upload",
+                 lambda c, ctx, i: c.add_binary(ctx["object"], BytesIO(ctx["data"]), "large.bin", ctx["digest"],
+                                                len(ctx["data"])),
+                 with_large, transfer=large_size),
+        Scenario("large_segmented_upload", _segmented, with_segments, transfer=large_size),
+        Scenario("large_download", _download, with_file, transfer=large_size),
+    ]
+
+
+def run_scenario(client: SWORD3Client, service_url: str, scenario: Scenario, iterations: int, concurrency: int = 1):
+    ctx = scenario.setup(client, service_url) if scenario.setup is not None else {}
+    latencies = [0.0] * iterations
+
+    def timed(i):
+        start = time.perf_counter()
+        scenario.run(client, ctx, i)
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(iterations)))
+    else:
+        for i in range(iterations):
+            timed(i)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "ops_per_sec": iterations / elapsed if elapsed > 0 else None,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    if scenario.transfer is not None:
+        result["bytes"] = scenario.transfer * iterations
+        result["mb_per_sec"] = scenario.transfer * iterations / MB / elapsed if elapsed > 0 else None
+    return result
+
+
+def run_suite(
+    client: SWORD3Client,
+    service_url: str,
+    iterations: int = 200,
+    large_iterations: int = 3,
+    concurrency: int = 1,
+    large_size: int = 32 * MB,
+    only: typing.Iterable[str] = None,
+    transport: str = None,
+    progress: typing.Callable[[str, dict], None] = None,
+) -> dict:
+    """Run the benchmark scenarios (or only those named), and return the results in a form suitable for writing
+    as JSON"""
+    only = set(only) if only else None
+    results = {}
+    for scenario in scenarios(large_size=large_size):
+        if only is not None and scenario.name not in only:
+            continue
+        n = large_iterations if scenario.transfer is not None else iterations
+        results[scenario.name] = run_scenario(client, service_url, scenario, n, concurrency)
+        if progress is not None:
+            progress(scenario.name, results[scenario.name])
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "transport": transport,
+            "iterations": iterations,
+            "large_iterations": large_iterations,
+            "large_size": large_size,
+            "concurrency": concurrency,
+        },
+        "results": results,
+    }
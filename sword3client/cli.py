@@ -0,0 +1,553 @@
+"""sword3: bulk, parallel deposits to a SWORDv3 server.
+
+    sword3 deposit --service URL manifest.jsonl --concurrency 8 --results results.jsonl
+    sword3 deposit --service URL ./batch --package
+    sword3 upload-large --service URL big.iso
+    sword3 get URL [URL ...]
+    sword3 export --output ./exported URL [URL ...]
+
+Each line of a deposit manifest is a JSON object describing one object to create (or add to):
+
+    {"id": "item-1", "files": ["a.pdf", "b.csv"], "metadata": {"dc:title": "An item"}, "package": false}
+    {"id": "item-2", "object": "http://example.com/objects/1", "files": ["c.tif"]}
+
+Relative paths are relative to the manifest.  A directory can be given instead of a manifest, in which case each
+of its subdirectories is deposited as one object, with all the files beneath it.  Results are written as JSON lines,
+one per manifest entry, and with ``--resume`` the entries already deposited successfully according to the results
+file are skipped.
+"""
+from sword3client import SWORD3Client
+from sword3client.connection.connection_requests import RequestsHttpLayer
+from sword3client.packaging import SWORDBagIt
+from sword3client.lib import paths
+from sword3client.models.link_index import link_index
+
+from sword3common import Metadata, constants, exceptions
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import os
+import sys
+import json
+import math
+import time
+import base64
+import typing
+import hashlib
+import argparse
+import threading
+import mimetypes
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+
+
+class Progress(object):
+    """Shows the number of operations completed, and the rate of operations and bytes, on one continually updated
+    line"""
+
+    def __init__(self, stream=None, enabled: bool = None, interval: float = 0.5):
+        self._stream = stream if stream is not None else sys.stderr
+        # by default, only shown to a person watching
+        self._enabled = enabled if enabled is not None else self._stream.isatty()
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last = 0.0
+        self.ops = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes += n
+        self._show()
+
+    def done(self, ok: bool):
+        with self._lock:
+            self.ops += 1
+            if not ok:
+                self.failed += 1
+        self._show()
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        return "{o} done, {f} failed  {r:.1f} ops/s  {m:.1f} MB  {s:.2f} MB/s".format(
+            o=self.ops, f=self.failed, r=self.ops / elapsed, m=self.bytes / 1e6, s=self.bytes / 1e6 / elapsed
+        )
+
+    def finish(self):
+        if self._enabled:
+            self._stream.write("\r" + self.line() + "\n")
+            self._stream.flush()
+
+    def _show(self):
+        if not self._enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last < self._interval:
+                return
+            self._last = now
+        self._stream.write("\r" + self.line())
+        self._stream.flush()
+
+
+class ResultWriter(object):
+    """Writes one JSON object per line, from any thread, flushing each so that an interrupted run loses nothing"""
+
+    def __init__(self, path: str = None):
+        self._file = open(path, "a") if path is not None else None
+        self._lock = threading.Lock()
+
+    def write(self, result: dict):
+        line = json.dumps(result) + "\n"
+        with self._lock:
+            out = self._file if self._file is not None else sys.stdout
+            out.write(line)
+            out.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def completed(results_path: str, op: str) -> typing.Set[str]:
+    """The ids of the entries which the results file records as having been done successfully"""
+    done = set()
+    if results_path is None or not os.path.exists(results_path):
+        return done
+    with open(results_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # a line cut short when the run was interrupted
+                continue
+            if result.get("op") == op and result.get("ok"):
+                done.add(result.get("id"))
+    return done
+
+
+def read_manifest(path: str) -> typing.Iterator[dict]:
+    """The entries of a JSON-lines manifest, read one at a time.  Entries without an ``id`` are given their line
+    number, and relative file paths are resolved against the manifest's directory"""
+    base = os.path.dirname(os.path.abspath(path)) if path != "-" else os.getcwd()
+    f = open(path) if path != "-" else sys.stdin
+    try:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            entry.setdefault("id", "line-{n}".format(n=n))
+            files = entry.get("files", [])
+            if "file" in entry:
+                files = [entry["file"]] + files
+            entry["files"] = [os.path.join(base, p) for p in files]
+            yield entry
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def directory_manifest(path: str) -> typing.Iterator[dict]:
+    """Manifest entries for a directory: one for each subdirectory, with every file beneath it"""
+    for name in sorted(paths.list_subdirs(path)):
+        root = os.path.join(path, name)
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            files += [os.path.join(dirpath, f) for f in sorted(filenames)]
+        yield {"id": name, "files": files, "root": root}
+
+
+def run_parallel(entries: typing.Iterable, func: typing.Callable, concurrency: int) -> typing.Iterator:
+    """Call ``func`` on each entry on a pool of ``concurrency`` threads, yielding the results as they complete.
+    Entries are only taken from ``entries`` as there is room for them, so a manifest of any size can be read
+    lazily"""
+    with ThreadPoolExecutor(concurrency) as pool:
+        pending = set()
+        for entry in entries:
+            pending.add(pool.submit(func, entry))
+            if len(pending) >= concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def _sha256(data_or_digest) -> typing.Dict[str, str]:
+    digest = data_or_digest.digest() if hasattr(data_or_digest, "digest") else hashlib.sha256(data_or_digest).digest()
+    return {constants.DIGEST_SHA_256: base64.b64encode(digest).decode("ascii")}
+
+
+def _content_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _result(op: str, id, started: float, **kwargs) -> dict:
+    result = {"id": id, "op": op, "ok": True}
+    result.update(kwargs)
+    result["seconds"] = round(time.monotonic() - started, 6)
+    return result
+
+
+def _failed(op: str, id, started: float, e: Exception) -> dict:
+    return _result(op, id, started, ok=False, error_type=type(e).__name__, error=str(e))
+
+
+def upload_segmented(
+    client,
+    service_url: str,
+    path: str,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    concurrency: int = 4,
+    state_path: str = None,
+    progress: Progress = None,
+) -> typing.Tuple[str, typing.Dict[str, str]]:
+    """Upload the file at ``path`` by Segmented Upload, sending up to ``concurrency`` segments at once.  Returns
+    the Temporary URL and the digest of the whole file.
+
+    If a ``state_path`` is given the upload can be resumed: the Temporary URL is saved there, and if it exists when
+    the upload starts, only the segments the server is still expecting are sent"""
+    size = os.path.getsize(path)
+    state = None
+    if state_path is not None and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("size") != size:
+            state = None
+
+    expecting = None
+    if state is not None:
+        temporary_url, digest, segment_size = state["temporary_url"], state["digest"], state["segment_size"]
+        try:
+            expecting = set(client.segmented_upload_status(temporary_url).expecting)
+        except Exception:
+            # the server no longer knows about it, so start again
+            state = None
+
+    if state is None:
+        service = client.get_service(service_url)
+        max_segments = service.data.get("maxSegments")
+        if max_segments:
+            segment_size = max(segment_size, int(math.ceil(size / max_segments)))
+        digest = _sha256(paths.sha256(path))
+        count = max(1, int(math.ceil(size / segment_size)))
+        temporary_url = client.initialise_segmented_upload(service, size, count, segment_size, digest).location
+        if state_path is not None:
+            with open(state_path, "w") as f:
+                json.dump({"temporary_url": temporary_url, "digest": digest, "segment_size": segment_size,
+                           "size": size}, f)
+
+    count = max(1, int(math.ceil(size / segment_size)))
+    numbers = [n for n in range(1, count + 1) if expecting is None or n in expecting]
+
+    def send(n):
+        with open(path, "rb") as f:
+            f.seek((n - 1) * segment_size)
+            data = f.read(segment_size)
+        client.upload_file_segment(temporary_url, data, n, digest=_sha256(data), content_length=len(data))
+        if progress is not None:
+            progress.add_bytes(len(data))
+        return n
+
+    for _ in run_parallel(numbers, send, concurrency):
+        pass
+    return temporary_url, digest
+
+
+class _Deposit(object):
+    """Deposits one manifest entry"""
+
+    def __init__(self, client, args, progress: Progress):
+        self._client = client
+        self._args = args
+        self._progress = progress
+
+    def __call__(self, entry: dict) -> dict:
+        started = time.monotonic()
+        try:
+            location, status_code, sent = self._deposit(entry)
+        except Exception as e:
+            return _failed("deposit", entry["id"], started, e)
+        return _result("deposit", entry["id"], started, location=location, status_code=status_code, bytes=sent)
+
+    def _deposit(self, entry):
+        client, args = self._client, self._args
+        files = entry.get("files", [])
+        metadata = entry.get("metadata")
+        in_progress = entry.get("in_progress", False)
+        object_url = entry.get("object")
+        status_code = None
+
+        if entry.get("package", args.package) and len(files) > 0:
+            bag = SWORDBagIt(Metadata(metadata) if metadata is not None else None)
+            root = entry.get("root")
+            for path in files:
+                bag.add_file(path, os.path.relpath(path, root) if root is not None else None)
+            length = bag.content_length
+            if object_url is None:
+                resp = client.create_object_with_package(
+                    args.service, bag.stream(), "package.zip", bag.digest(), content_length=length,
+                    content_type=bag.content_type, packaging=bag.packaging, in_progress=in_progress
+                )
+            else:
+                resp = client.add_package(
+                    object_url, bag.stream(), "package.zip", bag.digest(), content_length=length,
+                    content_type=bag.content_type, packaging=bag.packaging, in_progress=in_progress
+                )
+            self._progress.add_bytes(length or 0)
+            return object_url or resp.location, resp.status_code, length
+
+        sent = 0
+        if object_url is None:
+            if metadata is not None or len(files) == 0:
+                resp = client.create_object_with_metadata(
+                    args.service, Metadata(metadata if metadata is not None else {}),
+                    in_progress=in_progress or len(files) > 0
+                )
+            else:
+                resp, n = self._file(files[0], None, in_progress=in_progress or len(files) > 1)
+                files = files[1:]
+                sent += n
+            object_url = resp.location
+            status_code = resp.status_code
+        elif metadata is not None:
+            status_code = client.append_metadata(object_url, Metadata(metadata)).status_code
+
+        for i, path in enumerate(files):
+            resp, n = self._file(path, object_url, in_progress=in_progress or i < len(files) - 1)
+            sent += n
+            status_code = status_code if status_code is not None else resp.status_code
+        return object_url, status_code, sent
+
+    def _file(self, path, object_url, in_progress):
+        """Send one file, creating the object if there is no ``object_url``.  Files larger than the segment
+        threshold are sent by Segmented Upload"""
+        client, args = self._client, self._args
+        size = os.path.getsize(path)
+        name = os.path.basename(path)
+        if size > args.segment_threshold:
+            temporary_url, digest = upload_segmented(
+                client, args.service, path, args.segment_size, args.segment_concurrency, progress=self._progress
+            )
+            if object_url is None:
+                resp = client.create_object_with_temporary_file(
+                    args.service, temporary_url, name, _content_type(path), size, digest=digest, in_progress=in_progress
+                )
+            else:
+                resp = client.append_temporary_file(
+                    object_url, temporary_url, name, _content_type(path), size, digest=digest, in_progress=in_progress
+                )
+            return resp, size
+
+        digest = _sha256(paths.sha256(path))
+        with open(path, "rb") as f:
+            if object_url is None:
+                resp = client.create_object_with_binary(
+                    args.service, f, name, digest, content_length=size, content_type=_content_type(path),
+                    in_progress=in_progress
+                )
+            else:
+                resp = client.add_binary(
+                    object_url, f, name, digest, content_length=size, content_type=_content_type(path),
+                    in_progress=in_progress
+                )
+        self._progress.add_bytes(size)
+        return resp, size
+
+
+def _urls(args) -> typing.Iterator[dict]:
+    for url in args.urls:
+        yield {"id": url, "url": url}
+    if args.manifest is not None:
+        for entry in read_manifest(args.manifest):
+            entry.setdefault("url", entry["id"])
+            yield entry
+
+
+def _get(client, progress):
+    def get(entry):
+        started = time.monotonic()
+        try:
+            status = client.get_object(entry["url"])
+        except Exception as e:
+            return _failed("get", entry["id"], started, e)
+        return _result("get", entry["id"], started, location=status.object_url, status=status.data)
+    return get
+
+
+def _export(client, args, progress):
+    def export(entry):
+        started = time.monotonic()
+        try:
+            status = client.get_object(entry["url"])
+            name = entry.get("name") or status.object_url.rstrip("/").rsplit("/", 1)[-1]
+            root = os.path.join(args.output, name)
+            os.makedirs(os.path.join(root, "files"), exist_ok=True)
+            with open(os.path.join(root, "status.json"), "w") as f:
+                json.dump(status.data, f, indent=2)
+            try:
+                metadata = client.get_metadata(status)
+            except exceptions.NotFound:
+                # the object has no metadata
+                metadata = None
+            if metadata is not None:
+                with open(os.path.join(root, "metadata.json"), "w") as f:
+                    json.dump(metadata.data, f, indent=2)
+
+            received = 0
+            for link in link_index(status).with_rel(constants.Rel.FileSetFile):
+                filename = link["@id"].rstrip("/").rsplit("/", 1)[-1]
+                with client.get_file(link["@id"]) as stream, \
+                        open(os.path.join(root, "files", filename), "wb") as out:
+                    while True:
+                        chunk = stream.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        received += len(chunk)
+                        progress.add_bytes(len(chunk))
+        except Exception as e:
+            return _failed("export", entry["id"], started, e)
+        return _result("export", entry["id"], started, location=status.object_url, path=root, bytes=received)
+    return export
+
+
+def _client(args) -> SWORD3Client:
+    user = args.user or os.environ.get("SWORD3_USER")
+    password = args.password or os.environ.get("SWORD3_PASSWORD")
+    auth = (user, password) if user is not None else None
+    pool = args.concurrency * max(1, getattr(args, "segment_concurrency", 1))
+    return SWORD3Client(http=RequestsHttpLayer(auth=auth, pool_maxsize=pool))
+
+
+def _run(args, op, entries, func, progress) -> int:
+    """Run ``func`` over the entries, skipping the ones already done if resuming, and write the results.  Returns
+    the exit status"""
+    skip = completed(args.results, op) if args.resume else set()
+    writer = ResultWriter(args.results)
+    failed = 0
+    try:
+        for result in run_parallel((e for e in entries if e["id"] not in skip), func, args.concurrency):
+            writer.write(result)
+            progress.done(result["ok"])
+            if not result["ok"]:
+                failed += 1
+    finally:
+        writer.close()
+        progress.finish()
+    return 1 if failed > 0 else 0
+
+
+def cmd_deposit(args) -> int:
+    client = _client(args)
+    progress = Progress(enabled=False if args.quiet else None)
+    if args.service is None:
+        raise SystemExit("sword3 deposit: --service is required")
+    entries = directory_manifest(args.source) if os.path.isdir(args.source) else read_manifest(args.source)
+    return _run(args, "deposit", entries, _Deposit(client, args, progress), progress)
+
+
+def cmd_get(args) -> int:
+    client = _client(args)
+    progress = Progress(enabled=False if args.quiet else None)
+    return _run(args, "get", _urls(args), _get(client, progress), progress)
+
+
+def cmd_export(args) -> int:
+    client = _client(args)
+    progress = Progress(enabled=False if args.quiet else None)
+    os.makedirs(args.output, exist_ok=True)
+    return _run(args, "export", _urls(args), _export(client, args, progress), progress)
+
+
+def cmd_upload_large(args) -> int:
+    client = _client(args)
+    progress = Progress(enabled=False if args.quiet else None)
+    if args.service is None:
+        raise SystemExit("sword3 upload-large: --service is required")
+    writer = ResultWriter(args.results)
+    started = time.monotonic()
+    path = args.file
+    state_path = args.state if args.state is not None else path + ".sword3upload"
+    try:
+        temporary_url, digest = upload_segmented(
+            client, args.service, path, args.segment_size, args.concurrency, state_path, progress
+        )
+        name, size = os.path.basename(path), os.path.getsize(path)
+        if args.object is None:
+            resp = client.create_object_with_temporary_file(
+                args.service, temporary_url, name, _content_type(path), size, digest=digest
+            )
+        else:
+            resp = client.append_temporary_file(args.object, temporary_url, name, _content_type(path), size,
+                                                digest=digest)
+        os.remove(state_path)
+        result = _result("upload-large", path, started, location=args.object or resp.location,
+                         status_code=resp.status_code, bytes=size)
+    except Exception as e:
+        result = _failed("upload-large", path, started, e)
+    writer.write(result)
+    writer.close()
+    progress.done(result["ok"])
+    progress.finish()
+    return 0 if result["ok"] else 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--service", help="the Service-URL of the server")
+    common.add_argument("--user", help="username (or set SWORD3_USER)")
+    common.add_argument("--password", help="password (or set SWORD3_PASSWORD)")
+    common.add_argument("-c", "--concurrency", type=int, default=4, help="operations to run at once")
+    common.add_argument("-r", "--results", help="append JSON-lines results to this file, rather than stdout")
+    common.add_argument("--resume", action="store_true",
+                        help="skip the entries the results file records as already done")
+    common.add_argument("-q", "--quiet", action="store_true", help="don't show progress")
+
+    segments = argparse.ArgumentParser(add_help=False)
+    segments.add_argument("--segment-size", type=int, default=DEFAULT_SEGMENT_SIZE, help="bytes per segment")
+
+    parser = argparse.ArgumentParser(prog="sword3", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    deposit = commands.add_parser("deposit", parents=[common, segments],
+                                  help="deposit the entries of a manifest, or the subdirectories of a directory")
+    deposit.add_argument("source", help="a JSON-lines manifest (or - for stdin), or a directory")
+    deposit.add_argument("--package", action="store_true", help="deposit each entry's files as a SWORDBagIt package")
+    deposit.add_argument("--segment-threshold", type=int, default=DEFAULT_SEGMENT_SIZE * 4,
+                         help="send files larger than this many bytes by Segmented Upload")
+    deposit.add_argument("--segment-concurrency", type=int, default=2,
+                         help="segments of each large file to send at once")
+    deposit.set_defaults(func=cmd_deposit)
+
+    large = commands.add_parser("upload-large", parents=[common, segments],
+                                help="deposit one large file by Segmented Upload, resumably")
+    large.add_argument("file")
+    large.add_argument("--object", help="add the file to this object, rather than creating a new one")
+    large.add_argument("--state", help="where to keep the state for resuming (default FILE.sword3upload)")
+    large.set_defaults(func=cmd_upload_large)
+
+    for name, func, help in [("get", cmd_get, "get the status of objects"),
+                             ("export", cmd_export, "download objects' metadata and files")]:
+        command = commands.add_parser(name, parents=[common], help=help)
+        command.add_argument("urls", nargs="*", help="Object-URLs")
+        command.add_argument("-m", "--manifest", help="a JSON-lines file of {\"url\": ...} entries")
+        if name == "export":
+            command.add_argument("-o", "--output", default=".", help="directory to export into")
+        command.set_defaults(func=func)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = _parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
-from sword3client.connection import HttpLayer
-from sword3client.connection.connection_requests import RequestsHttpLayer
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client import operations
+from sword3client.operations import OperationSpec
 from sword3client import SWORDResponse
+from sword3client.dedup import DedupIndex
+from sword3client.lib import jsonstream, streams
+from sword3client.instrumentation import instrumented, phase, Operation, InstrumentedHttpLayer, DIGEST, SERIALISE
 
 from sword3common import (
     ServiceDocument,
@@ -19,42 +23,125 @@ import json
 import hashlib
 import base64
 import typing
+import threading
 import contextlib
+import contextvars
+
+# HttpLayers which replace a client's own for the current thread or task, keyed by client.  See SWORD3Client.using
+_http_overrides = contextvars.ContextVar("sword3client_http_overrides", default=None)
+
+if typing.TYPE_CHECKING:
+    from sword3client.sync import SyncResult
+    from sword3client.lib.digests import DigestCache
 
 
 class SWORD3Client(object):
     """The SWORDv3 client.  You can carry out all protocol operations against the server through this class"""
 
-    def __init__(self, http: HttpLayer=None):
+    def __init__(self, http: HttpLayer=None, dedup_index: DedupIndex=None, chunk_size: int = streams.CHUNK_SIZE,
+                 lazy_responses: bool = False):
         """
         Construct a new instance of the client.
 
         Optionally, you can provide your own HTTP layer implementation, which conforms to sword3client.connection.connection.HTTPLayer.
         If not provided, the default one using requests will be used.
+
+        If a DedupIndex is provided, binary files whose content has already been deposited are sent By-Reference to
+        the existing copy instead of being uploaded again, and successful binary deposits are added to the index.
+
+        The client is thread-safe, so long as its HTTP layer is (the default one is): one client, and its connection
+        pool, can be shared by any number of threads.
+
+        Binary content whose length isn't given and can't be found without reading it (a generator, or a pipe from
+        a producer process) is sent with chunked transfer encoding, in chunks of ``chunk_size`` bytes.
+
+        The Status Documents in the responses to deposits are validated as they are received, raising
+        InvalidDataFromServer if they are invalid.  With ``lazy_responses``, they are only parsed when they are first
+        used, which saves the work for responses whose documents are never looked at (see SWORDResponse).
         """
-        self._http = http if http is not None else RequestsHttpLayer()
+        if http is None:
+            # imported here so that requests is only loaded if it is actually used
+            from sword3client.connection.connection_requests import RequestsHttpLayer
+            http = RequestsHttpLayer()
+        self._transport = http
+        self._dedup = dedup_index
+        self._chunk_size = chunk_size
+        self._lazy_responses = lazy_responses
+        self._listeners = ()
+        self._lock = threading.Lock()
+
+    @property
+    def _http(self) -> HttpLayer:
+        """The HTTP layer for requests made from the current context: the one given to :meth:`using`, if there is
+        one, otherwise the client's own"""
+        overrides = _http_overrides.get()
+        if overrides is not None:
+            http = overrides.get(self)
+            if http is not None:
+                return http
+        return self._transport
 
     def set_http_layer(self, http):
         """
-        Set the HTTP layer after construction.  Can be switched at any time during operation.
+        Set the HTTP layer after construction.  Can be switched at any time during operation, and affects every
+        thread using the client; to use a different HTTP layer for only some requests, see :meth:`using`.
+        """
+        with self._lock:
+            if self._listeners:
+                http = InstrumentedHttpLayer(http, self)
+            self._transport = http
+
+    @contextlib.contextmanager
+    def using(self, http: HttpLayer):
+        """
+        Make requests through a different HTTP layer for the duration of the ``with`` block, in the current thread
+        (or asyncio task) only.  Other threads sharing the client are unaffected, and blocks may be nested::
+
+            with client.using(MemoryHttpLayer(server)):
+                client.get_object(url)
+        """
+        if self._listeners:
+            http = InstrumentedHttpLayer(http, self)
+        overrides = dict(_http_overrides.get() or {})
+        overrides[self] = http
+        token = _http_overrides.set(overrides)
+        try:
+            yield self
+        finally:
+            _http_overrides.reset(token)
+
+    def add_listener(self, listener: typing.Callable):
         """
-        self._http = http
+        Register a callable to receive an InstrumentationEvent (see sword3client.instrumentation) at each stage of
+        every protocol operation: start, headers-built, request-sent, response-received, parsed and error.
 
+        Listeners are called synchronously, on the thread making the request, so should be quick and must not raise.
+        """
+        with self._lock:
+            if not self._listeners:
+                self._transport = InstrumentedHttpLayer(self._transport, self)
+            self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener: typing.Callable):
+        with self._lock:
+            self._listeners = tuple(l for l in self._listeners if l != listener)
+            if not self._listeners and isinstance(self._transport, InstrumentedHttpLayer):
+                self._transport = self._transport.http
+
+    @instrumented("get_service")
     def get_service(self, service_url: str) -> ServiceDocument:
         """Retrieves the SWORD service document for a given URL.
 
         :raises: SwordException"""
-        resp = self._http.get(service_url)
-        if resp.status_code == 200:
-            data = json.loads(resp.body)
-            return ServiceDocument(data)
-        else:
-            self._raise_for_status_code(resp, service_url, [401, 403, 404])
+        resp = self._dispatch(operations.GET_SERVICE, service_url)
+        data = json.loads(resp.body)
+        return ServiceDocument(data)
 
     ######################################################
     ## Metadata protocol operations
     ######################################################
 
+    @instrumented("create_object_with_metadata")
     def create_object_with_metadata(
         self,
         service: typing.Union[ServiceDocument, str],
@@ -66,20 +153,13 @@ class SWORD3Client(object):
         """
         Create a new object using only metadata
         """
-        # get the service url.  The first argument may be the URL or the ServiceDocument
-        service_url = self._get_url(service, "service_url")
         body_bytes, headers = self._metadata_deposit_properties(
             metadata, metadata_format, digest, in_progress=in_progress
         )
-        resp = self._http.post(service_url, body_bytes, headers)
-
-        if resp.status_code in [201, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, service_url, [400, 401, 403, 404, 405, 412, 413, 415],
-            )
+        # the first argument may be the URL or the ServiceDocument
+        return self._sword_response(self._dispatch(operations.CREATE_OBJECT_WITH_METADATA, service, body_bytes, headers))
 
+    @instrumented("replace_object_with_metadata")
     def replace_object_with_metadata(
         self,
         status_or_object_url: typing.Union[StatusDocument, str],
@@ -90,40 +170,29 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entirity of the object with just new metadata.  All other content
         contained in the object may be lost."""
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._metadata_deposit_properties(
             metadata, metadata_format, digest, in_progress=in_progress
         )
-        resp = self._http.put(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
+        return self._sword_response(
+            self._dispatch(operations.REPLACE_OBJECT_WITH_METADATA, status_or_object_url, body_bytes, headers)
+        )
 
+    @instrumented("get_metadata")
     def get_metadata(
         self, status_or_metadata_url: typing.Union[StatusDocument, str]
     ) -> Metadata:
         """Retrieve the default sword metadata for this object"""
-        metadata_url = self._get_url(status_or_metadata_url, "metadata_url")
-        resp = self._http.get(metadata_url)
-
-        if resp.status_code == 200:
-            data = json.loads(resp.body)
-            try:
-                return Metadata(data)
-            except exceptions.SeamlessException as e:
-                raise exceptions.InvalidDataFromServer(
-                    "Metadata retrieval got invalid metadata document: {x}".format(x=e.message),
-                    response=resp
-                ) from e
-        else:
-            self._raise_for_status_code(
-                resp, metadata_url, [400, 401, 403, 404, 405, 412], request_context=constants.RequestContexts.Metadata
-            )
-
+        resp = self._dispatch(operations.GET_METADATA, status_or_metadata_url)
+        data = json.loads(resp.body)
+        try:
+            return Metadata(data)
+        except exceptions.SeamlessException as e:
+            raise exceptions.InvalidDataFromServer(
+                "Metadata retrieval got invalid metadata document: {x}".format(x=e.message),
+                response=resp
+            ) from e
+
+    @instrumented("append_metadata")
     def append_metadata(
         self,
         status_or_object_url: typing.Union[ServiceDocument, str],
@@ -133,19 +202,12 @@ class SWORD3Client(object):
         in_progress: bool = False,
     ) -> SWORDResponse:
         """Append the supplied metadata to the existing metadata on the object"""
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._metadata_deposit_properties(
             metadata, metadata_format, digest, in_progress=in_progress,
         )
-        resp = self._http.post(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
+        return self._sword_response(self._dispatch(operations.APPEND_METADATA, status_or_object_url, body_bytes, headers))
 
+    @instrumented("replace_metadata")
     def replace_metadata(
         self,
         status_or_metadata_url: typing.Union[ServiceDocument, str],
@@ -154,55 +216,37 @@ class SWORD3Client(object):
         metadata_format: str = None,
     ) -> SWORDResponse:
         """Replace all of the current metadata on the object with the new metadata"""
-        metadata_url = self._get_url(status_or_metadata_url, "metadata_url")
         body_bytes, headers = self._metadata_deposit_properties(
             metadata, metadata_format, digest
         )
-        resp = self._http.put(metadata_url, body_bytes, headers)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, metadata_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
+        return self._sword_response(self._dispatch(operations.REPLACE_METADATA, status_or_metadata_url, body_bytes, headers))
 
+    @instrumented("delete_metadata")
     def delete_metadata(
         self, status_or_metadata_url: typing.Union[ServiceDocument, str]
     ) -> SWORDResponse:
         """Delete all the metadata from the object"""
-        metadata_url = self._get_url(status_or_metadata_url, "metadata_url")
-        resp = self._http.delete(metadata_url)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, metadata_url, [400, 401, 403, 404, 405, 412, 413]
-            )
+        return self._sword_response(self._dispatch(operations.DELETE_METADATA, status_or_metadata_url))
 
     def _metadata_deposit_properties(
         self, metadata, metadata_format, digest, in_progress: bool = None,
     ):
-        body = json.dumps(metadata.data)
-        body_bytes = body.encode("utf-8")
+        with phase(SERIALISE):
+            body = json.dumps(metadata.data)
+            body_bytes = body.encode("utf-8")
         content_length = len(body_bytes)
 
         if digest is None:
-            d = hashlib.sha256(body_bytes)
-            digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest())}
-        digest_val = self._make_digest_header(digest)
-
+            with phase(DIGEST):
+                d = hashlib.sha256(body_bytes)
+                digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest()).decode("ascii")}
         if metadata_format is None:
             metadata_format = constants.URI_METADATA
 
-        headers = {
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": str(content_length),
-            "Content-Disposition": ContentDisposition.metadata_upload().serialise(),
-            "Digest": digest_val,
-            "Metadata-Format": metadata_format,
-        }
+        headers = dict(operations.METADATA_HEADERS)
+        headers["Content-Length"] = str(content_length)
+        headers["Digest"] = self._make_digest_header(digest)
+        headers["Metadata-Format"] = metadata_format
 
         if in_progress is not None:
             headers["In-Progress"] = "true" if in_progress else "false"
@@ -213,6 +257,7 @@ class SWORD3Client(object):
     # Binary/Package protocol operations
     #######################################################
 
+    @instrumented("create_object_with_binary")
     def create_object_with_binary(
         self,
         service: typing.Union[ServiceDocument, str],
@@ -223,8 +268,16 @@ class SWORD3Client(object):
         content_type: str = None,
         in_progress: bool = False,
     ) -> SWORDResponse:
-        """Create an object with a plain binary file (not a package)"""
-        return self._generic_create_binary(
+        """Create an object with a plain binary file (not a package).
+
+        If the client has a dedup index which already knows this content, the object is instead created
+        By-Reference to the existing copy of the file"""
+        br = self._dedup_by_reference(digest, filename, content_length, content_type)
+        if br is not None:
+            return self.create_object_by_reference(service, br, in_progress=in_progress)
+
+        resp = self._binary_operation(
+            operations.CREATE_OBJECT_WITH_BINARY,
             service,
             binary_stream,
             digest,
@@ -234,7 +287,11 @@ class SWORD3Client(object):
             ContentDisposition.binary_upload(filename),
             in_progress=in_progress,
         )
+        if self._dedup is not None:
+            self._dedup.record_deposit(digest, resp)
+        return resp
 
+    @instrumented("create_object_with_package")
     def create_object_with_package(
         self,
         service: typing.Union[ServiceDocument, str],
@@ -247,7 +304,8 @@ class SWORD3Client(object):
         in_progress: bool = False,
     ) -> SWORDResponse:
         """Create an object using a package of files and metadata"""
-        return self._generic_create_binary(
+        return self._binary_operation(
+            operations.CREATE_OBJECT_WITH_PACKAGE,
             service,
             binary_stream,
             digest,
@@ -258,6 +316,7 @@ class SWORD3Client(object):
             in_progress=in_progress,
         )
 
+    @instrumented("add_binary")
     def add_binary(
         self,
         status_or_object_url: typing.Union[StatusDocument, str],
@@ -268,8 +327,16 @@ class SWORD3Client(object):
         content_type: str = None,
         in_progress: bool = False,
     ) -> SWORDResponse:
-        """Add a plain binary file to the object"""
-        return self._generic_add_binary(
+        """Add a plain binary file to the object.
+
+        If the client has a dedup index which already knows this content, the file is instead appended
+        By-Reference to the existing copy"""
+        br = self._dedup_by_reference(digest, filename, content_length, content_type)
+        if br is not None:
+            return self.append_by_reference(status_or_object_url, br, in_progress=in_progress)
+
+        resp = self._binary_operation(
+            operations.ADD_BINARY,
             status_or_object_url,
             binary_stream,
             digest,
@@ -279,7 +346,11 @@ class SWORD3Client(object):
             ContentDisposition.binary_upload(filename),
             in_progress=in_progress,
         )
+        if self._dedup is not None:
+            self._dedup.record_deposit(digest, resp, self._get_url(status_or_object_url, "object_url"))
+        return resp
 
+    @instrumented("add_package")
     def add_package(
         self,
         status_or_object_url: typing.Union[StatusDocument, str],
@@ -292,7 +363,8 @@ class SWORD3Client(object):
         in_progress: bool = False,
     ) -> SWORDResponse:
         """add a package of files and metadata to the object"""
-        return self._generic_add_binary(
+        return self._binary_operation(
+            operations.ADD_PACKAGE,
             status_or_object_url,
             binary_stream,
             digest,
@@ -303,6 +375,7 @@ class SWORD3Client(object):
             in_progress=in_progress,
         )
 
+    @instrumented("replace_object_with_binary")
     def replace_object_with_binary(
         self,
         status_or_object_url: typing.Union[StatusDocument, str],
@@ -315,7 +388,8 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entire object with a single binary file (not a package).  All other content
         in the object may be lost"""
-        return self._generic_replace_binary(
+        return self._binary_operation(
+            operations.REPLACE_OBJECT_WITH_BINARY,
             status_or_object_url,
             binary_stream,
             digest,
@@ -326,6 +400,7 @@ class SWORD3Client(object):
             in_progress=in_progress,
         )
 
+    @instrumented("replace_object_with_package")
     def replace_object_with_package(
         self,
         status_or_object_url: typing.Union[StatusDocument, str],
@@ -339,7 +414,8 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entire object with a single package of files and metadata.  All other content in the
         object may be lost"""
-        return self._generic_replace_binary(
+        return self._binary_operation(
+            operations.REPLACE_OBJECT_WITH_PACKAGE,
             status_or_object_url,
             binary_stream,
             digest,
@@ -350,40 +426,10 @@ class SWORD3Client(object):
             in_progress=in_progress,
         )
 
-    def _generic_create_binary(
-        self,
-        service: typing.Union[ServiceDocument, str],
-        binary_stream: typing.IO,
-        digest: typing.Dict[str, str],
-        content_length: int,
-        content_type: str,
-        packaging: str,
-        content_disposition: ContentDisposition,
-        in_progress: bool,
-    ) -> SWORDResponse:
-
-        # get the service url.  The first argument may be the URL or the ServiceDocument
-        service_url = self._get_url(service, "service_url")
-        headers = self._binary_deposit_properties(
-            content_type,
-            packaging,
-            digest,
-            content_disposition,
-            content_length,
-            in_progress=in_progress,
-        )
-        resp = self._http.post(service_url, binary_stream, headers)
-
-        if resp.status_code in [201, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, service_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
-
-    def _generic_add_binary(
+    def _binary_operation(
         self,
-        status_or_object_url: typing.Union[StatusDocument, str],
+        spec: OperationSpec,
+        target: typing.Union[ServiceDocument, StatusDocument, str],
         binary_stream: typing.IO,
         digest: typing.Dict[str, str],
         content_length: int,
@@ -392,8 +438,6 @@ class SWORD3Client(object):
         content_disposition: ContentDisposition,
         in_progress: bool,
     ) -> SWORDResponse:
-
-        object_url = self._get_url(status_or_object_url, "object_url")
         headers = self._binary_deposit_properties(
             content_type,
             packaging,
@@ -402,44 +446,9 @@ class SWORD3Client(object):
             content_length,
             in_progress=in_progress,
         )
-        resp = self._http.post(object_url, binary_stream, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
-
-    def _generic_replace_binary(
-        self,
-        status_or_object_url: typing.Union[StatusDocument, str],
-        binary_stream: typing.IO,
-        digest: typing.Dict[str, str],
-        content_length: int,
-        content_type: str,
-        packaging: str,
-        content_disposition: ContentDisposition,
-        in_progress: bool,
-    ) -> SWORDResponse:
-
-        object_url = self._get_url(status_or_object_url, "object_url")
-        headers = self._binary_deposit_properties(
-            content_type,
-            packaging,
-            digest,
-            content_disposition,
-            content_length,
-            in_progress=in_progress,
+        return self._sword_response(
+            self._dispatch(spec, target, self._request_body(binary_stream, content_length), headers)
         )
-        resp = self._http.put(object_url, binary_stream, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
 
     def _binary_deposit_properties(
         self,
@@ -456,15 +465,17 @@ class SWORD3Client(object):
         if packaging is None:
             packaging = constants.PACKAGE_BINARY
 
-        digest_val = self._make_digest_header(digest)
-
         headers = {
             "Content-Type": content_type,
             "Content-Disposition": content_disposition.serialise(),
-            "Digest": digest_val,
             "Packaging": packaging,
         }
 
+        # the digest of streamed content may not be known until it has all been sent, in which case it is left to
+        # the server to accept the content without one
+        if digest is not None:
+            headers["Digest"] = self._make_digest_header(digest)
+
         if content_length is not None:
             headers["Content-Length"] = str(content_length)
 
@@ -477,6 +488,7 @@ class SWORD3Client(object):
     ## By-Reference Operations
     #####################################################
 
+    @instrumented("create_object_by_reference")
     def create_object_by_reference(
         self,
         service: typing.Union[ServiceDocument, str],
@@ -485,20 +497,13 @@ class SWORD3Client(object):
         in_progress: bool = False,
     ) -> SWORDResponse:
         """Create a new object with one or more By-Reference files"""
-        # get the service url.  The first argument may be the URL or the ServiceDocument
-        service_url = self._get_url(service, "service_url")
         body_bytes, headers = self._by_reference_deposit_properties(
             by_reference, digest, in_progress=in_progress
         )
-        resp = self._http.post(service_url, body_bytes, headers)
-
-        if resp.status_code in [201, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, service_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
+        # the first argument may be the URL or the ServiceDocument
+        return self._sword_response(self._dispatch(operations.CREATE_OBJECT_BY_REFERENCE, service, body_bytes, headers))
 
+    @instrumented("append_by_reference")
     def append_by_reference(self,
         status_or_object_url: typing.Union[ServiceDocument, str],
         by_reference: ByReference,
@@ -506,37 +511,28 @@ class SWORD3Client(object):
         in_progress: bool = False,
     ) -> SWORDResponse:
         """Append one or more files to the object By-Reference"""
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._by_reference_deposit_properties(
             by_reference, digest, in_progress=in_progress
         )
-        resp = self._http.post(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
+        return self._sword_response(
+            self._dispatch(operations.APPEND_BY_REFERENCE, status_or_object_url, body_bytes, headers)
+        )
 
     def _by_reference_deposit_properties(
         self, by_reference, digest, in_progress: bool = None,
     ):
-        body = json.dumps(by_reference.data)
-        body_bytes = body.encode("utf-8")
+        with phase(SERIALISE):
+            body = json.dumps(by_reference.data)
+            body_bytes = body.encode("utf-8")
         content_length = len(body_bytes)
 
         if digest is None:
-            d = hashlib.sha256(body_bytes)
-            digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest())}
-        digest_val = self._make_digest_header(digest)
-
-        headers = {
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": content_length,
-            "Content-Disposition": ContentDisposition.by_reference_upload().serialise(),
-            "Digest": digest_val
-        }
+            with phase(DIGEST):
+                d = hashlib.sha256(body_bytes)
+                digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest()).decode("ascii")}
+        headers = dict(operations.BY_REFERENCE_HEADERS)
+        headers["Content-Length"] = str(content_length)
+        headers["Digest"] = self._make_digest_header(digest)
 
         if in_progress is not None:
             headers["In-Progress"] = "true" if in_progress else "false"
@@ -547,6 +543,7 @@ class SWORD3Client(object):
     ## MD+BR methods
     #####################################################
 
+    @instrumented("create_object_with_metadata_and_by_reference")
     def create_object_with_metadata_and_by_reference(
             self,
             service: typing.Union[ServiceDocument, str],
@@ -556,20 +553,13 @@ class SWORD3Client(object):
             in_progress: bool = False,
     ) -> SWORDResponse:
         """Create a new object with default sword metadata and one or more By-Reference files"""
-        # get the service url.  The first argument may be the URL or the ServiceDocument
-        service_url = self._get_url(service, "service_url")
         body_bytes, headers = self._mdbr_deposit_properties(
             metadata_and_by_reference, digest, metadata_format, in_progress
         )
-        resp = self._http.post(service_url, body_bytes, headers)
-
-        if resp.status_code in [201, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, service_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
+        # the first argument may be the URL or the ServiceDocument
+        return self._sword_response(self._dispatch(operations.CREATE_OBJECT_WITH_MDBR, service, body_bytes, headers))
 
+    @instrumented("append_metadata_and_by_reference")
     def append_metadata_and_by_reference(self,
             status_or_object_url: typing.Union[ServiceDocument, str],
             metadata_and_by_reference: MetadataAndByReference,
@@ -578,18 +568,10 @@ class SWORD3Client(object):
             in_progress: bool = False,
     ) -> SWORDResponse:
         """Append both metadata and one or more By-Reference files to the existing metadata and file content of the object"""
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._mdbr_deposit_properties(
             metadata_and_by_reference, digest,  metadata_format, in_progress=in_progress,
         )
-        resp = self._http.post(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
+        return self._sword_response(self._dispatch(operations.APPEND_MDBR, status_or_object_url, body_bytes, headers))
 
     def _mdbr_deposit_properties(self,
                                  metadata_and_by_reference:MetadataAndByReference,
@@ -597,25 +579,22 @@ class SWORD3Client(object):
                                  metadata_format: str = None,
                                  in_progress: bool = False,
                                  ):
-        body = json.dumps(metadata_and_by_reference.data)
-        body_bytes = body.encode("utf-8")
+        with phase(SERIALISE):
+            body = json.dumps(metadata_and_by_reference.data)
+            body_bytes = body.encode("utf-8")
         content_length = len(body_bytes)
 
         if digest is None:
-            d = hashlib.sha256(body_bytes)
-            digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest())}
-        digest_val = self._make_digest_header(digest)
-
+            with phase(DIGEST):
+                d = hashlib.sha256(body_bytes)
+                digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest()).decode("ascii")}
         if metadata_format is None:
             metadata_format = constants.URI_METADATA
 
-        headers = {
-            "Content-Type": "application/json; charset=UTF-8",
-            "Content-Length": content_length,
-            "Content-Disposition": ContentDisposition.metadata_and_by_reference_upload().serialise(),
-            "Digest": digest_val,
-            "Metadata-Format" : metadata_format
-        }
+        headers = dict(operations.MDBR_HEADERS)
+        headers["Content-Length"] = str(content_length)
+        headers["Digest"] = self._make_digest_header(digest)
+        headers["Metadata-Format"] = metadata_format
 
         if in_progress is not None:
             headers["In-Progress"] = "true" if in_progress else "false"
@@ -626,6 +605,7 @@ class SWORD3Client(object):
     ## Segmented file deposit operations
     #####################################################
 
+    @instrumented("create_object_with_temporary_file")
     def create_object_with_temporary_file(
         self,
         service: typing.Union[ServiceDocument, str],
@@ -649,6 +629,7 @@ class SWORD3Client(object):
                     )
         return self.create_object_by_reference(service, br, in_progress=in_progress)
 
+    @instrumented("append_temporary_file")
     def append_temporary_file(
         self,
         status_or_object_url: typing.Union[ServiceDocument, str],
@@ -676,64 +657,87 @@ class SWORD3Client(object):
     ## Object level protocol operations
     #####################################################
 
+    @instrumented("get_object")
     def get_object(
-        self, sword_object: typing.Union[StatusDocument, str]
-    ) -> StatusDocument:
-        """"Retrieve a current-state representation of the object as a Status Document"""
-        # get the status url.  The first argument may be the URL or the StatusDocument
-        object_url = self._get_url(sword_object, "object_url")
-        resp = self._http.get(object_url)
-
-        if resp.status_code == 200:
-            data = json.loads(resp.body)
-            try:
-                return StatusDocument(data)
-            except exceptions.SeamlessException as e:
-                raise exceptions.InvalidDataFromServer(
-                    "Object retrieval got invalid status document: {x}".format(x=e.message),
-                    response=resp,
-                    request_url=object_url
-                ) from e
+        self,
+        sword_object: typing.Union[StatusDocument, str],
+        if_none_match: str = None,
+        rels: typing.Collection[str] = None,
+    ) -> typing.Optional[StatusDocument]:
+        """"Retrieve a current-state representation of the object as a Status Document.
+
+        If ``if_none_match`` is given (the eTag of a Status Document you already have), the request is conditional,
+        and None is returned if the object has not changed.
+
+        If ``rels`` is given, the Status Document is parsed incrementally as it is received, and only the links with
+        one of those rels are kept, which saves time and memory for objects with very many files.  To look at the
+        links one at a time, see :meth:`iter_links`."""
+        # the first argument may be the URL or the StatusDocument
+        if if_none_match is not None:
+            resp = self._dispatch(operations.GET_OBJECT_IF_CHANGED, sword_object,
+                                  headers={"If-None-Match": if_none_match}, stream=rels is not None)
+            if resp.status_code == 304:
+                if rels is not None:
+                    resp.__exit__()
+                return None
         else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 410, 412]
-            )
+            resp = self._dispatch(operations.GET_OBJECT, sword_object, stream=rels is not None)
 
+        try:
+            if rels is not None:
+                try:
+                    data = jsonstream.load_status(resp.stream, rels)
+                finally:
+                    resp.__exit__()
+            else:
+                data = json.loads(resp.body)
+            return StatusDocument(data)
+        except exceptions.SeamlessException as e:
+            raise exceptions.InvalidDataFromServer(
+                "Object retrieval got invalid status document: {x}".format(x=e.message),
+                response=resp,
+                request_url=self._get_url(sword_object, "object_url")
+            ) from e
+
+    def iter_links(
+        self, sword_object: typing.Union[StatusDocument, str], rels: typing.Collection[str] = None
+    ) -> typing.Iterator[dict]:
+        """Retrieve the object's Status Document, yielding its links (optionally only those with one of ``rels``)
+        one at a time, as they are parsed from the response.  Only one link is in memory at once, so the first
+        is available as soon as it arrives, however many files the object has."""
+        object_url = self._get_url(sword_object, "object_url")
+        with (Operation(self, "iter_links", object_url) if self._listeners else contextlib.nullcontext()):
+            resp = self._dispatch(operations.GET_OBJECT, object_url, stream=True)
+        try:
+            for link in jsonstream.iter_links(resp.stream, rels):
+                yield link
+        finally:
+            resp.__exit__()
+
+    @instrumented("delete_object")
     def delete_object(
         self, sword_object: typing.Union[StatusDocument, str]
     ) -> SWORDResponse:
         """Delete the entire object"""
-        object_url = self._get_url(sword_object, "object_url")
-        resp = self._http.delete(object_url)
-
-        if resp.status_code in [202, 204]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 405, 412]
-            )
+        return self._sword_response(self._dispatch(operations.DELETE_OBJECT, sword_object))
 
+    @instrumented("replace_object_by_reference")
     def replace_object_by_reference(self,
         status_or_object_url: typing.Union[StatusDocument, str],
         by_reference: ByReference,
         digest: typing.Dict[str, str] = None,
         in_progress: bool = False,
     ) -> SWORDResponse:
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._by_reference_deposit_properties(
             by_reference,
             digest,
             in_progress=in_progress
         )
-        resp = self._http.put(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 412, 413, 415]
-            )
+        return self._sword_response(
+            self._dispatch(operations.REPLACE_OBJECT_BY_REFERENCE, status_or_object_url, body_bytes, headers)
+        )
 
+    @instrumented("replace_object_with_metadata_and_by_reference")
     def replace_object_with_metadata_and_by_reference(
             self,
             status_or_object_url: typing.Union[StatusDocument, str],
@@ -744,19 +748,14 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entire object with the metadata and one or more By-Reference files.  All other content of the
         object may be lost"""
-        object_url = self._get_url(status_or_object_url, "object_url")
         body_bytes, headers = self._mdbr_deposit_properties(
             metadata_and_by_reference, digest, metadata_format, in_progress=in_progress
         )
-        resp = self._http.put(object_url, body_bytes, headers)
-
-        if resp.status_code in [200, 202]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, object_url, [400, 401, 403, 404, 405, 412, 413, 415]
-            )
+        return self._sword_response(
+            self._dispatch(operations.REPLACE_OBJECT_WITH_MDBR, status_or_object_url, body_bytes, headers)
+        )
 
+    @instrumented("replace_object_with_temporary_file")
     def replace_object_with_temporary_file(self,
             status_or_object_url: typing.Union[StatusDocument, str],
             temporary_url: str,
@@ -786,28 +785,23 @@ class SWORD3Client(object):
 
     def get_file(self, file_url: str):
         """Obtain a stream-like object to access the content of a file at the given file URL"""
+        # the HTTP layer in use now, rather than when the stream is opened
+        http = self._http
+
         @contextlib.contextmanager
         def file_getter():
-            resp = self._http.get(file_url, stream=True)
-            resp.__enter__()
-
-            if resp.status_code >= 400:
-                self._raise_for_status_code(
-                    resp, file_url, [400, 401, 403, 404, 405, 412]
-                )
-            if resp.status_code != 200:
-                raise exceptions.UnexpectedSwordException(
-                    "Unexpected status code; unable to retrieve file",
-                    response=resp,
-                    request_url=file_url,
-                    status_code=resp.status_code
-                )
-
-            yield resp.stream
-            resp.__exit__()
+            with (Operation(self, "get_file", file_url) if self._listeners else contextlib.nullcontext()):
+                resp = self._dispatch(operations.GET_FILE, file_url, stream=True, http=http)
+                resp.__enter__()
+            try:
+                yield resp.stream
+            finally:
+                # closed even if the caller raises while reading
+                resp.__exit__()
 
         return file_getter()
 
+    @instrumented("replace_file")
     def replace_file(
         self,
         file_url: str,
@@ -826,24 +820,16 @@ class SWORD3Client(object):
             content_length,
         )
 
-        resp = self._http.put(file_url, binary_stream, headers)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, file_url, [400, 401, 403, 404, 405, 412, 413]
-            )
+        return self._sword_response(self._dispatch(
+            operations.REPLACE_FILE, file_url, self._request_body(binary_stream, content_length), headers
+        ))
 
+    @instrumented("delete_file")
     def delete_file(self, file_url: str):
         """Delete a single binary file"""
-        resp = self._http.delete(file_url)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(resp, file_url, [400, 401, 403, 404, 405, 412])
+        return self._sword_response(self._dispatch(operations.DELETE_FILE, file_url))
 
+    @instrumented("replace_file_by_reference")
     def replace_file_by_reference(
             self,
             file_url: str,
@@ -855,16 +841,9 @@ class SWORD3Client(object):
             by_reference,
             digest
         )
+        return self._sword_response(self._dispatch(operations.REPLACE_FILE_BY_REFERENCE, file_url, body_bytes, headers))
 
-        resp = self._http.put(file_url, body_bytes, headers)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, file_url, [400, 401, 403, 404, 405, 412, 413]
-            )
-
+    @instrumented("replace_file_with_temporary_file")
     def replace_file_with_temporary_file(
             self,
             file_url: str,
@@ -889,6 +868,7 @@ class SWORD3Client(object):
     ## Fileset protocol operations
     ###########################################################
 
+    @instrumented("replace_fileset_with_binary")
     def replace_fileset_with_binary(
         self,
         status_or_fileset_url: typing.Union[StatusDocument, str],
@@ -900,38 +880,27 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entire FileSet with a single binary file.  All other files in the fileset may be lost (not all files
         the server holds may be in the fileset).  Metadata will persist."""
-        fileset_url = self._get_url(status_or_fileset_url, "fileset_url")
-        headers = self._binary_deposit_properties(
+        return self._binary_operation(
+            operations.REPLACE_FILESET_WITH_BINARY,
+            status_or_fileset_url,
+            binary_stream,
+            digest,
+            content_length,
             content_type,
             None,
-            digest,
             ContentDisposition.binary_upload(filename),
-            content_length,
+            in_progress=None,
         )
-        resp = self._http.put(fileset_url, binary_stream, headers)
-
-        if resp.status_code in [202, 204]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, fileset_url, [400, 401, 403, 404, 405, 412, 413]
-            )
 
+    @instrumented("delete_fileset")
     def delete_fileset(
         self, status_or_fileset_url: typing.Union[StatusDocument, str]
     ) -> SWORDResponse:
         """Delete all of the files in the FileSet.  All other files in the fileset may be lost (not all files
         the server holds may be in the fileset).  Metadata will persist."""
-        fileset_url = self._get_url(status_or_fileset_url, "fileset_url")
-        resp = self._http.delete(fileset_url)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, fileset_url, [400, 401, 403, 404, 405, 412]
-            )
+        return self._sword_response(self._dispatch(operations.DELETE_FILESET, status_or_fileset_url))
 
+    @instrumented("replace_fileset_by_reference")
     def replace_fileset_by_reference(self,
         status_or_fileset_url: typing.Union[StatusDocument, str],
         by_reference: ByReference,
@@ -939,20 +908,15 @@ class SWORD3Client(object):
     ) -> SWORDResponse:
         """Replace the entire FileSet with one or more By-Reference files.  All other files in the fileset may be lost (not all files
         the server holds may be in the fileset).  Metadata will persist."""
-        fileset_url = self._get_url(status_or_fileset_url, "fileset_url")
         body_bytes, headers = self._by_reference_deposit_properties(
             by_reference,
             digest,
         )
-        resp = self._http.put(fileset_url, body_bytes, headers)
-
-        if resp.status_code in [202, 204]:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, fileset_url, [400, 401, 403, 404, 405, 412, 413]
-            )
+        return self._sword_response(
+            self._dispatch(operations.REPLACE_FILESET_BY_REFERENCE, status_or_fileset_url, body_bytes, headers)
+        )
 
+    @instrumented("replace_fileset_with_temporary_file")
     def replace_fileset_with_temporary_file(self,
             status_or_fileset_url: typing.Union[StatusDocument, str],
             temporary_url: str,
@@ -978,6 +942,7 @@ class SWORD3Client(object):
     ## Segmented upload operations
     ###########################################################
 
+    @instrumented("initialise_segmented_upload")
     def initialise_segmented_upload(self,
                                     service: typing.Union[ServiceDocument, str],
                                     assembled_size: int,
@@ -986,8 +951,6 @@ class SWORD3Client(object):
                                     digest: typing.Dict[str, str] = None
                                     ) -> SWORDResponse:
         """Initialise the process of uploading a large file via segmented upload"""
-        staging_url = self._get_url(service, "staging_url")
-
         digest_val = None
         if digest is not None:
             digest_val = self._make_digest_header(digest)
@@ -999,20 +962,10 @@ class SWORD3Client(object):
             segment_size
         )
 
-        headers = {
-            "Content-Length" : 0,
-            "Content-Disposition" : disp.serialise()
-        }
-
-        resp = self._http.post(staging_url, None, headers)
-
-        if resp.status_code == 201:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, staging_url, [400, 401, 403, 404, 412, 413]
-            )
+        headers = {"Content-Disposition": disp.serialise()}
+        return self._sword_response(self._dispatch(operations.INITIALISE_SEGMENTED_UPLOAD, service, None, headers))
 
+    @instrumented("upload_file_segment")
     def upload_file_segment(self,
                             temporary_url: str,
                             binary_stream: typing.IO,
@@ -1023,67 +976,146 @@ class SWORD3Client(object):
         """Upload a single segment of a large file to the Temporary URL"""
         disp = ContentDisposition.upload_file_segment(segment_number)
 
-        headers = {
-            "Content-Disposition" : disp.serialise(),
-            "Content-Type": "application/octet-stream"
-        }
+        headers = {"Content-Disposition": disp.serialise()}
 
         if digest is not None:
             digest_val = self._make_digest_header(digest)
             headers["Digest"] = digest_val
 
         if content_length is not None:
-            headers["Content-Length"] = content_length
+            headers["Content-Length"] = str(content_length)
 
-        resp = self._http.post(temporary_url, binary_stream, headers)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, temporary_url, [400, 401, 403, 404, 405, 412]
-            )
+        return self._sword_response(self._dispatch(
+            operations.UPLOAD_FILE_SEGMENT, temporary_url, self._request_body(binary_stream, content_length), headers
+        ))
 
+    @instrumented("abort_segmented_upload")
     def abort_segmented_upload(self, temporary_url: str) -> SWORDResponse:
         """Abort the segmented upload.  After this you will need to initialise again if you wish to try again"""
-        resp = self._http.delete(temporary_url)
-
-        if resp.status_code == 204:
-            return SWORDResponse(resp)
-        else:
-            self._raise_for_status_code(
-                resp, temporary_url, [400, 401, 403, 404]
-            )
+        return self._sword_response(self._dispatch(operations.ABORT_SEGMENTED_UPLOAD, temporary_url))
 
+    @instrumented("segmented_upload_status")
     def segmented_upload_status(self,
                                      temporary_url: str
                                      ) -> SegmentedFileUpload:
         """Get a status report on the state of your segmented upload"""
-        resp = self._http.get(temporary_url)
+        resp = self._dispatch(operations.SEGMENTED_UPLOAD_STATUS, temporary_url)
+        data = json.loads(resp.body)
+        try:
+            return SegmentedFileUpload(data)
+        except exceptions.SeamlessException as e:
+            raise exceptions.InvalidDataFromServer(
+                "Segmented File Upload retrieval got invalid information document: {x}".format(x=e.message),
+                response=resp
+            ) from e
 
-        if resp.status_code == 200:
-            data = json.loads(resp.body)
-            try:
-                return SegmentedFileUpload(data)
-            except exceptions.SeamlessException as e:
-                raise exceptions.InvalidDataFromServer(
-                    "Segmented File Upload retrieval got invalid information document: {x}".format(x=e.message),
-                    response=resp
-                ) from e
-        else:
-            self._raise_for_status_code(
-                resp, temporary_url, [400, 401, 403, 404]
-            )
+    ###########################################################
+    ## Working copy operations
+    ###########################################################
+
+    def sync_directory(self,
+                       local_dir: str,
+                       status_or_object_url: typing.Union[StatusDocument, str],
+                       max_workers: int = 4,
+                       state_path: str = None,
+                       digest_cache: "DigestCache" = None
+                       ) -> "SyncResult":
+        """Bring the object's files up to date with a local directory, sending only the files which have changed
+        since the last sync.  New files are added, changed files replaced, and files removed locally are deleted
+        from the object, with up to ``max_workers`` requests in flight at once.
+
+        The File-URLs and digests of the synced files are remembered in a state file in the directory (or at
+        ``state_path``), and file digests are cached so that unchanged files are not read again."""
+        # imported here as syncing needs a thread pool, which is slow to import and rarely used
+        from sword3client.sync import DirectorySync
+        return DirectorySync(
+            self,
+            local_dir,
+            status_or_object_url,
+            max_workers=max_workers,
+            state_path=state_path,
+            digest_cache=digest_cache
+        ).run()
 
     ###########################################################
     ## Utility methods
     ###########################################################
 
+    def _dedup_by_reference(self, digest, filename, content_length, content_type) -> typing.Optional[ByReference]:
+        """If the dedup index knows where this content already is, the By-Reference document to deposit it from there"""
+        if self._dedup is None:
+            return None
+        url = self._dedup.lookup(digest)
+        if url is None:
+            return None
+
+        br = ByReference()
+        br.add_file(url,
+                    filename,
+                    content_type if content_type is not None else "application/octet-stream",
+                    True,
+                    content_length=content_length,
+                    digest=digest
+                    )
+        return br
+
+    def _dispatch(
+        self,
+        spec: OperationSpec,
+        target: typing.Union[ServiceDocument, StatusDocument, str],
+        body=None,
+        headers: typing.Dict[str, str] = None,
+        stream: bool = False,
+        http: HttpLayer = None,
+    ) -> HttpResponse:
+        """Make the request of a protocol operation, returning the response if it is one of the operation's
+        successes, or raising the SWORD exception for it if not.  ``target`` is the URL, or the document holding it.
+        The request is made with ``http``, if given, rather than the HTTP layer of the current context.
+
+        Every protocol request goes through here, so anything which should apply to all of them belongs here.
+        Retries and caching are left to the HTTP layer, which can be wrapped to add them (as the instrumentation,
+        bandwidth and network emulation layers are)"""
+        url = self._get_url(target, spec.url_property)
+        if spec.headers is not None:
+            headers = spec.headers if headers is None else {**spec.headers, **headers}
+        if http is None:
+            http = self._http
+
+        method = spec.method
+        if method == operations.GET:
+            resp = http.get(url, headers=headers, stream=stream)
+        elif method == operations.POST:
+            resp = http.post(url, body, headers)
+        elif method == operations.PUT:
+            resp = http.put(url, body, headers)
+        else:
+            resp = http.delete(url)
+
+        if resp.status_code in spec.success:
+            return resp
+        try:
+            self._raise_for_status_code(resp, url, spec.errors, request_context=spec.request_context)
+        finally:
+            # a streamed response holds its connection until it is closed
+            if stream:
+                resp.__exit__()
+
+    def _sword_response(self, resp: HttpResponse) -> SWORDResponse:
+        return SWORDResponse(resp, lazy=self._lazy_responses)
+
     def _get_url(self, source, url_property: str):
         if isinstance(source, str):
             return source
         return getattr(source, url_property)
 
+    def _request_body(self, binary_stream, content_length: int = None):
+        """The body to send for binary content: as given, or, if its length isn't known, a ChunkedBody so that it
+        goes out with chunked transfer encoding in the client's chunk size"""
+        if content_length is not None or isinstance(binary_stream, streams.ChunkedBody) \
+                or not streams.length_unknown(binary_stream):
+            return binary_stream
+        return streams.ChunkedBody(binary_stream, self._chunk_size)
+
     def _make_digest_header(self, digest: typing.Dict[str, str]):
         digest_parts = []
         for k, v in digest.items():
@@ -1158,26 +1190,3 @@ class SWORD3Client(object):
                        error_doc=error_doc,
                        request_url=request_url
         )
-
-    #################################################
-    ## Experiment, ingore for now
-    #################################################
-
-    """
-    # Could put this in sword common
-    CODES = {
-        ("put", "object_url") : {"success" : [200, 202], "error" : [400, 401, 403]}
-    }
-
-    def _sword(self, url_or_obj, url_type, method, payload, request_generator, response_wrapper, request_context):
-        url = self._get_url(url_or_obj, url_type)
-
-        body_bytes_or_stream, headers = request_generator(payload)
-        resp = getattr(self._http, method)(url, body_bytes_or_stream, headers)
-
-        codes = SWORD3Client.CODES.get((method, url_type))
-        if resp.status_code in codes["success"]:
-            return response_wrapper(resp)
-        else:
-            self._raise_for_status_code(resp, url, expected=codes["error"], request_context=request_context)
-    """
\ No newline at end of file
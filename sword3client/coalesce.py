@@ -0,0 +1,188 @@
+from sword3client.models.sword_response import SWORDResponse
+
+from sword3common import (
+    StatusDocument,
+    Metadata,
+    ByReference,
+    MetadataAndByReference,
+    constants,
+)
+
+from concurrent.futures import Future
+
+import typing
+import threading
+import contextlib
+
+
+class _Group(object):
+    """The appends queued for one object, with the same metadata format and In-Progress flag"""
+
+    def __init__(self):
+        self.metadata = []  # type: typing.List[Metadata]
+        self.by_reference = []  # type: typing.List[ByReference]
+        self.futures = []  # type: typing.List[Future]
+
+
+class CoalescingClient(object):
+    """Merges appends against the same object into as few requests as possible.
+
+    Calls to :meth:`append_metadata` and :meth:`append_by_reference` are queued rather than sent, and return a
+    :class:`~concurrent.futures.Future`.  When the queue is flushed (at the end of a :meth:`batch`, after
+    ``window`` seconds, or on an explicit :meth:`flush`), the appends for each object are combined:
+
+    * several By-Reference appends become a single By-Reference document
+    * metadata appends are merged into one metadata document, with later values for a field taking precedence
+    * metadata and By-Reference appends together become one Metadata+By-Reference request
+
+    Every Future for the appends merged into a request is resolved with that request's response (or exception).
+
+    If there is no ``window``, appends made outside of a :meth:`batch` are sent straight away.  Appends with an
+    explicit digest can't be merged, as the digest is of the body, so they are also sent straight away.
+    """
+
+    def __init__(self, client, window: float = None):
+        self._client = client
+        self._window = window
+        self._lock = threading.Lock()
+        self._groups = {}  # type: typing.Dict[tuple, _Group]
+        self._depth = 0
+        self._timer = None
+
+    @property
+    def client(self):
+        return self._client
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue every append made inside the context, and send them, merged, when it exits"""
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                outermost = self._depth == 0
+            if outermost:
+                self.flush()
+
+    def append_metadata(
+        self,
+        status_or_object_url: typing.Union[StatusDocument, str],
+        metadata: Metadata,
+        digest: typing.Dict[str, str] = None,
+        metadata_format: str = None,
+        in_progress: bool = False,
+    ) -> Future:
+        """Queue metadata to be appended to the object"""
+        if digest is not None:
+            return self._now(
+                self._client.append_metadata, status_or_object_url, metadata, digest, metadata_format, in_progress
+            )
+        return self._queue(status_or_object_url, metadata_format, in_progress, metadata=metadata)
+
+    def append_by_reference(
+        self,
+        status_or_object_url: typing.Union[StatusDocument, str],
+        by_reference: ByReference,
+        digest: typing.Dict[str, str] = None,
+        in_progress: bool = False,
+    ) -> Future:
+        """Queue one or more By-Reference files to be appended to the object"""
+        if digest is not None:
+            return self._now(self._client.append_by_reference, status_or_object_url, by_reference, digest, in_progress)
+        return self._queue(status_or_object_url, None, in_progress, by_reference=by_reference)
+
+    def flush(self):
+        """Send everything that is queued"""
+        with self._lock:
+            groups = self._groups
+            self._groups = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        for (object_url, metadata_format, in_progress), group in groups.items():
+            try:
+                resp = self._send(object_url, metadata_format, in_progress, group)
+            except Exception as e:
+                for future in group.futures:
+                    future.set_exception(e)
+            else:
+                for future in group.futures:
+                    future.set_result(resp)
+
+    def _queue(self, status_or_object_url, metadata_format, in_progress, metadata=None, by_reference=None) -> Future:
+        object_url = status_or_object_url
+        if isinstance(status_or_object_url, StatusDocument):
+            object_url = status_or_object_url.object_url
+        if metadata_format is None:
+            metadata_format = constants.URI_METADATA
+
+        future = Future()
+        with self._lock:
+            group = self._groups.get((object_url, metadata_format, in_progress))
+            if group is None:
+                group = _Group()
+                self._groups[(object_url, metadata_format, in_progress)] = group
+            if metadata is not None:
+                group.metadata.append(metadata)
+            if by_reference is not None:
+                group.by_reference.append(by_reference)
+            group.futures.append(future)
+
+            batching = self._depth > 0
+            if not batching and self._window is not None and self._timer is None:
+                self._timer = threading.Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if not batching and self._window is None:
+            self.flush()
+        return future
+
+    def _now(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _send(self, object_url, metadata_format, in_progress, group: _Group) -> SWORDResponse:
+        metadata = self._merge_metadata(group.metadata)
+        by_reference = self._merge_by_reference(group.by_reference)
+
+        if metadata is not None and by_reference is not None:
+            return self._client.append_metadata_and_by_reference(
+                object_url,
+                MetadataAndByReference(metadata, by_reference),
+                metadata_format=metadata_format,
+                in_progress=in_progress
+            )
+        if metadata is not None:
+            return self._client.append_metadata(
+                object_url, metadata, metadata_format=metadata_format, in_progress=in_progress
+            )
+        return self._client.append_by_reference(object_url, by_reference, in_progress=in_progress)
+
+    def _merge_metadata(self, documents: typing.List[Metadata]) -> typing.Optional[Metadata]:
+        if len(documents) == 0:
+            return None
+        if len(documents) == 1:
+            return documents[0]
+        data = {}
+        for document in documents:
+            data.update(document.data)
+        return Metadata(data)
+
+    def _merge_by_reference(self, documents: typing.List[ByReference]) -> typing.Optional[ByReference]:
+        if len(documents) == 0:
+            return None
+        if len(documents) == 1:
+            return documents[0]
+        files = []
+        for document in documents:
+            files += document.data.get("byReferenceFiles", [])
+        return ByReference({"byReferenceFiles": files})
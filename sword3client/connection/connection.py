@@ -15,6 +15,19 @@ class HttpLayer(object):
     def delete(self, url):
         raise NotImplementedError
 
+    def _get_headers(self, headers):
+        """The headers of a request, with the layer's own headers (which take precedence) added"""
+        if headers is None and self._headers is None:
+            return None
+        if headers is None:
+            return self._headers
+        if self._headers is None:
+            return headers
+        # don't modify the caller's headers, which may be shared
+        merged = dict(headers)
+        merged.update(self._headers)
+        return merged
+
 
 class HttpResponse(object):
     def __enter__(self):
@@ -31,6 +44,13 @@ class HttpResponse(object):
     def body(self):
         raise NotImplementedError
 
+    @property
+    def content(self) -> bytes:
+        """The body as bytes, as they were received.  Layers which hold the bytes should return them, rather than
+        encoding ``body`` again"""
+        body = self.body
+        return body.encode("utf-8") if body else b""
+
     @property
     def stream(self):
         raise NotImplementedError
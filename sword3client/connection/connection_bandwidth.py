@@ -0,0 +1,71 @@
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client.connection.connection_netem import ThrottledHttpResponse
+from sword3client.lib.throttle import BandwidthManager, throttled_body
+
+
+class BandwidthHttpLayer(HttpLayer):
+    """Wraps another HttpLayer, so that its requests share the bandwidth of ``upload`` and ``download``, which are
+    :class:`~sword3client.lib.throttle.BandwidthManager` s, one for each direction (either may be None, for no
+    limit).
+
+    Each request body and each response is a transfer of weight ``weight``, throttled as it is read.  Give the
+    same managers to every layer (and every client) which should share the ceiling, and use :meth:`weighted` for
+    work which should get a larger or smaller share::
+
+        uplink = BandwidthManager(10_000_000)
+        http = BandwidthHttpLayer(RequestsHttpLayer(), upload=uplink)
+        client = SWORD3Client(http=http)
+        with client.using(http.weighted(0.25)):
+            client.create_object_with_binary(...)       # bulk, in the background
+    """
+
+    def __init__(self, http: HttpLayer, upload: BandwidthManager = None, download: BandwidthManager = None,
+                 weight: float = 1.0):
+        super(BandwidthHttpLayer, self).__init__()
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.http = http
+        self.upload = upload
+        self.download = download
+        self.weight = weight
+
+    def weighted(self, weight: float) -> "BandwidthHttpLayer":
+        """A layer over the same HTTP layer and managers, whose transfers have weight ``weight``"""
+        return BandwidthHttpLayer(self.http, self.upload, self.download, weight)
+
+    def get(self, url, headers=None, stream=False):
+        return self._response(self.http.get(url, headers=headers, stream=stream), stream)
+
+    def put(self, url, data, headers=None):
+        return self._response(self.http.put(url, self._upload(data), headers=self._headers_for(data, headers)))
+
+    def post(self, url, data, headers=None):
+        return self._response(self.http.post(url, self._upload(data), headers=self._headers_for(data, headers)))
+
+    def delete(self, url):
+        return self.http.delete(url)
+
+    def _headers_for(self, data, headers):
+        """A body in memory is sent as a stream, so that it can be throttled; give its length, so that it is still
+        sent with a Content-Length (rather than chunked) by layers which don't work it out for themselves"""
+        if self.upload is None or not isinstance(data, (bytes, bytearray, str)):
+            return headers
+        if headers is not None and any(k.lower() == "content-length" for k in headers):
+            return headers
+        length = len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+        return {**(headers or {}), "Content-Length": str(length)}
+
+    def _upload(self, data):
+        if self.upload is None:
+            return data
+        return throttled_body(data, [self.upload.transfer(self.weight)])
+
+    def _response(self, resp: HttpResponse, stream: bool = False) -> HttpResponse:
+        if self.download is None:
+            return resp
+        transfer = self.download.transfer(self.weight)
+        if not stream:
+            # the bytes as they arrived, rather than the length of the decoded text
+            transfer.consume_chunks(len(resp.content))
+            return resp
+        return ThrottledHttpResponse(resp, [transfer])
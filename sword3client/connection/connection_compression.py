@@ -0,0 +1,177 @@
+from sword3client.connection import HttpLayer
+
+from urllib.parse import urlsplit
+
+import gzip
+import zlib
+import base64
+import typing
+import hashlib
+import threading
+
+GZIP = "gzip"
+DEFLATE = "deflate"
+ENCODINGS = (GZIP, DEFLATE)
+
+# the media types of the JSON documents the client builds: metadata, By-Reference and Metadata+By-Reference
+JSON_TYPES = ("application/json", "application/ld+json")
+
+_DIGESTS = {
+    "SHA-256": hashlib.sha256,
+    "SHA-512": hashlib.sha512,
+    "SHA": hashlib.sha1,
+    "MD5": hashlib.md5,
+}
+
+
+def encode(content: bytes, encoding: str, level: int = 6) -> bytes:
+    """Apply a content coding (gzip or deflate) to a body"""
+    if encoding == GZIP:
+        return gzip.compress(content, compresslevel=level, mtime=0)
+    if encoding == DEFLATE:
+        return zlib.compress(content, level)
+    raise ValueError("Unsupported content coding {x}".format(x=encoding))
+
+
+def decode(content: bytes, encoding: typing.Optional[str]) -> bytes:
+    """Remove a content coding from a body.  Bodies with no coding, or one which isn't known, are returned as
+    they are"""
+    encoding = (encoding or "").strip().lower()
+    if encoding in (GZIP, "x-gzip"):
+        return gzip.decompress(content)
+    if encoding == DEFLATE:
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            # some servers send raw deflate, without the zlib wrapper
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
+
+
+def redigest(value: str, content: bytes) -> typing.Optional[str]:
+    """The Digest header ``value`` recomputed over ``content``, with the same algorithms, or None if it uses an
+    algorithm which can't be computed here"""
+    parts = []
+    for part in value.split(","):
+        if "=" not in part:
+            continue
+        algorithm = part.split("=", 1)[0].strip()
+        digest = _DIGESTS.get(algorithm.upper())
+        if digest is None:
+            return None
+        parts.append("{x}={y}".format(x=algorithm, y=base64.b64encode(digest(content).digest()).decode("ascii")))
+    return ", ".join(parts)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return "{s}://{n}".format(s=parts.scheme, n=parts.netloc).lower()
+
+
+class CompressingHttpLayer(HttpLayer):
+    """Wraps another HttpLayer, compressing the JSON request bodies the client builds (metadata, By-Reference and
+    Metadata+By-Reference documents) and asking for compressed responses.
+
+    * Bodies of one of ``content_types`` of at least ``threshold`` bytes are sent with ``encoding`` (gzip or
+      deflate) as their ``Content-Encoding``.  Binary content and packages, which are usually compressed already,
+      are sent as they are
+    * The ``Digest`` of a compressed body is computed over the compressed bytes, as that is the representation
+      sent, so that a server can check it before decoding.  A body whose digest uses an algorithm which can't be
+      recomputed is sent uncompressed
+    * ``endpoints`` maps URL prefixes (such as a server's base URL) to the encoding to use for requests to them,
+      or to None to never compress them; the longest matching prefix wins
+    * If a server refuses a compressed body with 415 (Unsupported Media Type) it is sent again uncompressed, and
+      nothing more is compressed for that server
+    * ``Accept-Encoding`` is sent with every request, unless it is already set.  Compressed responses are decoded
+      by the HTTP layer being wrapped, as they arrive, so streamed responses are decoded as they are read"""
+
+    def __init__(
+        self,
+        http: HttpLayer,
+        encoding: typing.Optional[str] = GZIP,
+        threshold: int = 1024,
+        level: int = 6,
+        endpoints: typing.Dict[str, typing.Optional[str]] = None,
+        content_types: typing.Sequence[str] = JSON_TYPES,
+        accept_encoding: str = "gzip, deflate",
+    ):
+        super(CompressingHttpLayer, self).__init__()
+        for e in [encoding] + list((endpoints or {}).values()):
+            if e is not None and e not in ENCODINGS:
+                raise ValueError("Unsupported content coding {x}".format(x=e))
+        self.http = http
+        self.encoding = encoding
+        self.threshold = threshold
+        self.level = level
+        self.content_types = tuple(content_types)
+        self.accept_encoding = accept_encoding
+        # longest prefix first, so that the first match is the most specific
+        self._endpoints = sorted((endpoints or {}).items(), key=lambda e: len(e[0]), reverse=True)
+        self._refused = set()  # type: typing.Set[str]
+        self._lock = threading.Lock()
+
+    def encoding_for(self, url: str) -> typing.Optional[str]:
+        """The content coding to use for request bodies sent to ``url``, or None if they aren't compressed"""
+        with self._lock:
+            if _origin(url) in self._refused:
+                return None
+        for prefix, encoding in self._endpoints:
+            if url.startswith(prefix):
+                return encoding
+        return self.encoding
+
+    def get(self, url, headers=None, stream=False):
+        return self.http.get(url, headers=self._accept(headers), stream=stream)
+
+    def put(self, url, data, headers=None):
+        return self._send(self.http.put, url, data, headers)
+
+    def post(self, url, data, headers=None):
+        return self._send(self.http.post, url, data, headers)
+
+    def delete(self, url):
+        return self.http.delete(url)
+
+    def _accept(self, headers):
+        if self.accept_encoding is None or (headers is not None and "Accept-Encoding" in headers):
+            return headers
+        headers = dict(headers or {})
+        headers["Accept-Encoding"] = self.accept_encoding
+        return headers
+
+    def _send(self, send, url, data, headers):
+        headers = self._accept(headers)
+        compressed = self._compress(url, data, headers)
+        if compressed is None:
+            return send(url, data, headers=headers)
+        resp = send(url, compressed[0], headers=compressed[1])
+        if resp.status_code != 415:
+            return resp
+        with self._lock:
+            self._refused.add(_origin(url))
+        return send(url, data, headers=headers)
+
+    def _compress(self, url, data, headers) -> typing.Optional[typing.Tuple[bytes, dict]]:
+        """The compressed body and its headers, if the request should be compressed"""
+        if not isinstance(data, (bytes, bytearray, str)) or len(data) < self.threshold or headers is None:
+            return None
+        if "Content-Encoding" in headers:
+            return None
+        content_type = headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if content_type not in self.content_types:
+            return None
+        encoding = self.encoding_for(url)
+        if encoding is None:
+            return None
+
+        content = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        body = encode(content, encoding, self.level)
+        headers = dict(headers)
+        if "Digest" in headers:
+            digest = redigest(headers["Digest"], body)
+            if digest is None:
+                return None
+            headers["Digest"] = digest
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(body))
+        return body, headers
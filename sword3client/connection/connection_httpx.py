@@ -0,0 +1,146 @@
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client.lib.streams import IterStream, CHUNK_SIZE
+import httpx
+
+import os
+import weakref
+
+# Every layer, so that a forked child process can give each a client of its own rather than sharing the parent's
+# open connections
+_layers = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for layer in list(_layers):
+        layer._client = layer._new_client()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class HttpxHttpLayer(HttpLayer):
+    """HTTP layer using an httpx Client, which speaks HTTP/2 to servers which support it.
+
+    Over HTTP/2 any number of requests, from any number of threads sharing the client, are multiplexed over a
+    single connection to each host, so latency-bound work (metadata operations, polling an object for its state,
+    small segment uploads) gets its concurrency without a connection per request.  HTTP/2 is agreed with the
+    server as the TLS connection is made, so servers which don't support it, and plain ``http://`` URLs, are
+    spoken to over HTTP/1.1, with up to ``max_connections`` connections to each host, which should then be at
+    least the number of threads making requests at once.  With ``http1=False`` HTTP/2 is spoken without being
+    agreed first ("prior knowledge"), over ``http://`` as well, for servers known to support it, such as those
+    behind a proxy which terminates TLS.
+
+    HTTP/2 needs the ``h2`` package, which is installed with ``pip install sword3client[http2]``.  If the process
+    forks, the child gets a client of its own"""
+
+    def __init__(self, auth=None, headers=None, http2: bool = True, max_connections: int = 100, timeout=None,
+                 chunk_size: int = CHUNK_SIZE, http1: bool = True):
+        super(HttpxHttpLayer, self).__init__(auth, headers)
+        self._http2 = http2
+        self._http1 = http1
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._chunk_size = chunk_size
+        self._client = self._new_client()
+        _layers.add(self)
+
+    def _new_client(self) -> httpx.Client:
+        try:
+            return httpx.Client(
+                http1=self._http1,
+                http2=self._http2,
+                auth=self._auth,
+                limits=httpx.Limits(max_connections=self._max_connections,
+                                    max_keepalive_connections=self._max_connections),
+                timeout=self._timeout,
+                follow_redirects=True,
+            )
+        except ImportError as e:
+            raise ImportError("HTTP/2 needs the h2 package: pip install sword3client[http2]") from e
+
+    def close(self):
+        """Close the pooled connections"""
+        self._client.close()
+
+    def get(self, url, headers=None, stream=False):
+        headers = self._get_headers(headers)
+        if stream:
+            request = self._client.build_request("GET", url, headers=headers)
+            return HttpxHttpResponse(self._client.send(request, stream=True))
+        return HttpxHttpResponse(self._client.get(url, headers=headers))
+
+    def put(self, url, data, headers=None):
+        return self._send("PUT", url, data, headers)
+
+    def post(self, url, data, headers=None):
+        return self._send("POST", url, data, headers)
+
+    def delete(self, url):
+        return HttpxHttpResponse(self._client.delete(url, headers=self._get_headers(None)))
+
+    def _send(self, method, url, data, headers):
+        headers = self._get_headers(headers)
+        content = self._content(data)
+        return HttpxHttpResponse(self._client.request(method, url, content=content, headers=headers))
+
+    def _content(self, data):
+        """The request body as httpx takes it.  A file-like object is read in chunks rather than iterated over,
+        as iterating over a binary file splits it at newlines"""
+        if data is None or isinstance(data, (bytes, bytearray, str)) or not hasattr(data, "read"):
+            return data
+        return self._read_chunks(data)
+
+    def _read_chunks(self, stream):
+        while True:
+            chunk = stream.read(self._chunk_size)
+            if not chunk:
+                return
+            yield chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+
+
+class HttpxHttpResponse(HttpResponse):
+    def __init__(self, resp: httpx.Response):
+        self.resp = resp
+        self._stream = None
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self):
+        self.resp.close()
+
+    @property
+    def status_code(self):
+        return self.resp.status_code
+
+    @property
+    def http_version(self) -> str:
+        """The version of HTTP the response came over, such as ``HTTP/2`` or ``HTTP/1.1``"""
+        return self.resp.http_version
+
+    @property
+    def body(self):
+        try:
+            self.resp.read()
+        except httpx.StreamConsumed:
+            # the body has already been read through the stream
+            return ""
+        return self.resp.text
+
+    @property
+    def content(self):
+        try:
+            return self.resp.read()
+        except httpx.StreamConsumed:
+            return b""
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            # decoded, from any Content-Encoding, as it is read
+            self._stream = IterStream(self.resp.iter_bytes(CHUNK_SIZE))
+        return self._stream
+
+    def header(self, header_name):
+        return self.resp.headers.get(header_name)
@@ -0,0 +1,644 @@
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client.connection.connection_compression import ENCODINGS, encode, decode
+
+from sword3common import constants
+
+from urllib.parse import urlsplit
+from io import BytesIO
+
+import re
+import json
+import zlib
+import base64
+import typing
+import hashlib
+import datetime
+import itertools
+import threading
+
+SERVICE_PATH = "/service-document"
+STAGING_PATH = "/staging"
+
+_OBJECT = re.compile(r"^/objects/(\d+)(/metadata|/fileset|/files/(\d+))?$")
+_TEMPORARY = re.compile(r"^/staging/(\d+)$")
+
+
+def parse_disposition(value: str) -> dict:
+    """The parameters of a Content-Disposition header, with the disposition type as ``type``"""
+    parts = [p.strip() for p in (value or "").split(";")]
+    params = {"type": parts[0]}
+    for part in parts[1:]:
+        if "=" in part:
+            k, v = part.split("=", 1)
+            params[k.strip().rstrip("*")] = v.strip()
+    return params
+
+
+def parse_digest(value: str) -> typing.Dict[str, str]:
+    """The algorithms and values in a Digest header"""
+    digests = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            k, v = part.strip().split("=", 1)
+            digests[k.strip().upper()] = v.strip()
+    return digests
+
+
+class SWORDError(Exception):
+    """Raised within the server model to respond with an error document"""
+
+    def __init__(self, status_code: int, type_name: str, message: str):
+        super(SWORDError, self).__init__(message)
+        self.status_code = status_code
+        self.type_name = type_name
+        self.message = message
+
+
+class _File(object):
+    def __init__(self, content, content_type, packaging, by_reference=None, status=constants.FileState.Ingested):
+        self.content = content  # type: bytes
+        self.content_type = content_type or "application/octet-stream"
+        self.packaging = packaging or constants.PACKAGE_BINARY
+        self.by_reference = by_reference  # type: typing.Optional[str]
+        self.status = status
+        self.etag = hashlib.sha256(content).hexdigest()[:16]
+
+
+class _Object(object):
+    def __init__(self, oid):
+        self.id = oid
+        self.metadata = None  # type: typing.Optional[dict]
+        self.files = {}  # type: typing.Dict[int, _File]
+        self.version = 0
+        self.in_progress = False
+        self.last_action = None
+        self._fids = itertools.count(1)
+
+    def add(self, f: _File) -> int:
+        fid = next(self._fids)
+        self.files[fid] = f
+        return fid
+
+
+class _Temporary(object):
+    def __init__(self, size, segment_count, segment_size, digest):
+        self.size = size
+        self.segment_count = segment_count
+        self.segment_size = segment_size
+        self.digest = digest
+        self.segments = {}  # type: typing.Dict[int, bytes]
+
+    @property
+    def expecting(self):
+        return [n for n in range(1, self.segment_count + 1) if n not in self.segments]
+
+    def expected_size(self, number):
+        if number < self.segment_count:
+            return self.segment_size
+        return self.size - (self.segment_count - 1) * self.segment_size
+
+
+class SWORDServer(object):
+    """An in-process model of a SWORD server.
+
+    It holds objects, with their metadata and filesets, and staging areas for segmented uploads, and responds to
+    each request as a SWORD server would: with Status Documents, eTags, and Error Documents when the request can't
+    be honoured (unknown or deleted objects, digests which don't match the content, eTags which don't match, and
+    segments which don't fit the upload).  Files deposited By-Reference from anywhere other than its own staging
+    area are left Pending, as a server would until it had fetched them, until :meth:`ingest_pending` is called.
+
+    :meth:`handle` takes a request and returns the response, so the model can be used through
+    :class:`MemoryHttpLayer`, or served over HTTP.  All operations are thread-safe."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost",
+        max_upload_size: int = None,
+        max_segments: int = 1000,
+        verify_digests: bool = True,
+        content_encodings: typing.Sequence[str] = ENCODINGS,
+        compress_responses: bool = False,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_upload_size = max_upload_size
+        self.max_segments = max_segments
+        self.verify_digests = verify_digests
+        self.content_encodings = tuple(content_encodings)
+        self.compress_responses = compress_responses
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._objects = {}  # type: typing.Dict[int, _Object]
+        self._deleted = set()
+        self._temporary = {}  # type: typing.Dict[int, _Temporary]
+
+    @property
+    def service_url(self):
+        return self.base_url + SERVICE_PATH
+
+    @property
+    def staging_url(self):
+        return self.base_url + STAGING_PATH
+
+    def __len__(self):
+        with self._lock:
+            return len(self._objects)
+
+    def ingest_pending(self):
+        """Mark every Pending By-Reference file as Ingested"""
+        with self._lock:
+            for obj in self._objects.values():
+                changed = False
+                for f in obj.files.values():
+                    if f.status == constants.FileState.Pending:
+                        f.status = constants.FileState.Ingested
+                        changed = True
+                if changed:
+                    obj.version += 1
+
+    def handle(self, method: str, url: str, headers: dict, body: bytes) -> typing.Tuple[int, dict, bytes]:
+        """Respond to a request, with a tuple of status code, headers and body"""
+        headers = {k.lower(): str(v) for k, v in (headers or {}).items()}
+        try:
+            body = self._decode_body(headers, body or b"")
+            code, resp_headers, resp_body = self._route(method.upper(), urlsplit(url).path, headers, body)
+        except SWORDError as e:
+            code, resp_headers, resp_body = self._error(e.status_code, e.type_name, e.message)
+        return self._encode_response(headers, code, resp_headers, resp_body)
+
+    def _decode_body(self, headers, body):
+        """Remove the content coding of a request body.  Its digest is of the coded body, as sent, so it is checked
+        here, before decoding"""
+        encoding = headers.pop("content-encoding", "identity").strip().lower()
+        if encoding == "identity":
+            return body
+        if encoding not in self.content_encodings:
+            raise SWORDError(415, "ContentTypeNotAcceptable",
+                             "Content-Encoding {x} is not accepted".format(x=encoding))
+        self._check_digest(headers, body)
+        headers.pop("digest", None)
+        try:
+            return decode(body, encoding)
+        except (OSError, EOFError, zlib.error):
+            raise SWORDError(400, "ContentMalformed", "The request body could not be decoded")
+
+    def _encode_response(self, headers, code, resp_headers, resp_body):
+        if not self.compress_responses or len(resp_body) < 1024:
+            return code, resp_headers, resp_body
+        accepted = [e.split(";")[0].strip() for e in headers.get("accept-encoding", "").lower().split(",")]
+        for encoding in ENCODINGS:
+            if encoding in accepted:
+                resp_headers = dict(resp_headers)
+                resp_headers["Content-Encoding"] = encoding
+                return code, resp_headers, encode(resp_body, encoding)
+        return code, resp_headers, resp_body
+
+    def service_document(self) -> dict:
+        doc = {
+            "@context": constants.JSON_LD_CONTEXT,
+            "@id": self.service_url,
+            "@type": constants.DocumentType.ServiceDocument,
+            "dc:title": "In-memory SWORD server",
+            "root": self.service_url,
+            "acceptDeposits": True,
+            "version": "http://purl.org/net/sword/3.0",
+            "maxSegments": self.max_segments,
+            "accept": ["*/*"],
+            "acceptPackaging": ["*"],
+            "acceptMetadata": [constants.URI_METADATA],
+            "staging": self.staging_url,
+            "byReferenceDeposit": True,
+            "digest": [constants.DIGEST_SHA_256],
+            "services": [],
+        }
+        if self.max_upload_size is not None:
+            doc["maxUploadSize"] = self.max_upload_size
+        return doc
+
+    def status_document(self, obj: _Object) -> dict:
+        url = self._object_url(obj)
+        links = []
+        for fid, f in obj.files.items():
+            link = {
+                "@id": url + "/files/" + str(fid),
+                "rel": [constants.Rel.FileSetFile, constants.Rel.OriginalDeposit],
+                "contentType": f.content_type,
+                "packaging": f.packaging,
+                "status": f.status,
+                "eTag": f.etag,
+            }
+            if f.by_reference is not None:
+                link["byReference"] = f.by_reference
+            links.append(link)
+
+        state = constants.DepositState.InProgress if obj.in_progress else constants.DepositState.Ingested
+        doc = {
+            "@context": constants.JSON_LD_CONTEXT,
+            "@id": url,
+            "@type": "Status",
+            "eTag": self._etag(obj),
+            "service": self.service_url,
+            "metadata": {"@id": url + "/metadata", "eTag": self._etag(obj)},
+            "fileSet": {"@id": url + "/fileset", "eTag": self._etag(obj)},
+            "state": [{"@id": state}],
+            "actions": {
+                "getMetadata": True, "getFiles": True, "appendMetadata": True, "appendFiles": True,
+                "replaceMetadata": True, "replaceFiles": True, "deleteMetadata": True, "deleteFiles": True,
+                "deleteObject": True,
+            },
+            "links": links,
+        }
+        if obj.last_action is not None:
+            doc["lastAction"] = {"timestamp": obj.last_action, "log": "deposit received"}
+        return doc
+
+    ## routing
+
+    def _route(self, method, path, headers, body):
+        if path == SERVICE_PATH:
+            if method == "GET":
+                return self._json(200, self.service_document())
+            if method == "POST":
+                return self._create(headers, body)
+            raise SWORDError(405, "MethodNotAllowed", "The service document only supports GET and POST")
+
+        if path == STAGING_PATH:
+            if method == "POST":
+                return self._initialise_segmented(headers)
+            raise SWORDError(405, "MethodNotAllowed", "The staging area only supports POST")
+
+        m = _TEMPORARY.match(path)
+        if m is not None:
+            return self._segmented(method, int(m.group(1)), headers, body)
+
+        m = _OBJECT.match(path)
+        if m is None:
+            raise SWORDError(404, "NotFound", "No such resource")
+
+        with self._lock:
+            oid = int(m.group(1))
+            obj = self._objects.get(oid)
+            if obj is None:
+                if oid in self._deleted:
+                    raise SWORDError(410, "Gone", "The object has been deleted")
+                raise SWORDError(404, "NotFound", "No such object")
+
+            if m.group(2) is None:
+                return self._object(method, obj, headers, body)
+            if m.group(2) == "/metadata":
+                return self._metadata(method, obj, headers, body)
+            if m.group(2) == "/fileset":
+                return self._fileset(method, obj, headers, body)
+            return self._file(method, obj, int(m.group(3)), headers, body)
+
+    ## object level
+
+    def _create(self, headers, body):
+        with self._lock:
+            obj = _Object(next(self._ids))
+            self._deposit(obj, headers, body)
+            self._objects[obj.id] = obj
+        return self._status(201, obj)
+
+    def _object(self, method, obj, headers, body):
+        if method == "GET":
+            if headers.get("if-none-match") == self._etag(obj):
+                return 304, {"ETag": self._etag(obj)}, b""
+            return self._status(200, obj)
+        self._check_if_match(obj, headers)
+        if method == "DELETE":
+            del self._objects[obj.id]
+            self._deleted.add(obj.id)
+            return 204, {}, b""
+        if method == "PUT":
+            replacement = _Object(obj.id)
+            replacement.version = obj.version
+            self._deposit(replacement, headers, body)
+            self._objects[obj.id] = replacement
+            return self._status(200, replacement)
+        if method == "POST":
+            fid = self._deposit(obj, headers, body, append=True)
+            location = self._object_url(obj) + "/files/" + str(fid) if fid is not None else None
+            return self._status(200, obj, location)
+        raise SWORDError(405, "MethodNotAllowed", "Method not allowed on the object")
+
+    def _deposit(self, obj: _Object, headers, body, append: bool = False) -> typing.Optional[int]:
+        """Add the content of a deposit request to the object, returning the id of the last file added.  If
+        appending, new metadata is merged into the existing metadata rather than replacing it"""
+        disposition = parse_disposition(headers.get("content-disposition"))
+        self._check_upload(headers, body)
+        metadata = disposition.get("metadata") == "true"
+        by_reference = disposition.get("by-reference") == "true"
+
+        fid = None
+        new_metadata = None
+        if metadata and by_reference:
+            data = self._load_json(body)
+            self._check_metadata_format(headers)
+            fid = self._by_reference(obj, data.get("by-reference", {}))
+            new_metadata = data.get("metadata")
+        elif metadata:
+            self._check_metadata_format(headers)
+            new_metadata = self._load_json(body)
+        elif by_reference:
+            fid = self._by_reference(obj, self._load_json(body))
+        elif "filename" in disposition:
+            fid = obj.add(_File(body, headers.get("content-type"), headers.get("packaging")))
+        else:
+            raise SWORDError(400, "BadRequest", "Content-Disposition does not describe a deposit")
+
+        if new_metadata is not None:
+            if append and obj.metadata is not None:
+                merged = dict(obj.metadata)
+                merged.update(new_metadata)
+                new_metadata = merged
+            obj.metadata = new_metadata
+        obj.in_progress = headers.get("in-progress") == "true"
+        obj.version += 1
+        obj.last_action = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return fid
+
+    def _by_reference(self, obj: _Object, data: dict) -> typing.Optional[int]:
+        files = []
+        for ref in data.get("byReferenceFiles", []):
+            url = ref.get("@id")
+            if url is None:
+                raise SWORDError(400, "ValidationFailed", "By-Reference file has no @id")
+
+            m = _TEMPORARY.match(urlsplit(url).path) if url.startswith(self.base_url) else None
+            if m is not None:
+                temp = self._temporary.get(int(m.group(1)))
+                if temp is None:
+                    raise SWORDError(400, "ContentMalformed", "No such temporary file {x}".format(x=url))
+                if len(temp.expecting) > 0:
+                    raise SWORDError(400, "ContentMalformed", "Temporary file {x} is incomplete".format(x=url))
+                content = b"".join(temp.segments[n] for n in sorted(temp.segments))
+                expected = parse_digest(ref.get("digest")).get(constants.DIGEST_SHA_256) or temp.digest
+                if self.verify_digests and expected is not None and expected != _sha256(content):
+                    raise SWORDError(412, "DigestMismatch", "Assembled file does not match its digest")
+                del self._temporary[int(m.group(1))]
+                files.append(_File(content, ref.get("contentType"), ref.get("packaging"), url))
+            else:
+                files.append(_File(b"", ref.get("contentType"), ref.get("packaging"), url,
+                                   status=constants.FileState.Pending))
+
+        fid = None
+        for f in files:
+            fid = obj.add(f)
+        return fid
+
+    ## metadata
+
+    def _metadata(self, method, obj, headers, body):
+        if method == "GET":
+            if obj.metadata is None:
+                raise SWORDError(404, "NotFound", "The object has no metadata")
+            return self._json(200, obj.metadata)
+        self._check_if_match(obj, headers)
+        if method == "DELETE":
+            obj.metadata = None
+            obj.version += 1
+            return 204, {}, b""
+        if method == "PUT":
+            self._check_upload(headers, body)
+            self._check_metadata_format(headers)
+            obj.metadata = self._load_json(body)
+            obj.version += 1
+            return 204, {}, b""
+        raise SWORDError(405, "MethodNotAllowed", "Method not allowed on the metadata")
+
+    ## files
+
+    def _fileset(self, method, obj, headers, body):
+        self._check_if_match(obj, headers)
+        if method == "DELETE":
+            obj.files = {}
+            obj.version += 1
+            return 204, {}, b""
+        if method == "PUT":
+            old = obj.files
+            obj.files = {}
+            try:
+                self._deposit(obj, headers, body)
+            except SWORDError:
+                obj.files = old
+                raise
+            return 204, {}, b""
+        raise SWORDError(405, "MethodNotAllowed", "Method not allowed on the fileset")
+
+    def _file(self, method, obj, fid, headers, body):
+        f = obj.files.get(fid)
+        if f is None:
+            raise SWORDError(404, "NotFound", "No such file")
+        if method == "GET":
+            return 200, {"Content-Type": f.content_type, "ETag": f.etag}, f.content
+        if method == "DELETE":
+            del obj.files[fid]
+            obj.version += 1
+            return 204, {}, b""
+        if method == "PUT":
+            disposition = parse_disposition(headers.get("content-disposition"))
+            if disposition.get("by-reference") == "true":
+                data = self._load_json(body)
+                if len(data.get("byReferenceFiles", [])) != 1:
+                    raise SWORDError(400, "ValidationFailed", "A file can only be replaced by exactly one By-Reference file")
+                replacement = _Object(obj.id)
+                self._by_reference(replacement, data)
+                f = list(replacement.files.values())[0]
+            else:
+                self._check_upload(headers, body)
+                f = _File(body, headers.get("content-type"), headers.get("packaging"))
+            obj.files[fid] = f
+            obj.version += 1
+            return 204, {}, b""
+        raise SWORDError(405, "MethodNotAllowed", "Method not allowed on the file")
+
+    ## segmented upload
+
+    def _initialise_segmented(self, headers):
+        disposition = parse_disposition(headers.get("content-disposition"))
+        if disposition["type"] != "segment-init":
+            raise SWORDError(400, "BadRequest", "Expected a segment-init Content-Disposition")
+        try:
+            size = int(disposition["size"])
+            segment_count = int(disposition["segment_count"])
+            segment_size = int(disposition["segment_size"])
+        except (KeyError, ValueError):
+            raise SWORDError(400, "BadRequest", "segment-init requires size, segment_count and segment_size")
+        if segment_count > self.max_segments:
+            raise SWORDError(400, "SegmentLimitExceeded", "At most {x} segments are allowed".format(x=self.max_segments))
+        if segment_count < 1 or segment_size < 1 or not (segment_count - 1) * segment_size < size <= segment_count * segment_size:
+            raise SWORDError(400, "InvalidSegmentSize", "The segments do not add up to the file size")
+
+        digest = parse_digest(disposition.get("digest")).get(constants.DIGEST_SHA_256)
+        with self._lock:
+            tid = next(self._ids)
+            self._temporary[tid] = _Temporary(size, segment_count, segment_size, digest)
+        return 201, {"Location": self.staging_url + "/" + str(tid)}, b""
+
+    def _segmented(self, method, tid, headers, body):
+        with self._lock:
+            temp = self._temporary.get(tid)
+            if temp is None:
+                raise SWORDError(404, "NotFound", "No such temporary file")
+            if method == "DELETE":
+                del self._temporary[tid]
+                return 204, {}, b""
+            if method == "GET":
+                return self._json(200, {
+                    "@context": constants.JSON_LD_CONTEXT,
+                    "@id": self.staging_url + "/" + str(tid),
+                    "@type": constants.DocumentType.Temporary,
+                    "segments": {
+                        "received": sorted(temp.segments),
+                        "expecting": temp.expecting,
+                        "size": temp.size,
+                        "segment_size": temp.segment_size,
+                    },
+                })
+            if method != "POST":
+                raise SWORDError(405, "MethodNotAllowed", "Method not allowed on a temporary file")
+
+            disposition = parse_disposition(headers.get("content-disposition"))
+            try:
+                number = int(disposition["segment_number"])
+            except (KeyError, ValueError):
+                raise SWORDError(400, "BadRequest", "Segment upload requires a segment_number")
+            if number not in temp.expecting:
+                raise SWORDError(400, "UnexpectedSegment", "Segment {x} was not expected".format(x=number))
+            if len(body) != temp.expected_size(number):
+                raise SWORDError(400, "InvalidSegmentSize", "Segment {x} is the wrong size".format(x=number))
+            self._check_digest(headers, body)
+            temp.segments[number] = body
+        return 204, {}, b""
+
+    ## checks and responses
+
+    def _check_upload(self, headers, body):
+        if self.max_upload_size is not None and len(body) > self.max_upload_size:
+            raise SWORDError(413, "MaxUploadSizeExceeded", "The upload is too large")
+        self._check_digest(headers, body)
+
+    def _check_digest(self, headers, body):
+        if not self.verify_digests:
+            return
+        expected = parse_digest(headers.get("digest")).get(constants.DIGEST_SHA_256)
+        if expected is not None and expected != _sha256(body):
+            raise SWORDError(412, "DigestMismatch", "The content does not match its digest")
+
+    def _check_metadata_format(self, headers):
+        fmt = headers.get("metadata-format")
+        if fmt is not None and fmt != constants.URI_METADATA:
+            raise SWORDError(415, "MetadataFormatNotAcceptable", "Metadata format {x} is not accepted".format(x=fmt))
+
+    def _check_if_match(self, obj, headers):
+        etag = headers.get("if-match")
+        if etag is not None and etag != self._etag(obj):
+            raise SWORDError(412, "ETagNotMatched", "The object has changed")
+
+    def _load_json(self, body):
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise SWORDError(400, "ContentMalformed", "The request body is not valid JSON")
+
+    def _etag(self, obj):
+        return '"{x}"'.format(x=obj.version)
+
+    def _object_url(self, obj):
+        return self.base_url + "/objects/" + str(obj.id)
+
+    def _json(self, code, data, headers=None):
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/json"
+        return code, headers, json.dumps(data).encode("utf-8")
+
+    def _status(self, code, obj, location=None):
+        headers = {"Location": location or self._object_url(obj), "ETag": self._etag(obj)}
+        return self._json(code, self.status_document(obj), headers)
+
+    def _error(self, code, type_name, message):
+        return self._json(code, {
+            "@context": constants.JSON_LD_CONTEXT,
+            "@type": type_name,
+            # no timestamp, as sword3common's Error can't yet read one back
+            "error": message,
+        })
+
+
+def _sha256(content: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(content).digest()).decode("ascii")
+
+
+def read_body(data) -> bytes:
+    """The whole of a request body given to an HttpLayer: bytes, str, a file-like object or an iterator of chunks"""
+    if data is None:
+        return b""
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    if hasattr(data, "read"):
+        chunks = []
+        while True:
+            chunk = data.read(1024 * 1024)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+    return b"".join(data)
+
+
+class MemoryHttpLayer(HttpLayer):
+    """An HttpLayer which sends requests to an in-process :class:`SWORDServer`, with no network"""
+
+    def __init__(self, server: SWORDServer = None, auth=None, headers=None):
+        super(MemoryHttpLayer, self).__init__(auth, headers)
+        self.server = server if server is not None else SWORDServer()
+
+    def get(self, url, headers=None, stream=False):
+        return self._request("GET", url, None, headers)
+
+    def put(self, url, data, headers=None):
+        return self._request("PUT", url, data, headers)
+
+    def post(self, url, data, headers=None):
+        return self._request("POST", url, data, headers)
+
+    def delete(self, url):
+        return self._request("DELETE", url, None, None)
+
+    def _request(self, method, url, data, headers):
+        code, resp_headers, body = self.server.handle(method, url, self._get_headers(headers), read_body(data))
+        return MemoryHttpResponse(code, resp_headers, body)
+
+
+class MemoryHttpResponse(HttpResponse):
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self._status_code = status_code
+        self._headers = {k.lower(): v for k, v in headers.items()}
+        # decoded, as a real HTTP client library would
+        self._body = decode(body, self._headers.get("content-encoding"))
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self):
+        pass
+
+    @property
+    def status_code(self):
+        return self._status_code
+
+    @property
+    def body(self):
+        return self._body.decode("utf-8")
+
+    @property
+    def content(self):
+        return self._body
+
+    @property
+    def stream(self):
+        return BytesIO(self._body)
+
+    def header(self, header_name):
+        return self._headers.get(header_name.lower())
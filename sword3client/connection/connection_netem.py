@@ -0,0 +1,205 @@
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client.lib.throttle import TokenBucket, ThrottledReader, throttled_body, CHUNK_SIZE
+
+import math
+import time
+import random
+import typing
+import threading
+
+Latency = typing.Union[float, typing.Callable[[random.Random], float], None]
+
+
+def constant(seconds: float):
+    """A latency distribution which is always the same"""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float):
+    return lambda rng: rng.uniform(low, high)
+
+
+def normal(mean: float, stddev: float):
+    """Normally distributed latency, never less than zero"""
+    return lambda rng: max(0.0, rng.gauss(mean, stddev))
+
+
+def lognormal(median: float, sigma: float):
+    """Long-tailed latency, as is typical of WAN round trips: half of requests are faster than ``median``, and
+    ``sigma`` controls the length of the tail"""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+class NetworkEmulationHttpLayer(HttpLayer):
+    """Wraps another HttpLayer, adding the behaviour of a slow or unreliable network.
+
+    * ``latency`` is added to every request, and is either a number of seconds or a distribution, such as
+      ``lognormal(0.08, 0.5)``, which is a function of a :class:`random.Random`
+    * ``upload_rate`` and ``download_rate`` cap each request's transfer, in bytes per second, and
+      ``total_upload_rate`` and ``total_download_rate`` cap the transfers of all requests in flight together.
+      Request bodies which are streams, and streamed responses, are throttled as they are read, so the inner
+      layer sees the data arrive at that rate
+    * ``reset_rate`` is the fraction of requests which fail with a :class:`ConnectionResetError`, and
+      ``error_rate`` the fraction which get a 5xx response (one of ``error_codes``) without reaching the inner
+      layer
+
+    With a ``seed`` the latencies and failures are the same from run to run, for the same sequence of
+    requests."""
+
+    def __init__(
+        self,
+        http: HttpLayer,
+        latency: Latency = None,
+        upload_rate: float = None,
+        download_rate: float = None,
+        total_upload_rate: float = None,
+        total_download_rate: float = None,
+        reset_rate: float = 0.0,
+        error_rate: float = 0.0,
+        error_codes: typing.Sequence[int] = (500, 502, 503, 504),
+        seed: int = None,
+    ):
+        super(NetworkEmulationHttpLayer, self).__init__()
+        self.http = http
+        self._latency = constant(latency) if isinstance(latency, (int, float)) else latency
+        self._upload_rate = upload_rate
+        self._download_rate = download_rate
+        self._total_upload = TokenBucket(total_upload_rate) if total_upload_rate is not None else None
+        self._total_download = TokenBucket(total_download_rate) if total_download_rate is not None else None
+        self._reset_rate = reset_rate
+        self._error_rate = error_rate
+        self._error_codes = list(error_codes)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def get(self, url, headers=None, stream=False):
+        fault = self._before()
+        if fault is not None:
+            return fault
+        return self._response(self.http.get(url, headers=headers, stream=stream), stream)
+
+    def put(self, url, data, headers=None):
+        fault = self._before()
+        if fault is not None:
+            return fault
+        return self._response(self.http.put(url, self._upload(data), headers=headers))
+
+    def post(self, url, data, headers=None):
+        fault = self._before()
+        if fault is not None:
+            return fault
+        return self._response(self.http.post(url, self._upload(data), headers=headers))
+
+    def delete(self, url):
+        fault = self._before()
+        if fault is not None:
+            return fault
+        return self._response(self.http.delete(url))
+
+    def _before(self) -> typing.Optional[HttpResponse]:
+        """Decide the fate of a request, sleeping for its latency.  Returns the error response, if there is one"""
+        with self._rng_lock:
+            delay = self._latency(self._rng) if self._latency is not None else 0
+            roll = self._rng.random()
+            code = self._rng.choice(self._error_codes) if len(self._error_codes) > 0 else 503
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self._reset_rate:
+            raise ConnectionResetError("Connection reset by emulated network")
+        if roll < self._reset_rate + self._error_rate:
+            return EmulatedHttpResponse(code)
+        return None
+
+    def _upload(self, data):
+        return throttled_body(data, self._buckets(self._upload_rate, self._total_upload))
+
+    def _response(self, resp, stream=False):
+        buckets = self._buckets(self._download_rate, self._total_download)
+        if len(buckets) == 0:
+            return resp
+        if not stream:
+            # the bytes as they arrived, a chunk at a time as a streamed response would be, so that a large
+            # response doesn't hold the shared bucket while it pays for all of itself at once
+            length = len(resp.content)
+            for offset in range(0, length, CHUNK_SIZE):
+                for bucket in buckets:
+                    bucket.consume(min(CHUNK_SIZE, length - offset))
+            return resp
+        return ThrottledHttpResponse(resp, buckets)
+
+    def _buckets(self, rate, total) -> typing.List[TokenBucket]:
+        buckets = []
+        if rate is not None:
+            buckets.append(TokenBucket(rate))
+        if total is not None:
+            buckets.append(total)
+        return buckets
+
+
+class EmulatedHttpResponse(HttpResponse):
+    """A server error injected by the emulated network"""
+
+    def __init__(self, status_code: int):
+        self._status_code = status_code
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self):
+        pass
+
+    @property
+    def status_code(self):
+        return self._status_code
+
+    @property
+    def body(self):
+        return ""
+
+    @property
+    def content(self):
+        return b""
+
+    @property
+    def stream(self):
+        return None
+
+    def header(self, header_name):
+        return None
+
+
+class ThrottledHttpResponse(HttpResponse):
+    """A streamed response whose stream is throttled"""
+
+    def __init__(self, resp: HttpResponse, buckets: typing.List[TokenBucket]):
+        self._resp = resp
+        self._buckets = buckets
+
+    def __enter__(self):
+        self._resp.__enter__()
+
+    def __exit__(self):
+        self._resp.__exit__()
+
+    @property
+    def status_code(self):
+        return self._resp.status_code
+
+    @property
+    def body(self):
+        return self._resp.body
+
+    @property
+    def content(self):
+        return self._resp.content
+
+    @property
+    def stream(self):
+        stream = self._resp.stream
+        if stream is None:
+            return None
+        return ThrottledReader(stream, self._buckets)
+
+    def header(self, header_name):
+        return self._resp.header(header_name)
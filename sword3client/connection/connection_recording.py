@@ -0,0 +1,304 @@
+from sword3client.connection import HttpLayer, HttpResponse
+from sword3client.lib.streams import is_chunked
+
+from collections import deque
+from io import BytesIO
+
+import json
+import time
+import base64
+import typing
+import hashlib
+import threading
+
+CASSETTE_VERSION = 1
+
+# HttpResponse can only be asked for headers by name, so these are the ones which are kept
+RECORDED_HEADERS = (
+    "Location",
+    "Content-Type",
+    "Content-Length",
+    "Content-Disposition",
+    "ETag",
+    "Digest",
+    "Retry-After",
+)
+
+ORIGINAL = "original"
+FAST = "fast"
+
+
+class Cassette(object):
+    """A recording of HTTP exchanges.  Each interaction records the request (method, url, headers, and the digest
+    of the body), the response (status, headers, and the digest of the body), when the request was started
+    relative to the start of the recording, and how long it took.  The bodies themselves are stored once each,
+    keyed by their SHA-256, so repeated content costs nothing"""
+
+    def __init__(self, interactions: typing.List[dict] = None, bodies: typing.Dict[str, str] = None):
+        self.interactions = interactions if interactions is not None else []
+        self.bodies = bodies if bodies is not None else {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.interactions)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError("{x} is not a version {y} cassette".format(x=path, y=CASSETTE_VERSION))
+        return cls(data["interactions"], data["bodies"])
+
+    def save(self, path: str):
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "interactions": self.interactions, "bodies": self.bodies}
+            with open(path, "w") as f:
+                json.dump(data, f)
+
+    def add(self, interaction: dict):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def store(self, content: typing.Optional[bytes], keep: bool = True) -> typing.Optional[str]:
+        """Store a body, returning the digest by which it is referred to"""
+        if content is None:
+            return None
+        digest = hashlib.sha256(content).hexdigest()
+        if keep:
+            with self._lock:
+                if digest not in self.bodies:
+                    self.bodies[digest] = base64.b64encode(content).decode("ascii")
+        return digest
+
+    def body(self, digest: typing.Optional[str]) -> typing.Optional[bytes]:
+        if digest is None:
+            return None
+        encoded = self.bodies.get(digest)
+        if encoded is None:
+            return None
+        return base64.b64decode(encoded)
+
+
+class RecordingHttpLayer(HttpLayer):
+    """Wraps another HttpLayer, recording every exchange into a :class:`Cassette`.
+
+    Request bodies which are streams are recorded as the inner layer reads them.  Streamed responses are read
+    in full as they arrive, and handed back as an in-memory stream.  If ``keep_request_bodies`` is False only the
+    digest and size of each request body is kept, which is usually enough, as replay doesn't need them."""
+
+    def __init__(self, http: HttpLayer, cassette: Cassette = None, keep_request_bodies: bool = True):
+        super(RecordingHttpLayer, self).__init__()
+        self.http = http
+        self.cassette = cassette if cassette is not None else Cassette()
+        self._keep_request_bodies = keep_request_bodies
+        self._origin = time.monotonic()
+
+    def save(self, path: str):
+        self.cassette.save(path)
+
+    def get(self, url, headers=None, stream=False):
+        return self._exchange(
+            "GET", url, None, headers, lambda data: self.http.get(url, headers=headers, stream=stream), stream
+        )
+
+    def put(self, url, data, headers=None):
+        return self._exchange("PUT", url, data, headers, lambda data: self.http.put(url, data, headers=headers))
+
+    def post(self, url, data, headers=None):
+        return self._exchange("POST", url, data, headers, lambda data: self.http.post(url, data, headers=headers))
+
+    def delete(self, url):
+        return self._exchange("DELETE", url, None, None, lambda data: self.http.delete(url))
+
+    def _exchange(self, method, url, data, headers, send, stream=False):
+        tee = None
+        if is_chunked(data):
+            tee = _TeeChunks(data)
+            data = iter(tee)
+        elif data is not None and not isinstance(data, (bytes, bytearray, str)):
+            tee = _TeeReader(data)
+            data = tee
+
+        started = time.monotonic()
+        resp = send(data)
+        if stream:
+            content = resp.stream.read() if resp.stream is not None else b""
+        else:
+            content = resp.content
+        duration = time.monotonic() - started
+
+        if tee is not None:
+            request_body = tee.content()
+        elif isinstance(data, str):
+            request_body = data.encode("utf-8")
+        else:
+            request_body = bytes(data) if data is not None else None
+
+        resp_headers = {}
+        for name in RECORDED_HEADERS:
+            value = resp.header(name)
+            if value is not None:
+                resp_headers[name] = value
+
+        self.cassette.add({
+            "method": method,
+            "url": url,
+            "started": started - self._origin,
+            "duration": duration,
+            "request": {
+                "headers": {k: str(v) for k, v in (headers or {}).items()},
+                "body": self.cassette.store(request_body, keep=self._keep_request_bodies),
+                "size": len(request_body) if request_body is not None else 0,
+            },
+            "response": {
+                "status": resp.status_code,
+                "headers": resp_headers,
+                "body": self.cassette.store(content),
+                "stream": stream,
+            },
+        })
+        return ReplayedHttpResponse(resp.status_code, resp_headers, content)
+
+
+class ReplayHttpLayer(HttpLayer):
+    """Serves the responses recorded in a :class:`Cassette`, without a server.
+
+    Each request is answered with the next recorded response to the same method and URL, so concurrent or
+    reordered requests still get the right answers.  With ``timing="original"`` the recording is replayed on its
+    own clock, which starts with the first request: each request is held until the time it was started in the
+    recording, and answered as long after that as it took, so the gaps between requests, and the overlap of
+    concurrent ones, are as they were (all divided by ``speed``).  A request made later than it was recorded
+    still takes its recorded duration.  With ``timing="fast"`` responses are immediate.  Request
+    bodies are read in full, as a real transport would.  A request with nothing left to replay raises a
+    LookupError"""
+
+    def __init__(self, cassette: typing.Union[Cassette, str], timing: str = FAST, speed: float = 1.0):
+        super(ReplayHttpLayer, self).__init__()
+        if isinstance(cassette, str):
+            cassette = Cassette.load(cassette)
+        self.cassette = cassette
+        self._timing = timing
+        self._speed = speed
+        self._lock = threading.Lock()
+        self._queues = {}  # type: typing.Dict[typing.Tuple[str, str], deque]
+        for interaction in cassette.interactions:
+            key = (interaction["method"], interaction["url"])
+            self._queues.setdefault(key, deque()).append(interaction)
+        # when the first recorded request was started, and when the replay of it was, on which the replay of the
+        # others is scheduled
+        self._first_started = min((i["started"] for i in cassette.interactions), default=0.0)
+        self._origin = None
+
+    @property
+    def remaining(self) -> int:
+        """The number of recorded interactions which have not been replayed"""
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def get(self, url, headers=None, stream=False):
+        return self._replay("GET", url, None)
+
+    def put(self, url, data, headers=None):
+        return self._replay("PUT", url, data)
+
+    def post(self, url, data, headers=None):
+        return self._replay("POST", url, data)
+
+    def delete(self, url):
+        return self._replay("DELETE", url, None)
+
+    def _replay(self, method, url, data):
+        if data is not None and hasattr(data, "read"):
+            while data.read(1024 * 1024):
+                pass
+        elif is_chunked(data):
+            for _ in data:
+                pass
+
+        with self._lock:
+            queue = self._queues.get((method, url))
+            if not queue:
+                raise LookupError("No recorded response left for {m} {u}".format(m=method, u=url))
+            interaction = queue.popleft()
+            if self._origin is None:
+                self._origin = time.monotonic()
+
+        if self._timing == ORIGINAL:
+            start = self._origin + (interaction["started"] - self._first_started) / self._speed
+            due = max(start, time.monotonic()) + interaction["duration"] / self._speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        response = interaction["response"]
+        content = self.cassette.body(response["body"])
+        return ReplayedHttpResponse(response["status"], response["headers"], content if content is not None else b"")
+
+
+class ReplayedHttpResponse(HttpResponse):
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        self._status_code = status_code
+        self._headers = {k.lower(): v for k, v in headers.items()}
+        self._content = content
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self):
+        pass
+
+    @property
+    def status_code(self):
+        return self._status_code
+
+    @property
+    def body(self):
+        return self._content.decode("utf-8")
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def stream(self):
+        return BytesIO(self._content)
+
+    def header(self, header_name):
+        return self._headers.get(header_name.lower())
+
+
+class _TeeChunks(object):
+    """Passes an iterable of chunks through, keeping a copy of each"""
+
+    def __init__(self, chunks):
+        self._chunks_in = chunks
+        self._chunks = []
+
+    def __iter__(self):
+        for chunk in self._chunks_in:
+            self._chunks.append(chunk if isinstance(chunk, bytes) else bytes(chunk))
+            yield chunk
+
+    def content(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+class _TeeReader(object):
+    """Passes reads through, keeping a copy of what was read"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._chunks = []
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if data:
+            self._chunks.append(data if isinstance(data, bytes) else data.encode("utf-8"))
+        return data
+
+    def content(self) -> bytes:
+        return b"".join(self._chunks)
+
+    def __getattr__(self, item):
+        return getattr(self._stream, item)
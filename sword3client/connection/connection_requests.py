@@ -1,36 +1,62 @@
 from sword3client.connection import HttpLayer, HttpResponse
 import requests
+import requests.adapters
+
+import os
+import weakref
+
+# Every layer, so that a forked child process can give each a new connection pool rather than sharing the parent's
+# open connections
+_layers = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for layer in list(_layers):
+        layer._session = layer._new_session()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 class RequestsHttpLayer(HttpLayer):
-    def __init__(self, auth=None, headers=None):
+    """HTTP layer using a requests Session, so that connections are kept alive and reused.  It may be shared
+    between threads: up to ``pool_maxsize`` connections are kept open to each host, which should be at least the
+    number of threads making requests at once.  If the process forks, the child gets a pool of its own"""
+
+    def __init__(self, auth=None, headers=None, pool_maxsize: int = 10):
         super(RequestsHttpLayer, self).__init__(auth, headers)
+        self._pool_maxsize = pool_maxsize
+        self._session = self._new_session()
+        _layers.add(self)
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.auth = self._auth
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self._pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        """Close the pooled connections"""
+        self._session.close()
 
     def get(self, url, headers=None, stream=False):
         headers = self._get_headers(headers)
-        return RequestsHttpResponse(requests.get(url, stream=stream, headers=headers))
+        return RequestsHttpResponse(self._session.get(url, stream=stream, headers=headers))
 
     def put(self, url, data, headers=None):
         headers = self._get_headers(headers)
-        return RequestsHttpResponse(requests.put(url, data, headers=headers))
+        return RequestsHttpResponse(self._session.put(url, data, headers=headers))
 
     def post(self, url, data, headers=None):
         headers = self._get_headers(headers)
-        return RequestsHttpResponse(requests.post(url, data, headers=headers))
+        return RequestsHttpResponse(self._session.post(url, data, headers=headers))
 
     def delete(self, url):
         headers = self._get_headers(None)
-        return RequestsHttpResponse(requests.delete(url, headers=headers))
-
-    def _get_headers(self, headers):
-        if headers is None and self._headers is None:
-            return None
-        if headers is None:
-            return self._headers
-        if self._headers is None:
-            return headers
-        headers.update(self._headers)
-        return headers
+        return RequestsHttpResponse(self._session.delete(url, headers=headers))
 
 
 class RequestsHttpResponse(HttpResponse):
@@ -51,8 +77,14 @@ class RequestsHttpResponse(HttpResponse):
     def body(self):
         return self.resp.text
 
+    @property
+    def content(self):
+        return self.resp.content
+
     @property
     def stream(self):
+        # decode any Content-Encoding as the stream is read, as requests does for the body
+        self.resp.raw.decode_content = True
         return self.resp.raw
 
     def header(self, header_name):
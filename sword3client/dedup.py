@@ -0,0 +1,252 @@
+from sword3client.models.link_index import link_index
+
+from sword3common import StatusDocument, constants
+
+from array import array
+
+import json
+import base64
+import typing
+import binascii
+import threading
+
+KEY_SIZE = 16
+MAX_LOAD = 0.7
+COMPACT_MIN = 65536
+_MAGIC = b"SWORD3DEDUP1\n"
+
+
+def digest_key(digest: typing.Union[typing.Dict[str, typing.Union[str, bytes]], bytes]) -> typing.Optional[bytes]:
+    """Reduce a digest to the key used in the index, or None if it has no usable SHA-256.
+
+    ``digest`` may be a raw SHA-256, or a digest dictionary as passed to the client's deposit methods, whose
+    SHA-256 value may be base64 (as a str or bytes) or the raw digest."""
+    if digest is None:
+        return None
+    if isinstance(digest, dict):
+        digest = digest.get(constants.DIGEST_SHA_256)
+        if digest is None:
+            return None
+        if isinstance(digest, str):
+            digest = digest.encode("ascii")
+        if len(digest) != 32:
+            try:
+                digest = base64.b64decode(digest, validate=True)
+            except (binascii.Error, ValueError):
+                return None
+    if not isinstance(digest, (bytes, bytearray)) or len(digest) != 32:
+        return None
+    return bytes(digest[:KEY_SIZE])
+
+
+class DedupIndex(object):
+    """Maps the SHA-256 of content which has already been deposited to the File-URL it was deposited at, so that
+    further copies can be deposited By-Reference to that file rather than being uploaded again.
+
+    The index is designed to hold millions of entries: keys are the first 128 bits of the digest, held in an
+    open-addressed table of packed bytes, and URLs are stored in a single byte buffer with their scheme and host
+    factored out.  That comes to roughly 35-70 bytes per entry (depending on how full the table is), plus the
+    path of each URL.
+
+    Only use it with a server that will dereference URLs from its own store; the full digest is always sent in
+    the By-Reference document, so the server can confirm the content."""
+
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._lock = threading.Lock()
+        self._init_table(size)
+        self._urls = bytearray()
+        self._garbage = 0
+        self._prefixes = []  # type: typing.List[str]
+        self._prefix_ids = {}  # type: typing.Dict[str, int]
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, digest):
+        return self.lookup(digest) is not None
+
+    def add(self, digest, url: str):
+        """Record that content with this digest is available at the url"""
+        key = digest_key(digest)
+        if key is None:
+            return
+        with self._lock:
+            slot, found = self._find(key)
+            if found:
+                offset = self._offsets[slot] - 1
+                if self._load_url(offset) == url:
+                    return
+                # the old url is left in the buffer until there is enough of that to be worth compacting
+                self._garbage += self._urls.index(b"\n", offset) + 1 - offset
+                self._offsets[slot] = self._store_url(url) + 1
+                if self._garbage > COMPACT_MIN and self._garbage > len(self._urls) // 2:
+                    self._compact()
+                return
+            if (self._count + 1) > self._capacity * MAX_LOAD:
+                self._resize(self._capacity * 2)
+                slot, _ = self._find(key)
+            self._offsets[slot] = self._store_url(url) + 1
+            self._keys[slot * KEY_SIZE:(slot + 1) * KEY_SIZE] = key
+            self._count += 1
+
+    def lookup(self, digest) -> typing.Optional[str]:
+        """The url at which content with this digest has already been deposited, if any"""
+        key = digest_key(digest)
+        if key is None:
+            return None
+        with self._lock:
+            slot, found = self._find(key)
+            if not found:
+                return None
+            return self._load_url(self._offsets[slot] - 1)
+
+    def record_deposit(self, digest, response, object_url: str = None):
+        """Learn from the response to a successful binary deposit.  The File-URL is taken from the ``Location``
+        of the response where that isn't just the object, or else from the only original deposit in the
+        Status Document which didn't come By-Reference"""
+        location = response.location
+        if location is not None and location != object_url and (
+                response.status_document is None or location != response.status_document.object_url):
+            self.add(digest, location)
+            return
+
+        status = response.status_document
+        if status is None:
+            return
+        deposits = [
+            l for l in link_index(status).with_rel(constants.Rel.OriginalDeposit) if l.get("byReference") is None
+        ]
+        if len(deposits) == 1:
+            self.add(digest, deposits[0].get("@id"))
+
+    def learn(self, status: StatusDocument, digests: typing.Dict[str, typing.Any]):
+        """Add every file in the Status Document for which a digest is known.  ``digests`` maps File-URLs (or, for
+        files deposited By-Reference, their original URLs) to digests"""
+        for link in status.links:
+            url = link.get("@id")
+            digest = digests.get(url)
+            if digest is None and link.get("byReference") is not None:
+                digest = digests.get(link.get("byReference"))
+            if digest is not None:
+                self.add(digest, url)
+
+    def save(self, path: str):
+        with self._lock:
+            header = json.dumps({
+                "capacity": self._capacity,
+                "count": self._count,
+                "urls": len(self._urls),
+                "garbage": self._garbage,
+                "prefixes": self._prefixes,
+            }).encode("utf-8")
+            with open(path, "wb") as f:
+                f.write(_MAGIC)
+                f.write(header + b"\n")
+                f.write(self._keys)
+                self._offsets.tofile(f)
+                f.write(self._urls)
+
+    @classmethod
+    def load(cls, path: str) -> "DedupIndex":
+        with open(path, "rb") as f:
+            if f.readline() != _MAGIC:
+                raise ValueError("{x} is not a dedup index".format(x=path))
+            header = json.loads(f.readline())
+            index = cls(header["capacity"])
+            index._keys = bytearray(f.read(header["capacity"] * KEY_SIZE))
+            index._offsets = array("Q")
+            index._offsets.fromfile(f, header["capacity"])
+            index._urls = bytearray(f.read(header["urls"]))
+            index._garbage = header.get("garbage", 0)
+            index._count = header["count"]
+            index._prefixes = header["prefixes"]
+            index._prefix_ids = {p: i for i, p in enumerate(index._prefixes)}
+        return index
+
+    def _init_table(self, capacity):
+        self._capacity = capacity
+        self._count = 0
+        self._keys = bytearray(capacity * KEY_SIZE)
+        # offset + 1 into the url buffer; 0 marks an empty slot
+        self._offsets = array("Q", bytes(capacity * 8))
+
+    def _find(self, key: bytes) -> typing.Tuple[int, bool]:
+        mask = self._capacity - 1
+        slot = int.from_bytes(key[:8], "little") & mask
+        while True:
+            if self._offsets[slot] == 0:
+                return slot, False
+            if self._keys[slot * KEY_SIZE:(slot + 1) * KEY_SIZE] == key:
+                return slot, True
+            slot = (slot + 1) & mask
+
+    def _resize(self, capacity):
+        keys, offsets = self._keys, self._offsets
+        old = len(offsets)
+        self._init_table(capacity)
+        for i in range(old):
+            if offsets[i] != 0:
+                key = bytes(keys[i * KEY_SIZE:(i + 1) * KEY_SIZE])
+                slot, _ = self._find(key)
+                self._keys[slot * KEY_SIZE:(slot + 1) * KEY_SIZE] = key
+                self._offsets[slot] = offsets[i]
+                self._count += 1
+
+    def _compact(self):
+        """Rebuild the url buffer without the urls which have been replaced"""
+        urls = bytearray()
+        for slot in range(self._capacity):
+            offset = self._offsets[slot] - 1
+            if offset >= 0:
+                end = self._urls.index(b"\n", offset) + 1
+                self._offsets[slot] = len(urls) + 1
+                urls += self._urls[offset:end]
+        self._urls = urls
+        self._garbage = 0
+
+    def _store_url(self, url: str) -> int:
+        # factor out the scheme and host, which will be shared by most of the urls in the index
+        split = url.find("/", url.find("//") + 2) + 1 if "//" in url else 0
+        prefix, suffix = url[:split], url[split:]
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self._prefixes)
+            self._prefixes.append(prefix)
+            self._prefix_ids[prefix] = prefix_id
+
+        offset = len(self._urls)
+        self._urls += _varint(prefix_id) + suffix.encode("utf-8") + b"\n"
+        return offset
+
+    def _load_url(self, offset: int) -> str:
+        prefix_id, offset = _read_varint(self._urls, offset)
+        end = self._urls.index(b"\n", offset)
+        suffix = self._urls[offset:end].decode("utf-8")
+        return self._prefixes[prefix_id] + suffix
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(buf, offset):
+    n = 0
+    shift = 0
+    while True:
+        byte = buf[offset]
+        offset += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, offset
+        shift += 7
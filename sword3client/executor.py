@@ -0,0 +1,202 @@
+from sword3client import SWORD3Client
+from sword3client.packaging import SWORDBagIt
+from sword3client.lib import paths
+
+from sword3common import Metadata, constants
+
+from concurrent.futures import ProcessPoolExecutor, Future
+
+import os
+import time
+import base64
+import typing
+import mimetypes
+
+# The client of the current worker process, created by the executor's initialiser
+_client = None  # type: typing.Optional[SWORD3Client]
+
+
+def _init_worker(client_factory: typing.Callable[[], SWORD3Client]):
+    global _client
+    _client = client_factory()
+
+
+def worker_client() -> SWORD3Client:
+    """The client of the current worker process.  Outside of a worker (for example if a task is called directly) a
+    default client is created on first use"""
+    global _client
+    if _client is None:
+        _client = SWORD3Client()
+    return _client
+
+
+class DepositResult(object):
+    """What a task run by a :class:`DepositExecutor` did.  Only plain values are kept, so the result is cheap to
+    send back from the worker: an exception is reduced to its class name and message, as SWORD exceptions hold
+    the HTTP response, which can't be pickled"""
+
+    __slots__ = ("task", "source", "location", "status_code", "error_type", "error", "duration")
+
+    def __init__(
+        self,
+        task: str,
+        source: typing.Any,
+        location: str = None,
+        status_code: int = None,
+        error_type: str = None,
+        error: str = None,
+        duration: float = 0.0,
+    ):
+        self.task = task
+        self.source = source
+        self.location = location
+        self.status_code = status_code
+        self.error_type = error_type
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return self.error_type is None
+
+    def __repr__(self):
+        if self.ok:
+            return "DepositResult({t}, {s!r} -> {l} [{c}])".format(
+                t=self.task, s=self.source, l=self.location, c=self.status_code
+            )
+        return "DepositResult({t}, {s!r} failed: {e}: {m})".format(
+            t=self.task, s=self.source, e=self.error_type, m=self.error
+        )
+
+
+def _run(task: str, source, call: typing.Callable) -> DepositResult:
+    start = time.perf_counter()
+    try:
+        resp = call(worker_client())
+    except Exception as e:
+        return DepositResult(task, source, error_type=type(e).__name__, error=str(e),
+                             duration=time.perf_counter() - start)
+    return DepositResult(task, source, location=resp.location, status_code=resp.status_code,
+                         duration=time.perf_counter() - start)
+
+
+def _file_digest(path: str) -> typing.Dict[str, str]:
+    return {constants.DIGEST_SHA_256: base64.b64encode(paths.sha256(path).digest()).decode("ascii")}
+
+
+def _content_type(path: str, content_type: str = None) -> str:
+    if content_type is not None:
+        return content_type
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _package(source_paths: typing.List[str], metadata: dict = None, compress: bool = False) -> SWORDBagIt:
+    bag = SWORDBagIt(Metadata(metadata) if metadata is not None else None, compress=compress)
+    for path in source_paths:
+        bag.add_file(path)
+    return bag
+
+
+#########################################################
+## Tasks
+##
+## Each runs in a worker process, with that worker's client.  Files are given by path, and metadata as the plain
+## dict of a Metadata object's ``data``, so that only small, picklable values are sent to the worker
+
+def deposit_binary(service_url: str, path: str, content_type: str = None, filename: str = None,
+                   in_progress: bool = False) -> DepositResult:
+    """Create a new object with the file at ``path`` as its content"""
+    def call(client):
+        with open(path, "rb") as f:
+            return client.create_object_with_binary(
+                service_url, f, filename or os.path.basename(path), _file_digest(path),
+                content_length=os.path.getsize(path), content_type=_content_type(path, content_type),
+                in_progress=in_progress
+            )
+    return _run("deposit_binary", path, call)
+
+
+def add_binary(object_url: str, path: str, content_type: str = None, filename: str = None) -> DepositResult:
+    """Add the file at ``path`` to an existing object"""
+    def call(client):
+        with open(path, "rb") as f:
+            return client.add_binary(
+                object_url, f, filename or os.path.basename(path), _file_digest(path),
+                content_length=os.path.getsize(path), content_type=_content_type(path, content_type)
+            )
+    return _run("add_binary", path, call)
+
+
+def deposit_package(service_url: str, source_paths: typing.List[str], metadata: dict = None,
+                    compress: bool = False, in_progress: bool = False) -> DepositResult:
+    """Create a new object from a SWORDBagIt package of the files at ``source_paths``, built in the worker"""
+    def call(client):
+        bag = _package(source_paths, metadata, compress)
+        return client.create_object_with_package(
+            service_url, bag.stream(), "package.zip", bag.digest(), content_length=bag.content_length,
+            content_type=bag.content_type, packaging=bag.packaging, in_progress=in_progress
+        )
+    return _run("deposit_package", list(source_paths), call)
+
+
+def add_package(object_url: str, source_paths: typing.List[str], metadata: dict = None,
+                compress: bool = False) -> DepositResult:
+    """Add a SWORDBagIt package of the files at ``source_paths`` to an existing object"""
+    def call(client):
+        bag = _package(source_paths, metadata, compress)
+        return client.add_package(
+            object_url, bag.stream(), "package.zip", bag.digest(), content_length=bag.content_length,
+            content_type=bag.content_type, packaging=bag.packaging
+        )
+    return _run("add_package", list(source_paths), call)
+
+
+def deposit_metadata(service_url: str, metadata: dict, in_progress: bool = False) -> DepositResult:
+    """Create a new object with the given metadata"""
+    def call(client):
+        return client.create_object_with_metadata(service_url, Metadata(metadata), in_progress=in_progress)
+    return _run("deposit_metadata", None, call)
+
+
+class DepositExecutor(object):
+    """Runs deposit tasks in a pool of worker processes, so that the CPU-heavy parts (digesting files, building
+    packages, serialising large metadata) use every core rather than queueing on the GIL.
+
+    Each worker creates its own client, by calling ``client_factory``, which must be picklable (a class or a
+    module-level function), and uses it, with its connection pool, for every task it runs.  The tasks are the
+    functions of this module, :func:`deposit_binary`, :func:`deposit_package` and so on, or any other picklable
+    function which returns a :class:`DepositResult`:
+
+    .. code:: python
+
+        with DepositExecutor(max_workers=8) as executor:
+            futures = [executor.submit(deposit_binary, SERVICE, path) for path in paths]
+            for future in as_completed(futures):
+                print(future.result())
+    """
+
+    def __init__(
+        self,
+        client_factory: typing.Callable[[], SWORD3Client] = SWORD3Client,
+        max_workers: int = None,
+        mp_context=None,
+    ):
+        self._pool = ProcessPoolExecutor(
+            max_workers, mp_context=mp_context, initializer=_init_worker, initargs=(client_factory,)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, task: typing.Callable[..., DepositResult], *args, **kwargs) -> Future:
+        return self._pool.submit(task, *args, **kwargs)
+
+    def map(self, task: typing.Callable[..., DepositResult], *iterables, chunksize: int = 1) -> typing.Iterator[DepositResult]:
+        """Run ``task`` over the arguments from ``iterables``, yielding the results in order"""
+        return self._pool.map(task, *iterables, chunksize=chunksize)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
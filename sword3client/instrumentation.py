@@ -0,0 +1,258 @@
+from sword3client.connection import HttpLayer
+from sword3client.lib.streams import is_chunked
+
+import time
+import typing
+import functools
+import contextlib
+import contextvars
+
+START = "start"
+HEADERS_BUILT = "headers-built"
+REQUEST_SENT = "request-sent"
+RESPONSE_RECEIVED = "response-received"
+PARSED = "parsed"
+ERROR = "error"
+PHASE_START = "phase-start"
+PHASE_END = "phase-end"
+
+DIGEST = "digest"
+SERIALISE = "serialise"
+
+_current = contextvars.ContextVar("sword3client_operation", default=None)
+
+
+class InstrumentationEvent(object):
+    """Something that happened during a protocol operation.
+
+    ``event`` is one of ``start``, ``headers-built`` (the request is about to go to the HTTP layer),
+    ``request-sent`` (the whole body has been read by the HTTP layer), ``response-received``, ``parsed`` (the
+    operation has finished with the response) or ``error``.  Work within the operation, such as computing a digest,
+    is bracketed by ``phase-start`` and ``phase-end`` events, with the name of the work in ``phase``.  ``timestamp`` is from :func:`time.monotonic`, and
+    ``started`` is the timestamp of the operation's ``start`` event.  The byte counts and status code are those of
+    the operation so far."""
+
+    __slots__ = (
+        "event", "operation", "url", "status_code", "bytes_sent", "bytes_received", "timestamp", "started", "error",
+        "phase"
+    )
+
+    def __init__(self, event, operation, url, status_code, bytes_sent, bytes_received, timestamp, started, error=None,
+                 phase=None):
+        self.event = event  # type: str
+        self.operation = operation  # type: str
+        self.url = url  # type: typing.Optional[str]
+        self.status_code = status_code  # type: typing.Optional[int]
+        self.bytes_sent = bytes_sent  # type: int
+        self.bytes_received = bytes_received  # type: int
+        self.timestamp = timestamp  # type: float
+        self.started = started  # type: float
+        self.error = error  # type: typing.Optional[BaseException]
+        self.phase = phase  # type: typing.Optional[str]
+
+    def __repr__(self):
+        return "InstrumentationEvent({x} {y} {z} {s})".format(x=self.event, y=self.operation, z=self.url, s=self.status_code)
+
+
+class Operation(object):
+    """Emits the events for one protocol operation on a client, and tracks it as the current operation, so that
+    the requests it makes through the client's HTTP layer are attributed to it"""
+
+    def __init__(self, client, name: str, url: str = None):
+        self.client = client
+        self.name = name
+        self.url = url
+        self.status_code = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.started = None
+        self.request_sent = False
+        self._token = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self._token = _current.set(self)
+        self.emit(START, timestamp=self.started)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current.reset(self._token)
+        if exc_val is not None:
+            self.emit(ERROR, exc_val)
+        else:
+            self.emit(PARSED)
+        return False
+
+    def emit(self, event: str, error: BaseException = None, timestamp: float = None, phase: str = None):
+        evt = InstrumentationEvent(
+            event,
+            self.name,
+            self.url,
+            self.status_code,
+            self.bytes_sent,
+            self.bytes_received,
+            timestamp if timestamp is not None else time.monotonic(),
+            self.started,
+            error,
+            phase
+        )
+        for listener in self.client._listeners:
+            listener(evt)
+
+
+def current_operation() -> typing.Optional[Operation]:
+    """The operation in progress in this thread (or async task), if it is being instrumented"""
+    return _current.get()
+
+
+class _Phase(object):
+    def __init__(self, op: Operation, name: str):
+        self.op = op
+        self.name = name
+
+    def __enter__(self):
+        self.op.emit(PHASE_START, phase=self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.op.emit(PHASE_END, phase=self.name)
+        return False
+
+
+_no_phase = contextlib.nullcontext()
+
+
+def phase(name: str):
+    """Context manager which brackets some work within the current operation (such as :data:`DIGEST` or
+    :data:`SERIALISE`) with ``phase-start`` and ``phase-end`` events.  Outside of an instrumented operation it
+    does nothing"""
+    op = _current.get()
+    if op is None:
+        return _no_phase
+    return _Phase(op, name)
+
+
+def instrumented(name: str):
+    """Decorator for the client's protocol methods, which emits the operation's events to the client's listeners.
+    When the client has no listeners the method is called directly, as it is when it is called from within
+    another operation of the client (such as ``create_object_with_temporary_file``, which is carried out by
+    ``create_object_by_reference``): its request belongs to the operation the caller asked for, so is reported
+    once, under that operation's name"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not self._listeners:
+                return fn(self, *args, **kwargs)
+            current = _current.get()
+            if current is not None and current.client is self:
+                return fn(self, *args, **kwargs)
+            url = args[0] if len(args) > 0 and isinstance(args[0], str) else None
+            with Operation(self, name, url):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InstrumentedHttpLayer(HttpLayer):
+    """Wraps the client's HTTP layer while it has listeners, to emit the request and response events of the
+    current operation.  Requests made outside of an operation of the client go straight through"""
+
+    def __init__(self, http: HttpLayer, client):
+        self.http = http
+        self._client = client
+        super(InstrumentedHttpLayer, self).__init__()
+
+    def get(self, url, headers=None, stream=False):
+        op = self._operation()
+        if op is None:
+            return self.http.get(url, headers=headers, stream=stream)
+        self._sending(op, url)
+        return self._received(op, self.http.get(url, headers=headers, stream=stream), stream)
+
+    def put(self, url, data, headers=None):
+        op = self._operation()
+        if op is None:
+            return self.http.put(url, data, headers=headers)
+        data = self._sending(op, url, data)
+        return self._received(op, self.http.put(url, data, headers=headers))
+
+    def post(self, url, data, headers=None):
+        op = self._operation()
+        if op is None:
+            return self.http.post(url, data, headers=headers)
+        data = self._sending(op, url, data)
+        return self._received(op, self.http.post(url, data, headers=headers))
+
+    def delete(self, url):
+        op = self._operation()
+        if op is None:
+            return self.http.delete(url)
+        self._sending(op, url)
+        return self._received(op, self.http.delete(url))
+
+    def _operation(self) -> typing.Optional[Operation]:
+        op = _current.get()
+        if op is None or op.client is not self._client:
+            return None
+        return op
+
+    def _sending(self, op: Operation, url, data=None):
+        op.url = url
+        op.status_code = None
+        op.emit(HEADERS_BUILT)
+        op.request_sent = False
+        if data is None or isinstance(data, (bytes, bytearray, str)):
+            # the whole request is handed to the HTTP layer at once, so this is as close as we can get to when it
+            # was sent; emitting it after the call would put it after the response had arrived
+            if data is not None:
+                op.bytes_sent += len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+            op.request_sent = True
+            op.emit(REQUEST_SENT)
+            return data
+        if is_chunked(data):
+            return _counting_chunks(data, op)
+        return _CountingReader(data, op)
+
+    def _received(self, op: Operation, resp, stream=False):
+        if not op.request_sent:
+            op.request_sent = True
+            op.emit(REQUEST_SENT)
+        op.status_code = resp.status_code
+        length = resp.header("Content-Length")
+        if length is not None:
+            op.bytes_received += int(length)
+        elif not stream:
+            op.bytes_received += len(resp.content)
+        op.emit(RESPONSE_RECEIVED)
+        return resp
+
+
+def _counting_chunks(chunks, op: Operation):
+    """As :class:`_CountingReader`, for a body which is an iterable of chunks"""
+    for chunk in chunks:
+        op.bytes_sent += len(chunk)
+        yield chunk
+    if not op.request_sent:
+        op.request_sent = True
+        op.emit(REQUEST_SENT)
+
+
+class _CountingReader(object):
+    """Counts the bytes of a request body as the HTTP layer reads it, and emits ``request-sent`` when it has all
+    been read"""
+
+    def __init__(self, stream, op: Operation):
+        self._stream = stream
+        self._op = op
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if data:
+            self._op.bytes_sent += len(data)
+        elif not self._op.request_sent:
+            self._op.request_sent = True
+            self._op.emit(REQUEST_SENT)
+        return data
+
+    def __getattr__(self, item):
+        return getattr(self._stream, item)
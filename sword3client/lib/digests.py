@@ -0,0 +1,53 @@
+from sword3client.lib import paths
+
+from sword3common import constants
+
+import os
+import json
+import base64
+import threading
+
+
+class DigestCache(object):
+    """Remembers the SHA-256 of local files, keyed on their path, size and modification time, so that a file
+    which hasn't changed since it was last digested is never read again.
+
+    If a ``path`` is given the cache is loaded from it, and :meth:`save` writes it back."""
+
+    def __init__(self, path: str = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    @property
+    def path(self):
+        return self._path
+
+    def sha256(self, file_path: str) -> bytes:
+        """The raw SHA-256 digest of the file's content"""
+        key = os.path.realpath(file_path)
+        st = os.stat(key)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return bytes.fromhex(cached[2])
+
+        digest = paths.sha256(key).digest()
+        with self._lock:
+            self._entries[key] = [st.st_size, st.st_mtime_ns, digest.hex()]
+        return digest
+
+    def digest(self, file_path: str) -> dict:
+        """The digest of the file in the form accepted by the client's deposit methods"""
+        return {constants.DIGEST_SHA_256: base64.b64encode(self.sha256(file_path)).decode("ascii")}
+
+    def save(self):
+        if self._path is None:
+            return
+        with self._lock:
+            data = json.dumps(self._entries)
+        with open(self._path, "w") as f:
+            f.write(data)
@@ -0,0 +1,133 @@
+import json
+import codecs
+import typing
+
+CHUNK_SIZE = 65536
+
+_WHITESPACE = " \t\n\r"
+_NUMBER = "0123456789.eE+-"
+_decoder = json.JSONDecoder()
+
+
+class _Reader(object):
+    """A window onto a stream of JSON text, read in chunks as the parser needs more of it.  Text which has been
+    consumed is dropped, so only the value currently being parsed is held in memory"""
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _more(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            text = self._decode(b"", final=True) if not isinstance(chunk, str) else ""
+        else:
+            text = self._decode(chunk) if not isinstance(chunk, str) else chunk
+        # drop what has been consumed before adding more
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next character which isn't whitespace, without consuming it, or "" at the end of the stream"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if c == "" or c not in chars:
+            raise ValueError("Expected one of {x!r} in JSON stream, found {y!r}".format(x=chars, y=c or "end of data"))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """Parse the next complete JSON value"""
+        self.peek()
+        reads = 1
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # probably cut short at the end of the buffer; if not, the error is raised again at the end of the
+                # data.  Read ahead further each time, so that a large value isn't parsed over and over
+                if not self._more():
+                    raise
+                for _ in range(reads - 1):
+                    self._more()
+                reads *= 2
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and not self._eof \
+                    and self._buf[end:].strip(_NUMBER) == "":
+                self._more()
+                continue
+            self._pos = end
+            return value
+
+
+def iter_array(stream, key: str, on_field: typing.Callable[[str, typing.Any], None] = None,
+               chunk_size: int = CHUNK_SIZE) -> typing.Iterator:
+    """Incrementally parse a stream (binary or text) holding a JSON object, yielding the elements of the array held
+    in its ``key`` field one at a time.  Every other field of the object is passed to ``on_field`` (name, value) as
+    it is reached"""
+    reader = _Reader(stream, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            value = reader.value()
+            if on_field is not None:
+                on_field(name, value)
+        if reader.expect(",}") == "}":
+            return
+
+
+def has_rel(link: dict, rels: typing.Optional[typing.Collection[str]]) -> bool:
+    """Whether a Status Document link has any of the given rels.  If ``rels`` is None every link matches"""
+    if rels is None:
+        return True
+    return any(r in rels for r in link.get("rel", []))
+
+
+def iter_links(stream, rels: typing.Collection[str] = None, on_field: typing.Callable[[str, typing.Any], None] = None,
+               chunk_size: int = CHUNK_SIZE) -> typing.Iterator[dict]:
+    """The links of a Status Document, parsed one at a time from a stream, optionally only those with one of
+    ``rels``"""
+    for link in iter_array(stream, "links", on_field, chunk_size):
+        if has_rel(link, rels):
+            yield link
+
+
+def load_status(stream, rels: typing.Collection[str] = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Parse a Status Document from a stream, keeping only the links with one of ``rels``, so that the links which
+    aren't wanted are never all in memory at once"""
+    data = {}
+    links = []
+    for link in iter_links(stream, rels, data.__setitem__, chunk_size):
+        links.append(link)
+    data["links"] = links
+    return data
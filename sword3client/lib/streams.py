@@ -0,0 +1,120 @@
+import typing
+
+
+class IterStream(object):
+    """Read-only file-like object which pulls its bytes from an iterable of byte chunks.
+
+    This lets generated content (such as a package being built on the fly) be handed to anything
+    which expects a stream with a ``read`` method, without first writing it out to disk."""
+
+    def __init__(self, chunks: typing.Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._exhausted = False
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            parts = [self._buffer]
+            parts.extend(self._chunks)
+            self._buffer = b""
+            self._exhausted = True
+            return b"".join(parts)
+
+        parts = [self._buffer]
+        available = len(self._buffer)
+        while available < size and not self._exhausted:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._exhausted = True
+                break
+            parts.append(chunk)
+            available += len(chunk)
+
+        data = b"".join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+        self._exhausted = True
+        self._buffer = b""
+
+
+CHUNK_SIZE = 65536
+
+
+class ChunkedBody(object):
+    """A request body of unknown length, to be sent with chunked transfer encoding.
+
+    ``source`` is a file-like object which can't report its size (a pipe, such as the stdout of a subprocess, or
+    an :class:`IterStream`) or an iterable of byte chunks (such as a generator).  Iterating over the body yields
+    its content in chunks of at most ``chunk_size`` bytes, each of which goes out as one chunk on the wire, so
+    the content streams from the producer to the server without ever being held in full.
+
+    HTTP layers recognise a chunked body as an iterable without a ``read`` method (see :func:`is_chunked`).  It
+    can only be sent once."""
+
+    def __init__(self, source, chunk_size: int = CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self._source = source
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+
+    def __iter__(self) -> typing.Iterator[bytes]:
+        chunks = self._read() if hasattr(self._source, "read") else self._split()
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk:
+                self.bytes_read += len(chunk)
+                yield chunk
+
+    def _read(self):
+        while True:
+            chunk = self._source.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _split(self):
+        size = self.chunk_size
+        for chunk in self._source:
+            if len(chunk) <= size:
+                yield chunk
+            else:
+                view = memoryview(chunk)
+                for i in range(0, len(chunk), size):
+                    yield bytes(view[i:i + size])
+
+    def close(self):
+        close = getattr(self._source, "close", None)
+        if close is not None:
+            close()
+
+
+def is_chunked(data) -> bool:
+    """Whether a request body is an iterable of chunks (such as a :class:`ChunkedBody`) rather than bytes, a string
+    or a file-like object"""
+    return data is not None and not isinstance(data, (bytes, bytearray, str)) \
+        and not hasattr(data, "read") and hasattr(data, "__iter__")
+
+
+def length_unknown(data) -> bool:
+    """Whether the size of a request body can't be found without reading it all: an iterable of chunks, or a stream
+    which can't seek, such as a pipe"""
+    if data is None or isinstance(data, (bytes, bytearray, str)):
+        return False
+    if not hasattr(data, "read"):
+        return hasattr(data, "__iter__")
+    seekable = getattr(data, "seekable", None)
+    try:
+        return seekable is None or not seekable()
+    except (OSError, ValueError):
+        return True
@@ -0,0 +1,186 @@
+from sword3client.lib.streams import is_chunked
+
+from io import BytesIO
+
+import time
+import heapq
+import typing
+import itertools
+import threading
+
+CHUNK_SIZE = 16384
+
+
+class TokenBucket(object):
+    """Limits a flow of bytes to ``rate`` bytes per second, allowing bursts of up to ``burst`` bytes.
+
+    :meth:`consume` blocks for as long as it takes the bucket to pay for the bytes, so a bucket shared between
+    threads caps their combined rate.  The bucket can go into debt, so a large read is paid for after the fact
+    rather than refused."""
+
+    def __init__(self, rate: float, burst: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(self.rate / 10, CHUNK_SIZE)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ThrottledReader(object):
+    """Wraps a file-like object so that reading from it is limited by one or more token buckets (for example one
+    for the connection, and one shared by every connection).  Reads are split into chunks of at most
+    ``chunk_size``, so the flow is smooth rather than bursty"""
+
+    def __init__(self, stream, buckets: typing.Iterable[TokenBucket], chunk_size: int = CHUNK_SIZE):
+        self._stream = stream
+        self._buckets = [b for b in buckets if b is not None]
+        self._chunk_size = chunk_size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self._read_chunk(self._chunk_size)
+                if not chunk:
+                    return chunk[:0] if len(chunks) == 0 else chunks[0][:0].join(chunks)
+                chunks.append(chunk)
+        return self._read_chunk(min(size, self._chunk_size))
+
+    def _read_chunk(self, size):
+        data = self._stream.read(size)
+        if data:
+            for bucket in self._buckets:
+                bucket.consume(len(data))
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self._read_chunk(self._chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __getattr__(self, item):
+        return getattr(self._stream, item)
+
+
+def throttled_chunks(chunks: typing.Iterable[bytes], buckets: typing.Iterable[TokenBucket]) -> typing.Iterator[bytes]:
+    """As :class:`ThrottledReader`, for a flow which is an iterable of chunks.  The chunks are passed on as they
+    are, each once the buckets have paid for it"""
+    buckets = [b for b in buckets if b is not None]
+    for chunk in chunks:
+        for bucket in buckets:
+            bucket.consume(len(chunk))
+        yield chunk
+
+
+def throttled_body(data, buckets: typing.Iterable[TokenBucket]):
+    """A request body, throttled by the buckets as it is read.  A body which is already in memory is read through
+    a file-like object, in chunks like any other (so that transfers sharing the buckets get their turns in between),
+    and the HTTP layer can still find its length"""
+    buckets = [b for b in buckets if b is not None]
+    if len(buckets) == 0 or data is None:
+        return data
+    if isinstance(data, (bytes, bytearray, str)):
+        return ThrottledReader(BytesIO(data.encode("utf-8") if isinstance(data, str) else data), buckets)
+    if is_chunked(data):
+        return throttled_chunks(data, buckets)
+    return ThrottledReader(data, buckets)
+
+
+class BandwidthManager(object):
+    """Shares a ceiling of ``rate`` bytes per second between concurrent transfers, in proportion to their weights.
+
+    Each transfer (see :meth:`transfer`) waits for its turn to send or receive every chunk.  Turns are given in
+    start-time fair queueing order, so while transfers are competing, one of weight 4 gets four times the bandwidth
+    of one of weight 1, and a transfer on its own gets all of it.  A transfer which pauses (waiting for a response,
+    or for its producer) builds up no credit, so it can't crowd out the others when it resumes.  A small request is
+    never queued behind more than a chunk of each bulk transfer"""
+
+    def __init__(self, rate: float, burst: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(self.rate / 10, CHUNK_SIZE)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        # chunks waiting for their turn, as (start tag, sequence number)
+        self._queue = []
+        self._sequence = itertools.count()
+        # the start tag of the last chunk given its turn
+        self._virtual_time = 0.0
+        self._cond = threading.Condition()
+
+    def transfer(self, weight: float = 1.0) -> "Transfer":
+        """A new transfer, to share the bandwidth with weight ``weight``"""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        return Transfer(self, weight)
+
+    def set_rate(self, rate: float):
+        """Change the ceiling, which takes effect for the transfers already under way"""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._cond:
+            self._refill()
+            self.rate = float(rate)
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _consume(self, transfer: "Transfer", n: int):
+        with self._cond:
+            start = max(self._virtual_time, transfer._finish)
+            transfer._finish = start + n / transfer.weight
+            entry = (start, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            # a chunk which goes to the front of the queue may have to wake the one it overtook
+            self._cond.notify_all()
+            while True:
+                self._refill()
+                if self._tokens >= 0 and self._queue[0] is entry:
+                    break
+                # the bandwidth is only given out once it is free, so that chunks arriving in the meantime take
+                # their place in the queue
+                self._cond.wait(-self._tokens / self.rate if self._tokens < 0 else None)
+            heapq.heappop(self._queue)
+            self._virtual_time = start
+            self._tokens -= n
+            self._cond.notify_all()
+
+
+class Transfer(object):
+    """One transfer's share of a :class:`BandwidthManager`.  It can be given to :class:`ThrottledReader` and
+    :func:`throttled_chunks` in place of a :class:`TokenBucket`"""
+
+    def __init__(self, manager: BandwidthManager, weight: float):
+        self.manager = manager
+        self.weight = float(weight)
+        # the virtual finishing time of the transfer's last chunk; kept by the manager
+        self._finish = 0.0
+
+    def consume(self, n: int):
+        if n > 0:
+            self.manager._consume(self, n)
+
+    def consume_chunks(self, n: int, chunk_size: int = CHUNK_SIZE):
+        """Pay for ``n`` bytes which have arrived all at once, a chunk at a time, so that the other transfers get
+        their turns in between"""
+        while n > 0:
+            self.consume(min(n, chunk_size))
+            n -= chunk_size
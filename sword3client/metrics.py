@@ -0,0 +1,190 @@
+from sword3client import instrumentation
+
+from collections import deque
+
+import os
+import time
+import bisect
+import typing
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+PREFIX = "sword3client"
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry(object):
+    """Collects metrics for the protocol operations of one or more clients, as an instrumentation listener.
+
+    For each operation it counts successes and errors, the responses with each status code, and the bytes sent and
+    received, and keeps a histogram of how long the operation took, with fixed ``buckets`` (upper bounds, in
+    seconds).  Upload and download throughput gauges are the bytes transferred by operations which finished in the
+    last ``window`` seconds, per second.
+
+    Metrics can be taken as a dictionary with :meth:`snapshot`, or in the Prometheus text exposition format with
+    :meth:`prometheus` and :meth:`write_prometheus`."""
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS, window: float = 10.0):
+        self._buckets = tuple(sorted(buckets))
+        self._window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}  # type: typing.Dict[typing.Tuple[str, str], int]
+            self._responses = {}  # type: typing.Dict[typing.Tuple[str, int], int]
+            self._sent = {}  # type: typing.Dict[str, int]
+            self._received = {}  # type: typing.Dict[str, int]
+            self._latency = {}  # type: typing.Dict[str, _Histogram]
+            self._recent = deque()
+
+    def attach(self, client):
+        client.add_listener(self)
+
+    def detach(self, client):
+        client.remove_listener(self)
+
+    def __call__(self, event: instrumentation.InstrumentationEvent):
+        if event.event == instrumentation.PARSED:
+            outcome = "success"
+        elif event.event == instrumentation.ERROR:
+            outcome = "error"
+        else:
+            return
+
+        op = event.operation
+        elapsed = event.timestamp - event.started
+        with self._lock:
+            key = (op, outcome)
+            self._operations[key] = self._operations.get(key, 0) + 1
+            if event.status_code is not None:
+                key = (op, event.status_code)
+                self._responses[key] = self._responses.get(key, 0) + 1
+            self._sent[op] = self._sent.get(op, 0) + event.bytes_sent
+            self._received[op] = self._received.get(op, 0) + event.bytes_received
+
+            hist = self._latency.get(op)
+            if hist is None:
+                hist = _Histogram(len(self._buckets))
+                self._latency[op] = hist
+            hist.counts[bisect.bisect_left(self._buckets, elapsed)] += 1
+            hist.sum += elapsed
+            hist.count += 1
+
+            if event.bytes_sent or event.bytes_received:
+                self._recent.append((event.timestamp, event.bytes_sent, event.bytes_received))
+                self._expire(event.timestamp)
+
+    def snapshot(self) -> dict:
+        """The current value of every metric.  Histogram buckets are cumulative, as in Prometheus, keyed by their
+        upper bound, with ``inf`` last"""
+        with self._lock:
+            self._expire(time.monotonic())
+            upload = sum(r[1] for r in self._recent) / self._window
+            download = sum(r[2] for r in self._recent) / self._window
+
+            operations = {}
+            for (op, outcome), n in self._operations.items():
+                operations.setdefault(op, {"success": 0, "error": 0})[outcome] = n
+
+            responses = {}
+            for (op, code), n in self._responses.items():
+                responses.setdefault(op, {})[code] = n
+
+            latency = {}
+            for op, hist in self._latency.items():
+                cumulative = 0
+                buckets = {}
+                for bound, n in zip(self._buckets + (float("inf"),), hist.counts):
+                    cumulative += n
+                    buckets[bound] = cumulative
+                latency[op] = {"buckets": buckets, "sum": hist.sum, "count": hist.count}
+
+            return {
+                "operations": operations,
+                "responses": responses,
+                "latency": latency,
+                "bytes_sent": dict(self._sent),
+                "bytes_received": dict(self._received),
+                "upload_bytes_per_second": upload,
+                "download_bytes_per_second": download,
+            }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append("# HELP {p}_{n} {h}".format(p=PREFIX, n=name, h=help_text))
+            lines.append("# TYPE {p}_{n} {k}".format(p=PREFIX, n=name, k=kind))
+
+        def sample(name, labels, value):
+            if labels:
+                label_str = ",".join('{k}="{v}"'.format(k=k, v=_escape(str(v))) for k, v in labels)
+                lines.append("{p}_{n}{{{l}}} {v}".format(p=PREFIX, n=name, l=label_str, v=_number(value)))
+            else:
+                lines.append("{p}_{n} {v}".format(p=PREFIX, n=name, v=_number(value)))
+
+        metric("operations_total", "counter", "Protocol operations completed, by outcome")
+        for op, outcomes in sorted(snap["operations"].items()):
+            for outcome, n in sorted(outcomes.items()):
+                sample("operations_total", [("operation", op), ("outcome", outcome)], n)
+
+        metric("responses_total", "counter", "Responses received, by status code")
+        for op, codes in sorted(snap["responses"].items()):
+            for code, n in sorted(codes.items()):
+                sample("responses_total", [("operation", op), ("code", code)], n)
+
+        metric("operation_duration_seconds", "histogram", "Time taken by protocol operations")
+        for op, hist in sorted(snap["latency"].items()):
+            for bound, n in hist["buckets"].items():
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                sample("operation_duration_seconds_bucket", [("operation", op), ("le", le)], n)
+            sample("operation_duration_seconds_sum", [("operation", op)], hist["sum"])
+            sample("operation_duration_seconds_count", [("operation", op)], hist["count"])
+
+        metric("bytes_sent_total", "counter", "Request body bytes sent")
+        for op, n in sorted(snap["bytes_sent"].items()):
+            sample("bytes_sent_total", [("operation", op)], n)
+
+        metric("bytes_received_total", "counter", "Response body bytes received")
+        for op, n in sorted(snap["bytes_received"].items()):
+            sample("bytes_received_total", [("operation", op)], n)
+
+        metric("upload_bytes_per_second", "gauge", "Upload throughput over the recent window")
+        sample("upload_bytes_per_second", None, snap["upload_bytes_per_second"])
+        metric("download_bytes_per_second", "gauge", "Download throughput over the recent window")
+        sample("download_bytes_per_second", None, snap["download_bytes_per_second"])
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the metrics in the Prometheus text format to a file, for example for the node exporter's
+        textfile collector.  The file is replaced atomically"""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def _expire(self, now):
+        cutoff = now - self._window
+        while len(self._recent) > 0 and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,100 @@
+from sword3common import StatusDocument
+
+from urllib.parse import urlsplit, unquote
+
+import typing
+import weakref
+import threading
+
+
+class LinkIndex(object):
+    """An index over the links of a :class:`StatusDocument`, built once, so that finding links by rel, URL, eTag,
+    By-Reference source or filename doesn't scan the whole list each time.  The object, metadata and fileset URLs
+    aren't indexed, as the document holds them directly: read them from the document.
+
+    Use :func:`link_index` to get the (shared, cached) index for a document rather than constructing one.  It is
+    rebuilt when links are added to the document or its list of links is replaced, but not when a link is changed
+    in place (its URL or rels, say): after doing that, construct a new ``LinkIndex``.
+
+    The filename of a link is the last segment of the path of its URL, as Status Documents don't carry the names
+    of the files.  Lookups return lists, in document order, as more than one link may match."""
+
+    def __init__(self, status: StatusDocument):
+        self._links = status.links
+        self._count = len(self._links)
+
+        self._by_rel = {}  # type: typing.Dict[str, typing.List[dict]]
+        self._by_id = {}  # type: typing.Dict[str, dict]
+        self._by_etag = {}  # type: typing.Dict[str, typing.List[dict]]
+        self._by_reference = {}  # type: typing.Dict[str, typing.List[dict]]
+        self._by_filename = None  # type: typing.Optional[typing.Dict[str, typing.List[dict]]]
+        for link in self._links:
+            for rel in link.get("rel", []):
+                self._by_rel.setdefault(rel, []).append(link)
+            url = link.get("@id")
+            if url is not None:
+                self._by_id.setdefault(url, link)
+            if link.get("eTag") is not None:
+                self._by_etag.setdefault(link["eTag"], []).append(link)
+            if link.get("byReference") is not None:
+                self._by_reference.setdefault(link["byReference"], []).append(link)
+
+    def __len__(self):
+        return self._count
+
+    def stale(self, status: StatusDocument) -> bool:
+        """Whether the document's links have been replaced or added to since the index was built"""
+        links = status.links
+        return links is not self._links or len(links) != self._count
+
+    def with_rel(self, *rels: str) -> typing.List[dict]:
+        """The links with any of the given rels, in document order"""
+        if len(rels) == 1:
+            return list(self._by_rel.get(rels[0], []))
+        matched = {}
+        for rel in rels:
+            for link in self._by_rel.get(rel, []):
+                matched[id(link)] = link
+        return [link for link in self._links if id(link) in matched]
+
+    def get(self, url: str) -> typing.Optional[dict]:
+        """The link with the given URL"""
+        return self._by_id.get(url)
+
+    def with_etag(self, etag: str) -> typing.List[dict]:
+        return list(self._by_etag.get(etag, []))
+
+    def by_reference(self, source_url: str) -> typing.List[dict]:
+        """The links of files which were deposited By-Reference from ``source_url``"""
+        return list(self._by_reference.get(source_url, []))
+
+    def with_filename(self, name: str) -> typing.List[dict]:
+        if self._by_filename is None:
+            # parsing every URL costs more than the rest of the index put together, so it waits until it is used
+            by_filename = {}
+            for link in self._links[:self._count]:
+                if link.get("@id") is not None:
+                    by_filename.setdefault(filename(link["@id"]), []).append(link)
+            self._by_filename = by_filename
+        return list(self._by_filename.get(name, []))
+
+
+def filename(url: str) -> str:
+    """The last segment of the path of a URL"""
+    return unquote(urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1])
+
+
+_indexes = weakref.WeakKeyDictionary()  # type: typing.MutableMapping[StatusDocument, LinkIndex]
+_lock = threading.Lock()
+
+
+def link_index(status: StatusDocument) -> LinkIndex:
+    """The index of the document's links, built the first time it is asked for and kept for as long as the document
+    is, unless the document's links change"""
+    with _lock:
+        index = _indexes.get(status)
+    if index is None or index.stale(status):
+        index = LinkIndex(status)
+        with _lock:
+            _indexes[status] = index
+    return index
@@ -1,24 +1,28 @@
 from sword3common.models.status import StatusDocument
 from sword3common import exceptions
 
+from sword3client.lib import jsonstream
+
+from io import BytesIO
+
 import json
+import typing
 
 
 class SWORDResponse(object):
-    """Class to wrap the HTTP response for a SWORD request, to give you some convenient semantic APIs"""
-    def __init__(self, http_response):
+    """Class to wrap the HTTP response for a SWORD request, to give you some convenient semantic APIs.
+
+    The Status Document in the response body, if there is one, is parsed straight away, so that a response which
+    doesn't hold a valid one raises ``InvalidDataFromServer`` here.  If ``lazy``, it is only parsed when it is first
+    asked for, so responses for objects with very many files cost nothing unless they are used (and
+    :meth:`iter_links` can read the links without building the document); an invalid document is then only
+    reported when it is parsed."""
+    def __init__(self, http_response, lazy: bool = False):
         self._http_response = http_response
         self._status_document = None
-
-        body = http_response.body
-        if body:
-            data = json.loads(body)
-            try:
-                self._status_document = StatusDocument(data)
-            except exceptions.SeamlessException as e:
-                raise exceptions.InvalidDataFromServer(
-                    "DepositResponse could not be constructed as status document is invalid"
-                ) from e
+        self._parsed = False
+        if not lazy:
+            self.status_document
 
     @property
     def location(self):
@@ -29,8 +33,8 @@ class SWORDResponse(object):
             return http_location
 
         # then look in the status document
-        if self._status_document is not None:
-            return self._status_document.object_url
+        if self.status_document is not None:
+            return self.status_document.object_url
 
         # otherwise we weren't given one
         return None
@@ -43,4 +47,34 @@ class SWORDResponse(object):
     @property
     def status_document(self):
         """The Status Document object if present for this response"""
+        if not self._parsed:
+            body = self._http_response.body
+            if body:
+                data = json.loads(body)
+                try:
+                    self._status_document = StatusDocument(data)
+                except exceptions.SeamlessException as e:
+                    raise exceptions.InvalidDataFromServer(
+                        "DepositResponse could not be constructed as status document is invalid"
+                    ) from e
+            self._parsed = True
         return self._status_document
+
+    def iter_links(self, rels: typing.Collection[str] = None) -> typing.Iterator[dict]:
+        """The links of the Status Document, optionally only those with one of ``rels``, parsed one at a time
+        rather than building the whole document.
+
+        The response to a deposit has already been received in full, so this saves building the document, not
+        holding the response: the links are parsed straight from the bytes as they were received, without
+        decoding them to text first.  To fetch a Status Document a link at a time, use the client's
+        :meth:`~sword3client.SWORD3Client.iter_links`"""
+        if self._parsed:
+            if self._status_document is not None:
+                for link in self._status_document.links:
+                    if jsonstream.has_rel(link, rels):
+                        yield link
+            return
+        content = self._http_response.content
+        if content:
+            for link in jsonstream.iter_links(BytesIO(content), rels):
+                yield link
@@ -0,0 +1,146 @@
+"""The protocol operations of the client, as data.
+
+Each :class:`OperationSpec` says how an operation is carried out: its HTTP method, which URL of the target it is
+sent to, the status codes which mean it succeeded, and the error codes the SWORD specification allows it (any
+other is unexpected).  Headers which are the same for every request are serialised once, here, rather than on
+every call.  The client sends every request through one method, ``SWORD3Client._dispatch``, which reads these."""
+from sword3common import ContentDisposition, constants
+
+import typing
+
+GET = "get"
+PUT = "put"
+POST = "post"
+DELETE = "delete"
+
+JSON = "application/json; charset=UTF-8"
+OCTET_STREAM = "application/octet-stream"
+
+# Constant headers of the JSON deposits, to which the headers which vary (length, digest, ...) are added
+METADATA_HEADERS = {
+    "Content-Type": JSON,
+    "Content-Disposition": ContentDisposition.metadata_upload().serialise(),
+}
+BY_REFERENCE_HEADERS = {
+    "Content-Type": JSON,
+    "Content-Disposition": ContentDisposition.by_reference_upload().serialise(),
+}
+MDBR_HEADERS = {
+    "Content-Type": JSON,
+    "Content-Disposition": ContentDisposition.metadata_and_by_reference_upload().serialise(),
+}
+
+
+class OperationSpec(object):
+    """How one protocol operation is carried out.  ``url_property`` is the property of a Service or Status Document
+    holding the URL the request goes to, when the operation is given a document rather than a URL.  ``headers``
+    are sent with every request, under those of the request itself; they must not be modified"""
+
+    __slots__ = ("name", "method", "url_property", "success", "errors", "headers", "request_context")
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        url_property: typing.Optional[str],
+        success: typing.Iterable[int],
+        errors: typing.Iterable[int],
+        headers: typing.Dict[str, str] = None,
+        request_context: str = None,
+    ):
+        self.name = name
+        self.method = method
+        self.url_property = url_property
+        self.success = frozenset(success)
+        self.errors = frozenset(errors)
+        self.headers = headers
+        self.request_context = request_context
+
+    def __repr__(self):
+        return "OperationSpec({n}: {m} {u})".format(n=self.name, m=self.method.upper(), u=self.url_property)
+
+
+GET_SERVICE = OperationSpec("get_service", GET, "service_url", [200], [401, 403, 404])
+
+CREATE_OBJECT_WITH_METADATA = OperationSpec(
+    "create_object_with_metadata", POST, "service_url", [201, 202], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+REPLACE_OBJECT_WITH_METADATA = OperationSpec(
+    "replace_object_with_metadata", PUT, "object_url", [200, 202], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+GET_METADATA = OperationSpec(
+    "get_metadata", GET, "metadata_url", [200], [400, 401, 403, 404, 405, 412],
+    request_context=constants.RequestContexts.Metadata
+)
+APPEND_METADATA = OperationSpec("append_metadata", POST, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415])
+REPLACE_METADATA = OperationSpec(
+    "replace_metadata", PUT, "metadata_url", [204], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+DELETE_METADATA = OperationSpec("delete_metadata", DELETE, "metadata_url", [204], [400, 401, 403, 404, 405, 412, 413])
+
+CREATE_OBJECT_WITH_BINARY = OperationSpec(
+    "create_object_with_binary", POST, "service_url", [201, 202], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+ADD_BINARY = OperationSpec("add_binary", POST, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415])
+REPLACE_OBJECT_WITH_BINARY = OperationSpec(
+    "replace_object_with_binary", PUT, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415]
+)
+CREATE_OBJECT_WITH_PACKAGE = OperationSpec(
+    "create_object_with_package", POST, "service_url", [201, 202], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+ADD_PACKAGE = OperationSpec("add_package", POST, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415])
+REPLACE_OBJECT_WITH_PACKAGE = OperationSpec(
+    "replace_object_with_package", PUT, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415]
+)
+
+CREATE_OBJECT_BY_REFERENCE = OperationSpec(
+    "create_object_by_reference", POST, "service_url", [201, 202], [400, 401, 403, 404, 405, 412, 413, 415]
+)
+APPEND_BY_REFERENCE = OperationSpec(
+    "append_by_reference", POST, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415]
+)
+REPLACE_OBJECT_BY_REFERENCE = OperationSpec(
+    "replace_object_by_reference", PUT, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415]
+)
+
+CREATE_OBJECT_WITH_MDBR = OperationSpec(
+    "create_object_with_metadata_and_by_reference", POST, "service_url", [201, 202],
+    [400, 401, 403, 404, 405, 412, 413, 415]
+)
+APPEND_MDBR = OperationSpec(
+    "append_metadata_and_by_reference", POST, "object_url", [200, 202], [400, 401, 403, 404, 412, 413, 415]
+)
+REPLACE_OBJECT_WITH_MDBR = OperationSpec(
+    "replace_object_with_metadata_and_by_reference", PUT, "object_url", [200, 202],
+    [400, 401, 403, 404, 405, 412, 413, 415]
+)
+
+GET_OBJECT = OperationSpec("get_object", GET, "object_url", [200], [400, 401, 403, 404, 410, 412])
+# a conditional request, with If-None-Match, which succeeds without a body if the object hasn't changed
+GET_OBJECT_IF_CHANGED = OperationSpec("get_object", GET, "object_url", [200, 304], [400, 401, 403, 404, 410, 412])
+DELETE_OBJECT = OperationSpec("delete_object", DELETE, "object_url", [202, 204], [400, 401, 403, 404, 405, 412])
+
+GET_FILE = OperationSpec("get_file", GET, None, [200], [400, 401, 403, 404, 405, 412])
+REPLACE_FILE = OperationSpec("replace_file", PUT, None, [204], [400, 401, 403, 404, 405, 412, 413])
+DELETE_FILE = OperationSpec("delete_file", DELETE, None, [204], [400, 401, 403, 404, 405, 412])
+REPLACE_FILE_BY_REFERENCE = OperationSpec(
+    "replace_file_by_reference", PUT, None, [204], [400, 401, 403, 404, 405, 412, 413]
+)
+
+REPLACE_FILESET_WITH_BINARY = OperationSpec(
+    "replace_fileset_with_binary", PUT, "fileset_url", [202, 204], [400, 401, 403, 404, 405, 412, 413]
+)
+DELETE_FILESET = OperationSpec("delete_fileset", DELETE, "fileset_url", [204], [400, 401, 403, 404, 405, 412])
+REPLACE_FILESET_BY_REFERENCE = OperationSpec(
+    "replace_fileset_by_reference", PUT, "fileset_url", [202, 204], [400, 401, 403, 404, 405, 412, 413]
+)
+
+INITIALISE_SEGMENTED_UPLOAD = OperationSpec(
+    "initialise_segmented_upload", POST, "staging_url", [201], [400, 401, 403, 404, 412, 413],
+    headers={"Content-Length": "0"}
+)
+UPLOAD_FILE_SEGMENT = OperationSpec(
+    "upload_file_segment", POST, None, [204], [400, 401, 403, 404, 405, 412], headers={"Content-Type": OCTET_STREAM}
+)
+ABORT_SEGMENTED_UPLOAD = OperationSpec("abort_segmented_upload", DELETE, None, [204], [400, 401, 403, 404])
+SEGMENTED_UPLOAD_STATUS = OperationSpec("segmented_upload_status", GET, None, [200], [400, 401, 403, 404])
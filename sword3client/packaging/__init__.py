@@ -0,0 +1,9 @@
+from sword3client.packaging.zipstream import ZipStream, ZipEntry
+from sword3client.packaging.bagit import SWORDBagIt
+
+# Make this package the canonical "import from" location
+ZipStream.__module__ = __name__
+ZipEntry.__module__ = __name__
+SWORDBagIt.__module__ = __name__
+
+__all__ = ['SWORDBagIt', 'ZipStream', 'ZipEntry']
@@ -0,0 +1,238 @@
+from sword3client.packaging.zipstream import ZipStream, ZipEntry, STORED, DEFLATED
+from sword3client.packaging.prepare import (
+    ParallelPreparer, PreparedEntry, PreparedResults, compress_type_for, remove_temporary_file
+)
+from sword3client.lib.streams import IterStream
+
+from sword3common import Metadata, constants
+
+import os
+import json
+import time
+import base64
+import hashlib
+import typing
+import weakref
+
+BAGIT_TXT = b"BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8\n"
+BAG_SOFTWARE_AGENT = "sword3client"
+
+
+class SWORDBagIt(object):
+    """Builds a SWORDBagIt package as a stream, straight from the source files.
+
+    Files are added with :meth:`add_file` (or :meth:`add_bytes`) and are only read when the package is
+    streamed, with the BagIt payload manifests computed as the content passes through.  Nothing is written
+    to a temporary location.  If the package is not compressed, :attr:`content_length` gives the exact size
+    of the zip before it is produced, so it can be sent straight to ``create_object_with_package``:
+
+    .. code:: python
+
+        bag = SWORDBagIt(metadata)
+        bag.add_file("/path/to/data.csv")
+        client.create_object_with_package(
+            SERVICE,
+            bag.stream(),
+            "package.zip",
+            bag.digest(),
+            content_length=bag.content_length,
+            content_type=bag.content_type,
+            packaging=bag.packaging
+        )
+
+    If ``workers`` is given, the payload files are compressed and digested ahead of the stream in a pool of that
+    many worker processes, and the zip is assembled from the results in entry order.  Content which is already
+    compressed (by file extension, or because deflating it gains nothing) is stored rather than deflated.  The
+    results are kept, so that producing the package again (after :meth:`digest`, or to retry a deposit) doesn't
+    compress it again: large deflated files are held in temporary files until :meth:`close` is called or the
+    bag is garbage collected.
+    """
+
+    content_type = "application/zip"
+    packaging = constants.PACKAGE_SWORDBAGIT
+
+    def __init__(
+        self,
+        metadata: Metadata = None,
+        bag_info: typing.Dict[str, str] = None,
+        algorithms: typing.Iterable[str] = ("sha256",),
+        compress: bool = False,
+        workers: int = None,
+    ):
+        self._metadata = metadata
+        self._bag_info = bag_info if bag_info is not None else {}
+        self._algorithms = list(algorithms)
+        self._compress_type = DEFLATED if compress else STORED
+        self._workers = workers
+        self._payload = []  # type: typing.List[ZipEntry]
+        self._created = time.localtime()
+        self._digest = None
+        # the results of preparing the payload in the workers, in entry order, once they are all in hand
+        self._prepared = None  # type: typing.Optional[typing.List[dict]]
+        self._temporary = []  # type: typing.List[str]
+        self._finalizer = weakref.finalize(self, _remove_all, self._temporary)
+
+    def add_file(self, path: str, name: str = None):
+        """Add a file from disk to the payload, as ``data/<name>``.  ``name`` defaults to the file's basename"""
+        name = name if name is not None else os.path.basename(path)
+        name = self._payload_name(name)
+        self._add(ZipEntry.from_path(name, path, compress_type_for(name, self._compress_type)))
+
+    def add_bytes(self, data: bytes, name: str):
+        """Add in-memory content to the payload, as ``data/<name>``"""
+        name = self._payload_name(name)
+        self._add(ZipEntry.from_bytes(name, data, compress_type_for(name, self._compress_type), self._created[:6]))
+
+    @property
+    def content_length(self) -> typing.Optional[int]:
+        """The exact size of the package in bytes, or None if the package is compressed"""
+        return self._zip(None).content_length
+
+    def stream(self) -> IterStream:
+        """Get a new file-like object which produces the package from the beginning"""
+        return self._zip({}).open()
+
+    def digest(self) -> typing.Dict[str, str]:
+        """The SHA-256 digest of the package, in the form accepted by the client's deposit methods.
+
+        The package has to be produced once to calculate this (the source files are read, but nothing is stored),
+        and the result is remembered, so the files must not change between calling this and depositing."""
+        if self._digest is None:
+            d = hashlib.sha256()
+            for chunk in self._zip({}):
+                d.update(chunk)
+            self._digest = {constants.DIGEST_SHA_256: base64.b64encode(d.digest()).decode("ascii")}
+        return self._digest
+
+    def _add(self, entry: ZipEntry):
+        if entry.name in [e.name for e in self._payload]:
+            raise ValueError("Package already contains a file called {x}".format(x=entry.name))
+        self._payload.append(entry)
+        self._digest = None
+        self.close()
+
+    def close(self):
+        """Remove the temporary files holding compressed content, which will be compressed again if the package
+        is produced again"""
+        self._prepared = None
+        _remove_all(self._temporary)
+
+    def _payload_name(self, name):
+        return "data/" + name.replace(os.sep, "/").lstrip("/")
+
+    def _zip(self, manifests: typing.Optional[dict]) -> ZipStream:
+        """Lay out the package.  ``manifests`` collects the payload digests as the content is streamed;
+        it may be None if the package is only being measured"""
+        date_time = self._created[:6]
+        tag_files = [("bagit.txt", BAGIT_TXT), ("bag-info.txt", self._bag_info_txt())]
+        if self._metadata is not None:
+            tag_files.append(("metadata/sword.json", json.dumps(self._metadata.data).encode("utf-8")))
+
+        zs = ZipStream()
+        for name, data in tag_files:
+            zs.add(ZipEntry.from_bytes(name, data, self._compress_type, date_time))
+
+        if self._workers is not None and manifests is not None and len(self._payload) > 0:
+            if self._prepared is not None:
+                preparer = PreparedResults(self._prepared)
+                on_prepared = self._collect_digests(manifests)
+            else:
+                preparer = ParallelPreparer(self._payload, self._algorithms, self._workers)
+                on_prepared = self._keep_prepared(manifests)
+            for entry in self._payload:
+                zs.add(PreparedEntry(entry, preparer, on_prepared))
+        else:
+            for entry in self._payload:
+                opener = self._hashing(entry, manifests)
+                zs.add(ZipEntry(entry.name, opener, entry.size, entry.compress_type, entry.date_time))
+
+        # the payload manifests can only be produced after the payload has been streamed, but their length is
+        # fixed by the digest algorithm, so we can still say how big they are in advance
+        manifest_data = {}
+        for alg in self._algorithms:
+            name = "manifest-{x}.txt".format(x=alg)
+            hex_length = hashlib.new(alg).digest_size * 2
+            size = sum(hex_length + len(self._manifest_line_path(e.name)) + 3 for e in self._payload)
+            opener = self._manifest(alg, manifests, manifest_data, name)
+            zs.add(ZipEntry(name, opener, size, self._compress_type, date_time))
+
+        tag_names = [n for n, _ in tag_files] + ["manifest-{x}.txt".format(x=a) for a in self._algorithms]
+        for alg in self._algorithms:
+            name = "tagmanifest-{x}.txt".format(x=alg)
+            hex_length = hashlib.new(alg).digest_size * 2
+            size = sum(hex_length + len(self._manifest_line_path(n)) + 3 for n in tag_names)
+            tag_digests = [(n, hashlib.new(alg, data).hexdigest()) for n, data in tag_files]
+            opener = self._tag_manifest(alg, tag_digests, manifest_data)
+            zs.add(ZipEntry(name, opener, size, self._compress_type, date_time))
+
+        return zs
+
+    def _hashing(self, entry: ZipEntry, manifests: typing.Optional[dict]):
+        def opener():
+            hashes = [hashlib.new(alg) for alg in self._algorithms]
+            for chunk in entry.opener():
+                for h in hashes:
+                    h.update(chunk)
+                yield chunk
+            if manifests is not None:
+                for alg, h in zip(self._algorithms, hashes):
+                    manifests.setdefault(alg, []).append((entry.name, h.hexdigest()))
+        return opener
+
+    def _collect_digests(self, manifests: dict):
+        def on_prepared(entry, result):
+            for alg in self._algorithms:
+                manifests.setdefault(alg, []).append((entry.name, result["digests"][alg]))
+        return on_prepared
+
+    def _keep_prepared(self, manifests: dict):
+        collect = self._collect_digests(manifests)
+        results = []
+
+        def on_prepared(entry, result):
+            collect(entry, result)
+            if result["path"] is not None:
+                self._temporary.append(result["path"])
+            results.append(result)
+            if len(results) == len(self._payload):
+                self._prepared = results
+        return on_prepared
+
+    def _manifest(self, alg: str, manifests: dict, manifest_data: dict, name: str):
+        def opener():
+            data = self._manifest_text(manifests.get(alg, []))
+            manifest_data[name] = data
+            return [data]
+        return opener
+
+    def _tag_manifest(self, alg: str, tag_digests: list, manifest_data: dict):
+        def opener():
+            digests = list(tag_digests)
+            for a in self._algorithms:
+                name = "manifest-{x}.txt".format(x=a)
+                digests.append((name, hashlib.new(alg, manifest_data[name]).hexdigest()))
+            return [self._manifest_text(digests)]
+        return opener
+
+    def _manifest_text(self, digests):
+        lines = [digest.encode("ascii") + b"  " + self._manifest_line_path(name) + b"\n" for name, digest in digests]
+        return b"".join(lines)
+
+    def _manifest_line_path(self, name) -> bytes:
+        # BagIt requires CR, LF and % in manifest paths to be percent-encoded
+        return name.replace("%", "%25").replace("\r", "%0D").replace("\n", "%0A").encode("utf-8")
+
+    def _bag_info_txt(self) -> bytes:
+        octets = sum(e.size for e in self._payload)
+        info = [
+            ("Bag-Software-Agent", BAG_SOFTWARE_AGENT),
+            ("Bagging-Date", time.strftime("%Y-%m-%d", self._created)),
+            ("Payload-Oxum", "{x}.{y}".format(x=octets, y=len(self._payload))),
+        ]
+        info += list(self._bag_info.items())
+        return "".join("{x}: {y}\n".format(x=k, y=v) for k, v in info).encode("utf-8")
+
+
+def _remove_all(paths: typing.List[str]):
+    while paths:
+        remove_temporary_file(paths.pop())
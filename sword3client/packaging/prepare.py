@@ -0,0 +1,297 @@
+from sword3client.packaging.zipstream import ZipEntry, STORED, DEFLATED, CHUNK_SIZE
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+
+import os
+import zlib
+import hashlib
+import tempfile
+import typing
+
+# File extensions whose content is already compressed, and which gain nothing from being deflated again
+COMPRESSED_EXTENSIONS = frozenset([
+    "7z", "aac", "avi", "bz2", "docx", "epub", "flac", "gif", "gz", "heic", "jar", "jp2", "jpeg", "jpg",
+    "lz", "lz4", "lzma", "m4a", "m4v", "mkv", "mov", "mp3", "mp4", "odp", "ods", "odt", "ogg", "opus",
+    "png", "pptx", "rar", "tgz", "txz", "webm", "webp", "xlsx", "xz", "zip", "zst",
+])
+
+# If deflating an entry doesn't get it below this fraction of its original size, store it instead
+MIN_COMPRESSION_RATIO = 0.97
+
+# Stored entries up to this size are passed back from the worker, rather than being read again when streamed, and
+# deflated entries up to this size are passed back rather than written to a temporary file
+INLINE_LIMIT = 1024 * 1024
+
+
+def compress_type_for(name: str, compress_type: int) -> int:
+    """Choose how to store an entry: content which is already compressed is always stored"""
+    if compress_type == STORED:
+        return STORED
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if ext in COMPRESSED_EXTENSIONS:
+        return STORED
+    return compress_type
+
+
+def prepare_entry(
+    source: typing.Union[str, bytes],
+    compress_type: int,
+    algorithms: typing.List[str],
+    inline_limit: int = INLINE_LIMIT,
+    chunk_size: int = CHUNK_SIZE,
+    temp_dir: str = None,
+) -> dict:
+    """Compress and digest the content of a single entry.  This runs in a worker process, so takes and
+    returns only plain, picklable values.
+
+    ``source`` is either a path to read from, or the content itself.  The result gives the crc, the sizes, the
+    compression actually used, the hex digests for each of the algorithms, and where to find the content to
+    write: ``data`` is the content itself, if it is no larger than ``inline_limit``; ``path`` is a temporary
+    file holding deflated content which is larger, and which belongs to the caller from then on; if both are
+    None the content is stored and should be read again from its source when it is written."""
+    hashes = [hashlib.new(alg) for alg in algorithms]
+    compressor = None
+    spool = None
+    if compress_type == DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        spool = _Spool(inline_limit, temp_dir)
+
+    # stored content read from a file is passed back if it is small, otherwise it is read again when it is written
+    keep_raw = isinstance(source, str)
+    crc = 0
+    size = 0
+    raw = []
+    try:
+        for chunk in _read(source, chunk_size):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            for h in hashes:
+                h.update(chunk)
+            if compressor is not None:
+                spool.write(compressor.compress(chunk))
+            if keep_raw:
+                if size <= inline_limit:
+                    raw.append(chunk)
+                else:
+                    keep_raw = False
+                    raw = []
+
+        if compressor is not None:
+            spool.write(compressor.flush())
+            if spool.size < size * MIN_COMPRESSION_RATIO:
+                data, path = spool.close()
+                return _result(crc, size, DEFLATED, spool.size, data, path, hashes, algorithms)
+            spool.discard()
+    except BaseException:
+        if spool is not None:
+            spool.discard()
+        raise
+
+    data = b"".join(raw) if keep_raw else None
+    return _result(crc, size, STORED, size, data, None, hashes, algorithms)
+
+
+class _Spool(object):
+    """Compressed content, which is kept in memory up to ``limit`` bytes and written to a temporary file beyond
+    that"""
+
+    def __init__(self, limit: int, temp_dir: str = None):
+        self.size = 0
+        self.path = None
+        self._limit = limit
+        self._temp_dir = temp_dir
+        self._chunks = []
+        self._file = None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.size += len(data)
+        if self._file is None:
+            if self.size <= self._limit:
+                self._chunks.append(data)
+                return
+            fd, self.path = tempfile.mkstemp(prefix="sword3client-", suffix=".deflate", dir=self._temp_dir)
+            self._file = os.fdopen(fd, "wb")
+            for chunk in self._chunks:
+                self._file.write(chunk)
+            self._chunks = []
+        self._file.write(data)
+
+    def close(self) -> typing.Tuple[typing.Optional[bytes], typing.Optional[str]]:
+        """The content, as (data, None) if it was kept in memory, or (None, path) if it was written to a file"""
+        if self._file is None:
+            return b"".join(self._chunks), None
+        self._file.close()
+        return None, self.path
+
+    def discard(self):
+        self._chunks = []
+        if self._file is not None:
+            self._file.close()
+            remove_temporary_file(self.path)
+            self._file = None
+
+
+def remove_temporary_file(path: typing.Optional[str]):
+    if path is None:
+        return
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read(source, chunk_size):
+    if isinstance(source, bytes):
+        if source:
+            yield source
+        return
+    with open(source, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _result(crc, size, compress_type, compressed_size, data, path, hashes, algorithms):
+    return {
+        "crc": crc,
+        "size": size,
+        "compress_type": compress_type,
+        "compressed_size": compressed_size,
+        "data": data,
+        "path": path,
+        "digests": {alg: h.hexdigest() for alg, h in zip(algorithms, hashes)},
+    }
+
+
+def _discard_unused(future):
+    """Remove the temporary file of a result which will never be handed out"""
+    if not future.cancelled() and future.exception() is None:
+        remove_temporary_file(future.result()["path"])
+
+
+class ParallelPreparer(object):
+    """Prepares zip entries in a pool of worker processes, and hands the results back in entry order.
+
+    Only a bounded window of entries is in flight at once, so the workers keep ahead of the stream that is
+    consuming the results without getting far ahead of it.  Deflated content larger than ``inline_limit`` is
+    written by the worker to a temporary file (in ``temp_dir``), rather than passed back, so memory use grows
+    with neither the size of the package nor the size of its files.  The temporary file of each result handed
+    out, its ``path``, belongs to the caller, who must remove it (see :func:`remove_temporary_file`)."""
+
+    def __init__(
+        self,
+        entries: typing.List[ZipEntry],
+        algorithms: typing.List[str],
+        workers: int = None,
+        window: int = None,
+        inline_limit: int = INLINE_LIMIT,
+        temp_dir: str = None,
+    ):
+        for entry in entries:
+            if entry.source is None:
+                raise ValueError(
+                    "Zip entry {x} cannot be prepared in parallel as it has no source path or data".format(x=entry.name)
+                )
+        self._entries = entries
+        self._algorithms = list(algorithms)
+        self._workers = workers if workers is not None else os.cpu_count()
+        self._window = window if window is not None else self._workers * 2
+        self._inline_limit = inline_limit
+        self._temp_dir = temp_dir
+        self._results = None
+        self._remaining = len(entries)
+
+    def next_result(self) -> dict:
+        """Get the preparation result for the next entry in order, blocking until it is ready"""
+        if self._results is None:
+            self._results = self._run()
+        result = next(self._results)
+        self._remaining -= 1
+        if self._remaining == 0:
+            # release the worker processes as soon as the last entry is in hand
+            self.close()
+        return result
+
+    def close(self):
+        if self._results is not None:
+            self._results.close()
+
+    def _run(self):
+        with ProcessPoolExecutor(self._workers) as pool:
+            pending = deque()
+            queue = iter(self._entries)
+            try:
+                while True:
+                    while len(pending) < self._window:
+                        entry = next(queue, None)
+                        if entry is None:
+                            break
+                        pending.append(pool.submit(
+                            prepare_entry,
+                            entry.source,
+                            entry.compress_type,
+                            self._algorithms,
+                            self._inline_limit,
+                            CHUNK_SIZE,
+                            self._temp_dir,
+                        ))
+                    if not pending:
+                        return
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+                    future.add_done_callback(_discard_unused)
+
+
+class PreparedEntry(ZipEntry):
+    """Zip entry whose content and properties are filled in from a :class:`ParallelPreparer` (or
+    :class:`PreparedResults`) when it is about to be written.  ``on_prepared`` receives the preparation result (e.g. to collect the digests)"""
+
+    def __init__(
+        self,
+        entry: ZipEntry,
+        preparer: typing.Union[ParallelPreparer, "PreparedResults"],
+        on_prepared: typing.Callable[[ZipEntry, dict], None] = None
+    ):
+        super(PreparedEntry, self).__init__(
+            entry.name, entry.opener, entry.size, entry.compress_type, entry.date_time, source=entry.source
+        )
+        self._preparer = preparer
+        self._on_prepared = on_prepared
+
+    def prepare(self):
+        result = self._preparer.next_result()
+        if result["size"] != self.size:
+            raise ValueError(
+                "Zip entry {x} was declared as {y} bytes but {z} were read".format(
+                    x=self.name, y=self.size, z=result["size"]
+                )
+            )
+        self.crc = result["crc"]
+        self.compress_type = result["compress_type"]
+        self.compressed_size = result["compressed_size"]
+        if result["path"] is not None:
+            path = result["path"]
+            self.opener = lambda: _read(path, CHUNK_SIZE)
+        elif result["data"] is not None:
+            data = result["data"]
+            self.opener = lambda: [data]
+        if self._on_prepared is not None:
+            self._on_prepared(self, result)
+
+
+class PreparedResults(object):
+    """The results of an earlier preparation of the same entries, to be handed out again in order in place of a
+    :class:`ParallelPreparer`, so that the entries aren't compressed again"""
+
+    def __init__(self, results: typing.List[dict]):
+        self._results = iter(results)
+
+    def next_result(self) -> dict:
+        return next(self._results)
@@ -0,0 +1,329 @@
+from sword3client.lib.streams import IterStream
+
+import os
+import time
+import zlib
+import struct
+import typing
+
+# Signatures and fixed-size records from the PKWARE APPNOTE
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_DATA_DESCRIPTOR64 = struct.Struct("<IIQQ")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_END_RECORD64 = struct.Struct("<IQHHIIQQQQ")
+_END_LOCATOR64 = struct.Struct("<IIQI")
+
+_SIG_LOCAL = 0x04034B50
+_SIG_CENTRAL = 0x02014B50
+_SIG_DESCRIPTOR = 0x08074B50
+_SIG_END = 0x06054B50
+_SIG_END64 = 0x06064B50
+_SIG_LOCATOR64 = 0x07064B50
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+_VERSION = 20
+_VERSION64 = 45
+_MADE_BY_UNIX = 3 << 8
+_FILE_ATTRIBUTES = 0o100644 << 16
+
+# same threshold as the standard library uses to switch an entry to zip64
+ZIP64_LIMIT = (1 << 31) - 1
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+STORED = 0
+DEFLATED = zlib.DEFLATED
+
+CHUNK_SIZE = 65536
+
+
+class ZipEntry(object):
+    """A single file to be written into a :class:`ZipStream`.
+
+    ``opener`` is a callable that returns an iterable of byte chunks for the entry content; it is called
+    once every time the archive is streamed, so the content must be reproducible.  If ``size`` is known
+    in advance, and the entry is stored, the archive can report its exact length before any bytes are read."""
+
+    def __init__(
+        self,
+        name: str,
+        opener: typing.Callable[[], typing.Iterable[bytes]],
+        size: int = None,
+        compress_type: int = STORED,
+        date_time: typing.Tuple[int, int, int, int, int, int] = None,
+        crc: int = None,
+        compressed_size: int = None,
+        source: typing.Union[str, bytes] = None,
+    ):
+        self.name = name
+        self.opener = opener
+        self.size = size
+        self.compress_type = compress_type
+        self.date_time = date_time if date_time is not None else time.localtime()[:6]
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.source = source
+
+    def prepare(self):
+        """Called by the :class:`ZipStream` immediately before the entry is written.  Subclasses may use this to
+        resolve the content and properties of the entry at the last moment"""
+        pass
+
+    @property
+    def precompressed(self):
+        """Whether the opener already produces the compressed form of the content (in which case the ``crc``
+        and ``compressed_size`` of the entry must be known)"""
+        return self.compressed_size is not None and self.compress_type != STORED
+
+    @property
+    def known_length(self) -> typing.Optional[int]:
+        """The number of bytes the entry content will occupy in the archive, if that can be known in advance"""
+        if self.compress_type == STORED:
+            return self.size
+        return self.compressed_size
+
+    @classmethod
+    def from_path(cls, name: str, path: str, compress_type: int = STORED, chunk_size: int = CHUNK_SIZE):
+        """Entry whose content is read from a file on disk at stream time"""
+        st = os.stat(path)
+
+        def opener():
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return cls(name, opener, st.st_size, compress_type, time.localtime(st.st_mtime)[:6], source=path)
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes, compress_type: int = STORED, date_time=None):
+        """Entry whose content is held in memory"""
+        return cls(name, lambda: [data], len(data), compress_type, date_time, source=data)
+
+    @property
+    def zip64(self):
+        # if we can't bound the size of the entry up front we have to allow for it being large
+        if self.size is None:
+            return True
+        return self.size * 1.05 > ZIP64_LIMIT
+
+    @property
+    def encoded_name(self):
+        return self.name.encode("utf-8")
+
+    @property
+    def flags(self):
+        flags = _FLAG_DATA_DESCRIPTOR
+        if not self.name.isascii():
+            flags |= _FLAG_UTF8
+        return flags
+
+    @property
+    def dos_time(self):
+        year, month, day, hour, minute, second = self.date_time
+        if year < 1980:
+            year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+        return (hour << 11 | minute << 5 | second // 2), ((year - 1980) << 9 | month << 5 | day)
+
+
+class _Record(object):
+    """What the central directory needs to know about an entry once it has been written"""
+
+    def __init__(self, entry: ZipEntry, offset: int, crc: int = 0, compressed_size: int = 0, file_size: int = 0):
+        self.entry = entry
+        self.offset = offset
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.file_size = file_size
+
+
+class ZipStream(object):
+    """A zip archive which is generated on demand from a list of :class:`ZipEntry` objects.
+
+    The archive is never materialised on disk or in memory: every call to :meth:`open` (or iteration
+    over the object) produces the bytes afresh, with CRCs and sizes recorded in data descriptors after
+    each entry's content.  When every entry is stored with a known size, :attr:`content_length` gives
+    the exact length of the archive, so it can be sent with a ``Content-Length`` header."""
+
+    def __init__(self, entries: typing.List[ZipEntry] = None):
+        self._entries = list(entries) if entries is not None else []
+
+    def add(self, entry: ZipEntry):
+        self._entries.append(entry)
+
+    @property
+    def entries(self):
+        return list(self._entries)
+
+    @property
+    def content_length(self) -> typing.Optional[int]:
+        """The exact number of bytes the archive will contain, or None if that can't be known without
+        producing it (e.g. because some entries are compressed)"""
+        offset = 0
+        records = []
+        for entry in self._entries:
+            length = entry.known_length
+            if length is None:
+                return None
+            records.append(_Record(entry, offset, 0, length, entry.size))
+            offset += len(self._local_header(entry)) + length + self._descriptor_length(entry)
+
+        central = sum(len(self._central_header(r)) for r in records)
+        return offset + central + len(self._end_records(len(records), offset, central))
+
+    def open(self) -> IterStream:
+        """Get a new file-like object from which the archive can be read from the beginning"""
+        return IterStream(iter(self))
+
+    def __iter__(self):
+        offset = 0
+        records = []
+        for entry in self._entries:
+            entry.prepare()
+            header = self._local_header(entry)
+            yield header
+
+            record = _Record(entry, offset)
+            for chunk in self._entry_data(entry, record):
+                yield chunk
+
+            if not entry.zip64 and (record.file_size > _MAX_32 or record.compressed_size > _MAX_32):
+                raise ValueError(
+                    "Zip entry {x} grew beyond the zip64 threshold while being written".format(x=entry.name)
+                )
+            if entry.size is not None and record.file_size != entry.size:
+                raise ValueError(
+                    "Zip entry {x} was declared as {y} bytes but {z} were read".format(
+                        x=entry.name, y=entry.size, z=record.file_size
+                    )
+                )
+
+            descriptor = self._descriptor(record)
+            yield descriptor
+
+            offset += len(header) + record.compressed_size + len(descriptor)
+            records.append(record)
+
+        central_size = 0
+        for record in records:
+            central = self._central_header(record)
+            central_size += len(central)
+            yield central
+
+        yield self._end_records(len(records), offset, central_size)
+
+    def _entry_data(self, entry: ZipEntry, record: _Record):
+        if entry.precompressed:
+            for chunk in entry.opener():
+                record.compressed_size += len(chunk)
+                yield chunk
+            record.file_size = entry.size
+            record.crc = entry.crc
+            return
+
+        compressor = None
+        if entry.compress_type == DEFLATED:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+        # a crc worked out in advance (when the entry was prepared) is checked, as the content is read again from
+        # its source, which may have changed since
+        known_crc = entry.crc
+        crc = 0
+        for chunk in entry.opener():
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            record.file_size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            record.compressed_size += len(chunk)
+            yield chunk
+
+        if compressor is not None:
+            tail = compressor.flush()
+            record.compressed_size += len(tail)
+            if tail:
+                yield tail
+
+        if known_crc is not None and crc != known_crc:
+            raise ValueError(
+                "Zip entry {x} changed after it was prepared: its CRC was {y:08x} but is now {z:08x}".format(
+                    x=entry.name, y=known_crc, z=crc
+                )
+            )
+        record.crc = crc
+
+    def _local_header(self, entry: ZipEntry) -> bytes:
+        name = entry.encoded_name
+        dostime, dosdate = entry.dos_time
+        extra = b""
+        size_field = 0
+        version = _VERSION
+        if entry.zip64:
+            # real sizes follow in the data descriptor, but the zip64 extra must be present
+            extra = struct.pack("<HHQQ", 1, 16, 0, 0)
+            size_field = _MAX_32
+            version = _VERSION64
+
+        return _LOCAL_HEADER.pack(
+            _SIG_LOCAL, version, entry.flags, entry.compress_type, dostime, dosdate,
+            0, size_field, size_field, len(name), len(extra)
+        ) + name + extra
+
+    def _descriptor_length(self, entry: ZipEntry) -> int:
+        return _DATA_DESCRIPTOR64.size if entry.zip64 else _DATA_DESCRIPTOR.size
+
+    def _descriptor(self, record: _Record) -> bytes:
+        if record.entry.zip64:
+            return _DATA_DESCRIPTOR64.pack(_SIG_DESCRIPTOR, record.crc, record.compressed_size, record.file_size)
+        return _DATA_DESCRIPTOR.pack(_SIG_DESCRIPTOR, record.crc, record.compressed_size, record.file_size)
+
+    def _central_header(self, record: _Record) -> bytes:
+        entry = record.entry
+        name = entry.encoded_name
+        dostime, dosdate = entry.dos_time
+
+        file_size = record.file_size
+        compressed_size = record.compressed_size
+        offset = record.offset
+        extra_fields = []
+        if entry.zip64:
+            extra_fields += [file_size, compressed_size]
+            file_size = compressed_size = _MAX_32
+        if offset >= _MAX_32:
+            extra_fields.append(offset)
+            offset = _MAX_32
+
+        extra = b""
+        version = _VERSION
+        if extra_fields:
+            extra = struct.pack("<HH" + "Q" * len(extra_fields), 1, 8 * len(extra_fields), *extra_fields)
+            version = _VERSION64
+
+        return _CENTRAL_HEADER.pack(
+            _SIG_CENTRAL, _MADE_BY_UNIX | version, version, entry.flags, entry.compress_type, dostime, dosdate,
+            record.crc, compressed_size, file_size, len(name), len(extra), 0, 0, 0, _FILE_ATTRIBUTES, offset
+        ) + name + extra
+
+    def _end_records(self, count: int, central_offset: int, central_size: int) -> bytes:
+        out = b""
+        if count > _MAX_16 or central_offset >= _MAX_32 or central_size >= _MAX_32:
+            end64_offset = central_offset + central_size
+            out += _END_RECORD64.pack(
+                _SIG_END64, _END_RECORD64.size - 12, _MADE_BY_UNIX | _VERSION64, _VERSION64,
+                0, 0, count, count, central_size, central_offset
+            )
+            out += _END_LOCATOR64.pack(_SIG_LOCATOR64, 0, end64_offset, 1)
+            count = min(count, _MAX_16)
+            central_offset = min(central_offset, _MAX_32)
+            central_size = min(central_size, _MAX_32)
+
+        return out + _END_RECORD.pack(_SIG_END, 0, 0, count, count, central_size, central_offset, 0)
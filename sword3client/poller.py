@@ -0,0 +1,257 @@
+from sword3common import StatusDocument, exceptions
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import sys
+import time
+import heapq
+import typing
+import threading
+
+
+def status_snapshot(status: StatusDocument) -> tuple:
+    """The parts of a Status Document the poller watches for changes: the object's states, and the status of each
+    of its files"""
+    states = tuple(sorted(s.get("@id") for s in status.data.get("state", []) if s.get("@id") is not None))
+    files = tuple(sorted((l.get("@id"), l.get("status")) for l in status.links if l.get("status") is not None))
+    return states, files
+
+
+def is_transient(e: Exception) -> bool:
+    """Whether an error fetching an object may go away if it is fetched again: a connection failure or timeout
+    (including those of requests and httpx), or a 5xx response from the server"""
+    if isinstance(e, OSError):
+        return True
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(e, httpx.TransportError):
+        return True
+    status_code = getattr(e, "status_code", None)
+    return isinstance(e, exceptions.SwordException) and status_code is not None and status_code >= 500
+
+
+class _Watch(object):
+    """The polling state of one object"""
+
+    def __init__(self, url, interval, on_change, until):
+        self.url = url
+        self.interval = interval
+        self.on_change = on_change
+        self.until = until
+        self.future = Future()
+        self.status = None  # type: typing.Optional[StatusDocument]
+        self.snapshot = None
+        self.etag = None
+        self.due = 0.0
+        self.active = True
+        self.failures = 0
+
+
+class ObjectPoller(object):
+    """Polls objects which the server is still processing (after a 202 Accepted, or while they are In Progress), and
+    reports when their state, or the state of their files, changes.
+
+    Objects are kept in a schedule ordered by when each is next due, and only objects which are due are fetched,
+    concurrently, on a pool of ``max_workers`` threads.  An object which has not changed is checked less and less
+    often, its interval multiplied by ``backoff`` up to ``max_interval``, and is back to ``interval`` as soon as it
+    changes.  Where the server gave the object an eTag the fetch is conditional, so an unchanged object costs a
+    304 rather than a Status Document.
+
+    Transient errors (see :func:`is_transient`) are retried, backing off as for an unchanged object, until an
+    object has failed ``max_failures`` times in a row (None to retry forever).  Any other error, such as a 4xx
+    response, fails the object's Future straight away.
+
+    The poller runs on a background thread, started by :meth:`start` (or by using it as a context manager)."""
+
+    def __init__(
+        self,
+        client,
+        interval: float = 1.0,
+        max_interval: float = 60.0,
+        backoff: float = 2.0,
+        max_workers: int = 8,
+        conditional: bool = True,
+        max_failures: typing.Optional[int] = 5,
+    ):
+        self._client = client
+        self._interval = interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._max_workers = max_workers
+        self._conditional = conditional
+        self._max_failures = max_failures
+
+        self._cond = threading.Condition()
+        self._schedule = []  # type: typing.List[typing.Tuple[float, int, _Watch]]
+        self._watches = {}  # type: typing.Dict[str, _Watch]
+        self._seq = 0
+        self._running = False
+        self._thread = None
+        self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._watches)
+
+    def watch(
+        self,
+        status_or_object_url: typing.Union[StatusDocument, str],
+        on_change: typing.Callable[[StatusDocument], None] = None,
+        until: typing.Callable[[StatusDocument], bool] = None,
+    ) -> Future:
+        """Start polling an object.
+
+        ``on_change`` is called with the new Status Document every time the object changes.  The Future that is
+        returned resolves to the Status Document once ``until`` returns True for it or, if there is no ``until``,
+        the first time it changes.  If a Status Document is given it is the starting point for detecting changes,
+        otherwise the object is fetched straight away to find it."""
+        if isinstance(status_or_object_url, StatusDocument):
+            url = status_or_object_url.object_url
+        else:
+            url = status_or_object_url
+
+        watch = _Watch(url, self._interval, on_change, until)
+        now = time.monotonic()
+        if isinstance(status_or_object_url, StatusDocument):
+            self._observe(watch, status_or_object_url)
+            if until is not None and until(status_or_object_url):
+                watch.future.set_result(status_or_object_url)
+                return watch.future
+            watch.due = now + watch.interval
+        else:
+            watch.due = now
+
+        with self._cond:
+            existing = self._watches.get(url)
+            if existing is not None:
+                existing.active = False
+            self._watches[url] = watch
+            self._push(watch)
+            self._cond.notify()
+        return watch.future
+
+    def unwatch(self, status_or_object_url: typing.Union[StatusDocument, str]):
+        """Stop polling an object.  Its Future is cancelled, if it has not already resolved"""
+        url = status_or_object_url
+        if isinstance(status_or_object_url, StatusDocument):
+            url = status_or_object_url.object_url
+        with self._cond:
+            watch = self._watches.pop(url, None)
+        if watch is not None:
+            watch.active = False
+            watch.future.cancel()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            self._thread = threading.Thread(target=self._run, name="sword3-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _push(self, watch: _Watch):
+        self._seq += 1
+        heapq.heappush(self._schedule, (watch.due, self._seq, watch))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    if len(self._schedule) > 0 and self._schedule[0][0] <= now:
+                        break
+                    timeout = self._schedule[0][0] - now if len(self._schedule) > 0 else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+
+                due = []
+                while len(self._schedule) > 0 and self._schedule[0][0] <= now:
+                    _, _, watch = heapq.heappop(self._schedule)
+                    if watch.future.cancelled() and self._watches.get(watch.url) is watch:
+                        del self._watches[watch.url]
+                    elif watch.active:
+                        due.append(watch)
+
+            for watch in due:
+                self._executor.submit(self._poll, watch)
+
+    def _poll(self, watch: _Watch):
+        try:
+            etag = watch.etag if self._conditional else None
+            status = self._client.get_object(watch.url, if_none_match=etag)
+        except Exception as e:
+            watch.failures += 1
+            if not is_transient(e) or (self._max_failures is not None and watch.failures >= self._max_failures):
+                self._finish(watch, exception=e)
+                return
+            # try again later, as if nothing had changed
+            status = None
+        else:
+            watch.failures = 0
+
+        changed = False
+        if status is not None:
+            first = watch.snapshot is None
+            changed = self._observe(watch, status)
+            if changed and watch.on_change is not None:
+                try:
+                    watch.on_change(status)
+                except Exception:
+                    pass
+            if watch.until is not None:
+                done = (changed or first) and watch.until(status)
+            else:
+                done = changed
+            if done:
+                self._finish(watch, result=status)
+                return
+
+        if changed:
+            watch.interval = self._interval
+        else:
+            watch.interval = min(watch.interval * self._backoff, self._max_interval)
+
+        with self._cond:
+            if not watch.active:
+                return
+            watch.due = time.monotonic() + watch.interval
+            self._push(watch)
+            self._cond.notify()
+
+    def _observe(self, watch: _Watch, status: StatusDocument) -> bool:
+        """Record the latest Status Document for the object, and whether it is a change from the last one"""
+        snapshot = status_snapshot(status)
+        changed = watch.snapshot is not None and snapshot != watch.snapshot
+        watch.status = status
+        watch.snapshot = snapshot
+        watch.etag = status.data.get("eTag")
+        return changed
+
+    def _finish(self, watch: _Watch, result=None, exception=None):
+        with self._cond:
+            watch.active = False
+            if self._watches.get(watch.url) is watch:
+                del self._watches[watch.url]
+        if watch.future.cancelled():
+            return
+        if exception is not None:
+            watch.future.set_exception(exception)
+        else:
+            watch.future.set_result(result)
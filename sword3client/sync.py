@@ -0,0 +1,238 @@
+from sword3client.lib.digests import DigestCache
+from sword3client.models.link_index import LinkIndex, link_index, filename
+
+from sword3common import StatusDocument, constants, exceptions
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import json
+import typing
+import threading
+import mimetypes
+
+STATE_FILE = ".sword3sync.json"
+DIGEST_FILE = ".sword3digests.json"
+
+
+class SyncResult(object):
+    """Report of what a :class:`DirectorySync` run did.  Each list holds the relative paths of the local files
+    concerned; ``errors`` maps a relative path to the exception raised while syncing it"""
+
+    def __init__(self):
+        self.added = []  # type: typing.List[str]
+        self.replaced = []  # type: typing.List[str]
+        self.deleted = []  # type: typing.List[str]
+        self.unchanged = []  # type: typing.List[str]
+        self.errors = {}  # type: typing.Dict[str, Exception]
+
+    @property
+    def ok(self):
+        return len(self.errors) == 0
+
+
+class DirectorySync(object):
+    """Pushes the changes in a local working copy of a deposit to the SWORD object.
+
+    The files in ``local_dir`` are compared against the ``fileSetFile`` links of the object's Status Document,
+    via a state file in the directory which records the File-URL and SHA-256 of every file as it was last
+    synced.  Only the files which have changed are sent: new files are added with ``add_binary``, changed
+    files are sent with ``replace_file``, and files which have been removed locally are removed with
+    ``delete_file``.  Files on the server which this sync didn't put there are left alone.
+
+    A file which the state file doesn't know about (in a fresh working copy, say) is matched to a file on the
+    server with the same name, if there is exactly one, and replaces it rather than being added alongside it.
+
+    File digests come from a :class:`~sword3client.lib.digests.DigestCache`, so an unchanged file is never read."""
+
+    def __init__(
+        self,
+        client,
+        local_dir: str,
+        status_or_object_url: typing.Union[StatusDocument, str],
+        max_workers: int = 4,
+        state_path: str = None,
+        digest_cache: DigestCache = None,
+    ):
+        self._client = client
+        self._local_dir = os.path.abspath(local_dir)
+        self._target = status_or_object_url
+        self._max_workers = max_workers
+        self._state_path = os.path.abspath(state_path if state_path is not None else os.path.join(self._local_dir, STATE_FILE))
+        if digest_cache is None:
+            digest_cache = DigestCache(os.path.join(self._local_dir, DIGEST_FILE))
+        self._digests = digest_cache
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+        self._claimed = set()  # type: typing.Set[str]
+
+    def run(self) -> SyncResult:
+        status = self._target
+        if not isinstance(status, StatusDocument):
+            status = self._client.get_object(status)
+        links = link_index(status)
+        object_url = status.object_url
+
+        remote = set(link.get("@id") for link in links.with_rel(constants.Rel.FileSetFile))
+        if self._state.get("object_url") not in (None, object_url):
+            # this working copy was last synced with another object, so nothing we know about applies
+            self._state["files"] = {}
+        self._state["object_url"] = object_url
+        known = self._state["files"]
+
+        local = self._local_files()
+        tasks = []
+        result = SyncResult()
+
+        # the remote files which belong to a local file already, and so can't be matched to another one
+        self._claimed = set(record.get("url") for record in known.values() if record.get("url") in remote)
+
+        for rel in local:
+            record = known.get(rel)
+            if record is not None and record.get("url") in remote:
+                tasks.append((self._replace_if_changed, rel, (record,)))
+                continue
+            url = self._match(links, rel, remote)
+            if url is not None:
+                # we don't know what the server's copy holds, so it is replaced
+                tasks.append((self._replace_if_changed, rel, ({"url": url},)))
+            else:
+                tasks.append((self._add, rel, (object_url, remote)))
+
+        for rel, record in list(known.items()):
+            if rel not in local:
+                if record.get("url") in remote:
+                    tasks.append((self._delete, rel, (record,)))
+                else:
+                    with self._lock:
+                        known.pop(rel, None)
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            futures = [(rel, pool.submit(fn, rel, *args)) for fn, rel, args in tasks]
+            for rel, future in futures:
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    result.errors[rel] = e
+                    continue
+                getattr(result, outcome).append(rel)
+
+        self._save_state()
+        self._digests.save()
+        return result
+
+    def _match(self, links: LinkIndex, rel: str, remote: typing.Set[str]) -> typing.Optional[str]:
+        """The URL of the one unclaimed file on the server named ``rel`` (or, failing that, with the same name as
+        its last segment), if there is exactly one"""
+        for name in dict.fromkeys([rel, rel.rsplit("/", 1)[-1]]):
+            urls = [link.get("@id") for link in links.with_filename(name)
+                    if link.get("@id") in remote and link.get("@id") not in self._claimed]
+            if len(urls) == 1:
+                self._claimed.add(urls[0])
+                return urls[0]
+            if len(urls) > 1:
+                return None
+        return None
+
+    def _add(self, rel, object_url, remote):
+        path = self._path(rel)
+        digest = self._digests.digest(path)
+        with open(path, "rb") as f:
+            resp = self._client.add_binary(
+                object_url,
+                f,
+                rel,
+                digest,
+                content_length=os.path.getsize(path),
+                content_type=self._content_type(rel),
+            )
+        location = resp.location
+        if location is None or location == object_url:
+            # the server only told us where the object is, so find the file among its links
+            location = self._new_file(rel, resp.status_document, remote)
+        else:
+            with self._lock:
+                self._claimed.add(location)
+        self._record(rel, location, digest)
+        return "added"
+
+    def _new_file(self, rel, status: typing.Optional[StatusDocument], remote: typing.Set[str]) -> str:
+        """The URL of the file just added as ``rel``: the one file in ``status`` which wasn't on the server before
+        the sync, and hasn't been claimed by another local file.  If other files were added at the same time, it
+        is the one with the same name"""
+        with self._lock:
+            new = []
+            if status is not None:
+                new = [link for link in link_index(status).with_rel(constants.Rel.FileSetFile)
+                       if link.get("@id") not in remote and link.get("@id") not in self._claimed]
+            if len(new) > 1:
+                new = [link for link in new if filename(link["@id"]) in (rel, rel.rsplit("/", 1)[-1])]
+            if len(new) != 1:
+                raise exceptions.InvalidDataFromServer(
+                    "The server did not say where {x} was added, and it could not be found in the Status "
+                    "Document".format(x=rel)
+                )
+            self._claimed.add(new[0]["@id"])
+            return new[0]["@id"]
+
+    def _replace_if_changed(self, rel, record):
+        path = self._path(rel)
+        digest = self._digests.digest(path)
+        if digest[constants.DIGEST_SHA_256] == record.get("sha256"):
+            return "unchanged"
+
+        with open(path, "rb") as f:
+            self._client.replace_file(
+                record["url"],
+                f,
+                self._content_type(rel),
+                digest,
+                filename=rel,
+                content_length=os.path.getsize(path),
+            )
+        self._record(rel, record["url"], digest)
+        return "replaced"
+
+    def _delete(self, rel, record):
+        self._client.delete_file(record["url"])
+        with self._lock:
+            self._state["files"].pop(rel, None)
+        return "deleted"
+
+    def _record(self, rel, url, digest):
+        with self._lock:
+            self._state["files"][rel] = {"url": url, "sha256": digest[constants.DIGEST_SHA_256]}
+
+    def _local_files(self) -> typing.List[str]:
+        skip = {self._state_path}
+        if self._digests.path is not None:
+            skip.add(os.path.abspath(self._digests.path))
+
+        files = []
+        for root, dirs, names in os.walk(self._local_dir):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                if os.path.abspath(path) in skip:
+                    continue
+                files.append(os.path.relpath(path, self._local_dir).replace(os.sep, "/"))
+        return files
+
+    def _path(self, rel):
+        return os.path.join(self._local_dir, *rel.split("/"))
+
+    def _content_type(self, rel):
+        content_type, _ = mimetypes.guess_type(rel)
+        return content_type if content_type is not None else "application/octet-stream"
+
+    def _load_state(self):
+        if os.path.exists(self._state_path):
+            with open(self._state_path) as f:
+                return json.load(f)
+        return {"object_url": None, "files": {}}
+
+    def _save_state(self):
+        with self._lock:
+            data = json.dumps(self._state, indent=2)
+        with open(self._state_path, "w") as f:
+            f.write(data)
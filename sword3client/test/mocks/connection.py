@@ -7,6 +7,7 @@ from sword3common.test.fixtures import (
 )
 
 import json
+import threading
 
 
 class MockHttpLayer(HttpLayer):
@@ -34,6 +35,39 @@ class MockHttpLayer(HttpLayer):
         return MockHttpResponse(self.code, body, self.headers, self.stream)
 
 
+class MockRoutingHttpLayer(HttpLayer):
+    """Responds according to the HTTP method, using a MockHttpLayer (or a function of the url and body which
+    returns one) for each, and records every request made"""
+    def __init__(self, get=None, post=None, put=None, delete=None):
+        self.routes = {"get": get, "post": post, "put": put, "delete": delete}
+        self.requests = []
+        self._lock = threading.Lock()
+        super(MockRoutingHttpLayer, self).__init__()
+
+    def get(self, url, headers=None, stream=False):
+        return self._respond("get", url, None, headers)
+
+    def post(self, url, body, headers=None):
+        return self._respond("post", url, body, headers)
+
+    def put(self, url, body, headers=None):
+        return self._respond("put", url, body, headers)
+
+    def delete(self, url):
+        return self._respond("delete", url, None, None)
+
+    def calls(self, method):
+        return [r for r in self.requests if r[0] == method]
+
+    def _respond(self, method, url, body, headers):
+        with self._lock:
+            self.requests.append((method, url, body, headers))
+        layer = self.routes[method]
+        if callable(layer) and not isinstance(layer, HttpLayer):
+            layer = layer(url, body)
+        return layer._respond()
+
+
 class MockHttpResponse(HttpResponse):
     def __init__(self, status_code=None, body=None, headers=None, stream=None):
         self._status_code = status_code
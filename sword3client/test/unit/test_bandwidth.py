@@ -0,0 +1,124 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.connection.connection_bandwidth import BandwidthHttpLayer
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.lib.throttle import BandwidthManager
+
+from sword3common import Metadata, constants
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import time
+import json
+import base64
+import hashlib
+import threading
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def metadata():
+    md = Metadata()
+    md.add_dc_field("title", "bandwidth")
+    return md
+
+
+class TestBandwidth(TestCase):
+    def test_01_weighted_sharing(self):
+        manager = BandwidthManager(2000000, burst=16384)
+        sent = {}
+        stop = threading.Event()
+
+        def transfer(name, weight):
+            t = manager.transfer(weight)
+            sent[name] = 0
+            while not stop.is_set():
+                t.consume(8192)
+                sent[name] += 8192
+
+        threads = [threading.Thread(target=transfer, args=args) for args in [("bulk", 1), ("fast", 3)]]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        # the ceiling is shared, 3:1
+        assert sum(sent.values()) <= 2000000 * elapsed + 16384 + 2 * 8192
+        assert 2 < sent["fast"] / sent["bulk"] < 4.5
+
+        # alone, a transfer gets all of it
+        t = manager.transfer(0.1)
+        start = time.monotonic()
+        for i in range(50):
+            t.consume(8192)
+        assert time.monotonic() - start < 0.4
+
+        with self.assertRaises(ValueError):
+            manager.transfer(0)
+
+    def test_02_layer(self):
+        server = SWORDServer()
+        data = b"x" * 200000
+        http = BandwidthHttpLayer(MemoryHttpLayer(server), upload=BandwidthManager(1000000, burst=16384),
+                                  download=BandwidthManager(1000000, burst=16384))
+        client = SWORD3Client(http=http)
+        obj = client.create_object_with_metadata(server.service_url, metadata()).location
+
+        # two concurrent uploads share the 1MB/s ceiling
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda i: client.add_binary(obj, BytesIO(data), str(i), sha256(data),
+                                                          content_length=len(data)), range(2)))
+        assert time.monotonic() - start >= 0.35
+
+        # a light request isn't held up behind a bulk upload
+        status = client.get_object(obj)
+
+        def bulk():
+            with client.using(http.weighted(0.25)):
+                client.add_binary(obj, BytesIO(data * 2), "bulk", sha256(data * 2), content_length=2 * len(data))
+        thread = threading.Thread(target=bulk)
+        thread.start()
+        time.sleep(0.05)
+        start = time.monotonic()
+        client.replace_metadata(status, metadata())
+        assert time.monotonic() - start < 0.2
+        thread.join()
+
+        file_url = client.get_object(obj, rels=[constants.Rel.FileSetFile]).links[0]["@id"]
+        start = time.monotonic()
+        with client.get_file(file_url) as stream:
+            assert stream.read() == data
+        assert time.monotonic() - start >= 0.15
+
+    def test_03_in_memory_bodies(self):
+        server = SWORDServer()
+        received = []
+        handle = server.handle
+
+        def record(method, url, headers, body):
+            received.append(headers)
+            return handle(method, url, headers, body)
+        server.handle = record
+
+        http = BandwidthHttpLayer(MemoryHttpLayer(server), upload=BandwidthManager(1000000, burst=16384))
+        client = SWORD3Client(http=http)
+        status = client.get_object(client.create_object_with_metadata(server.service_url, metadata()).location)
+        assert received[0]["Content-Length"] == str(len(json.dumps(metadata().data)))
+
+        # a large body which is already in memory is sent in chunks, like a stream, so a small request is only
+        # queued behind one of them
+        bulk = threading.Thread(target=http.weighted(0.25).post, args=(server.service_url, b"x" * 1000000))
+        bulk.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        client.replace_metadata(status, metadata())
+        assert time.monotonic() - start < 0.2
+        bulk.join()
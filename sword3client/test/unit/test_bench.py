@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.bench import BenchServer, run_suite
+from sword3client.bench.suite import percentile
+from sword3client.bench import micro
+
+
+class TestBench(TestCase):
+    def test_01_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([3.0], 99) == 3.0
+        assert percentile([], 50) == 0.0
+
+    def test_02_suite(self):
+        with BenchServer() as server:
+            client = SWORD3Client()
+            results = run_suite(client, server.service_url, iterations=3, large_iterations=1, large_size=100000,
+                                concurrency=2)
+
+        assert results["meta"]["concurrency"] == 2
+        for name, result in results["results"].items():
+            assert result["iterations"] in (1, 3), name
+            assert result["ops_per_sec"] > 0
+            assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert results["results"]["large_download"]["bytes"] == 100000
+        assert "segmented_upload" in results["results"]
+
+    def test_03_micro(self):
+        results = micro.run(only=["make_digest_header", "raise_for_status_code[error_doc]"], min_time=0.01)
+        assert set(results["results"].keys()) == {"make_digest_header", "raise_for_status_code[error_doc]"}
+        for result in results["results"].values():
+            assert 0 < result["per_call_us"] <= result["median_us"]
+            assert result["calls"] >= 5
+
+        baseline = {"results": {
+            "make_digest_header": {"per_call_us": results["results"]["make_digest_header"]["per_call_us"] / 2},
+            "raise_for_status_code[error_doc]": {"per_call_us": 1e9},
+            "not_run": {"per_call_us": 1.0},
+        }}
+        regressions = micro.compare(results, baseline, threshold=50)
+        assert [r.name for r in regressions] == ["make_digest_header"]
+        assert regressions[0].change_pct > 50
+        assert micro.compare(results, baseline, threshold=150) == []
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.bench import BenchServer
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.connection.connection_netem import NetworkEmulationHttpLayer
+from sword3client.connection.connection_recording import RecordingHttpLayer
+from sword3client.connection.connection_requests import RequestsHttpLayer
+from sword3client.instrumentation import RESPONSE_RECEIVED
+from sword3client.lib.streams import ChunkedBody, IterStream, is_chunked, length_unknown
+
+from sword3common import Metadata, constants
+
+from io import BytesIO
+import sys
+import subprocess
+
+PRODUCER = "import sys\nfor i in range(100):\n    sys.stdout.buffer.write(bytes([i]) * 3000)\n"
+PRODUCED = b"".join(bytes([i]) * 3000 for i in range(100))
+
+
+def generate(n, size):
+    for i in range(n):
+        yield bytes([i % 256]) * size
+
+
+class TestChunked(TestCase):
+    def test_01_chunked_body(self):
+        assert not length_unknown(b"data")
+        assert not length_unknown(BytesIO(b"data"))
+        assert length_unknown(IterStream([b"data"]))
+        assert length_unknown(generate(1, 10))
+
+        body = ChunkedBody(generate(3, 2500), chunk_size=1000)
+        assert is_chunked(body)
+        assert not is_chunked(BytesIO(b"data"))
+        assert [len(c) for c in body] == [1000, 1000, 500] * 3
+        assert body.bytes_read == 7500
+
+        body = ChunkedBody(IterStream(generate(3, 2500)), chunk_size=4096)
+        assert [len(c) for c in body] == [4096, 3404]
+
+        with self.assertRaises(ValueError):
+            ChunkedBody(generate(1, 1), chunk_size=0)
+
+    def test_02_pipe_over_http(self):
+        with BenchServer() as server:
+            received = []
+            handle = server.sword.handle
+
+            def spy(method, url, headers, body):
+                received.append((method, headers))
+                return handle(method, url, headers, body)
+            server.sword.handle = spy
+
+            http = RequestsHttpLayer()
+            client = SWORD3Client(http=http, chunk_size=8192)
+            proc = subprocess.Popen([sys.executable, "-c", PRODUCER], stdout=subprocess.PIPE)
+            try:
+                resp = client.create_object_with_binary(server.service_url, proc.stdout, "produced.bin", None)
+            finally:
+                proc.stdout.close()
+                proc.wait()
+
+            method, headers = received[-1]
+            assert method == "POST"
+            assert headers.get("Transfer-Encoding") == "chunked"
+            assert "Content-Length" not in headers
+            assert "Digest" not in headers
+
+            file_url = resp.status_document.list_links([constants.Rel.FileSetFile])[0]["@id"]
+            with client.get_file(file_url) as stream:
+                assert stream.read() == PRODUCED
+            http.close()
+
+    def test_03_through_layers(self):
+        server = SWORDServer()
+        recorder = RecordingHttpLayer(NetworkEmulationHttpLayer(MemoryHttpLayer(server), upload_rate=10000000))
+        client = SWORD3Client(http=recorder, chunk_size=1000)
+        events = []
+        client.add_listener(events.append)
+
+        obj = client.create_object_with_metadata(server.service_url, Metadata())
+        client.add_binary(obj.location, generate(4, 2500), "generated.bin", None)
+
+        sent = [e for e in events if e.operation == "add_binary" and e.event == RESPONSE_RECEIVED][0]
+        assert sent.bytes_sent == 10000
+        assert recorder.cassette.interactions[-1]["request"]["size"] == 10000
@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client, cli
+from sword3client.bench import BenchServer
+from sword3client.lib import paths
+
+import os
+import json
+import shutil
+
+TMP = paths.rel2abs(__file__, "..", "tmp")
+
+
+def results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestCLI(TestCase):
+    def setUp(self) -> None:
+        self.tmpDirs = []
+
+    def tearDown(self) -> None:
+        for tmpDir in self.tmpDirs:
+            shutil.rmtree(os.path.join(TMP, tmpDir), ignore_errors=True)
+
+    def _dir(self, name, files=None):
+        self.tmpDirs.append(name)
+        root = os.path.join(TMP, name)
+        os.makedirs(root)
+        for rel, content in (files or {}).items():
+            path = os.path.join(root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+        return root
+
+    def test_01_deposit_manifest_and_resume(self):
+        big = os.urandom(300000)
+        root = self._dir("test_cli.test_01", {"a.txt": b"hello", "b.csv": b"x,y\n1,2\n", "big.bin": big})
+        manifest = os.path.join(root, "manifest.jsonl")
+        with open(manifest, "w") as f:
+            f.write(json.dumps({"id": "one", "files": ["a.txt", "b.csv"], "metadata": {"dc:title": "One"}}) + "\n")
+            f.write(json.dumps({"id": "two", "file": "big.bin"}) + "\n")
+            f.write("\n")
+            f.write(json.dumps({"metadata": {"dc:title": "Three"}}) + "\n")
+            f.write(json.dumps({"id": "four", "files": ["a.txt"], "package": True}) + "\n")
+        out = os.path.join(root, "results.jsonl")
+
+        with BenchServer() as server:
+            args = ["deposit", "--service", server.service_url, manifest, "-c", "3", "-r", out,
+                    "--segment-threshold", "100000", "--segment-size", "65536"]
+            assert cli.main(args) == 0
+            assert len(server.sword) == 4
+
+            done = {r["id"]: r for r in results(out)}
+            assert set(done.keys()) == {"one", "two", "line-4", "four"}
+            assert all(r["ok"] and r["op"] == "deposit" for r in done.values())
+            assert done["two"]["bytes"] == len(big)
+
+            client = SWORD3Client()
+            status = client.get_object(done["one"]["location"])
+            assert len(status.links) == 2
+            assert client.get_metadata(status).get_dc_field("title") == "One"
+            big_link = client.get_object(done["two"]["location"]).links[0]["@id"]
+            with client.get_file(big_link) as stream:
+                assert stream.read() == big
+
+            # an interrupted run: drop the last result, and resume
+            lines = open(out).readlines()
+            with open(out, "w") as f:
+                f.writelines(lines[:-1])
+            assert cli.main(args + ["--resume"]) == 0
+            assert len(server.sword) == 5
+            assert len(results(out)) == 4
+
+    def test_02_deposit_directory(self):
+        root = self._dir("test_cli.test_02", {
+            "item1/data.txt": b"one",
+            "item1/sub/more.txt": b"more",
+            "item2/data.txt": b"two",
+        })
+        out = os.path.join(root, "..", "test_cli.test_02.results.jsonl")
+        self.tmpDirs.append("test_cli.test_02.results.jsonl")
+
+        with BenchServer() as server:
+            assert cli.main(["deposit", "--service", server.service_url, root, "--package", "-r", out, "-q"]) == 0
+            done = {r["id"]: r for r in results(out)}
+            assert set(done.keys()) == {"item1", "item2"}
+            assert len(server.sword) == 2
+        os.remove(out)
+
+    def test_03_upload_large_resumes(self):
+        data = os.urandom(250000)
+        root = self._dir("test_cli.test_03", {"large.bin": data})
+        path = os.path.join(root, "large.bin")
+        state = path + ".sword3upload"
+        out = os.path.join(root, "results.jsonl")
+
+        with BenchServer() as server:
+            client = SWORD3Client()
+            # an upload which was interrupted after the first segment
+            digest = cli._sha256(data)
+            temporary_url = client.initialise_segmented_upload(
+                client.get_service(server.service_url), len(data), 3, 100000, digest
+            ).location
+            client.upload_file_segment(temporary_url, data[:100000], 1, content_length=100000)
+            with open(state, "w") as f:
+                json.dump({"temporary_url": temporary_url, "digest": digest, "segment_size": 100000,
+                           "size": len(data)}, f)
+
+            args = ["upload-large", "--service", server.service_url, path, "--segment-size", "100000", "-r", out]
+            assert cli.main(args) == 0
+            assert not os.path.exists(state)
+
+            result = results(out)[0]
+            assert result["ok"] and result["bytes"] == len(data)
+            assert server.sword.handle("GET", temporary_url, {}, b"")[0] == 404
+            link = client.get_object(result["location"]).links[0]["@id"]
+            with client.get_file(link) as stream:
+                assert stream.read() == data
+
+    def test_04_get_and_export(self):
+        root = self._dir("test_cli.test_04", {"a.txt": b"hello"})
+        out = os.path.join(root, "results.jsonl")
+
+        with BenchServer() as server:
+            client = SWORD3Client()
+            with open(os.path.join(root, "a.txt"), "rb") as f:
+                obj = client.create_object_with_binary(
+                    server.service_url, f, "a.txt", cli._sha256(b"hello"), content_length=5
+                ).location
+
+            assert cli.main(["get", obj, "-r", out]) == 0
+            assert results(out)[0]["status"]["@id"] == obj
+
+            export = os.path.join(root, "export")
+            assert cli.main(["export", "-o", export, obj, server.base_url + "/objects/missing", "-r", out]) == 1
+            exported = results(out)[1:]
+            assert sorted(r["ok"] for r in exported) == [False, True]
+            ok = [r for r in exported if r["ok"]][0]
+            assert ok["bytes"] == 5
+            assert os.path.exists(os.path.join(ok["path"], "status.json"))
+            assert not os.path.exists(os.path.join(ok["path"], "metadata.json"))
+            assert [open(os.path.join(ok["path"], "files", f), "rb").read()
+                    for f in os.listdir(os.path.join(ok["path"], "files"))] == [b"hello"]
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.coalesce import CoalescingClient
+
+from sword3common import Metadata, ByReference, constants, exceptions
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+import json
+
+OBJ_URL = "http://example.com/object/1"
+
+
+def by_reference(*urls):
+    br = ByReference()
+    for url in urls:
+        br.add_file(url, url.rsplit("/", 1)[-1], "application/octet-stream", True)
+    return br
+
+
+class TestCoalesce(TestCase):
+    def _http(self, code=200):
+        body = json.dumps(StatusFixtureFactory.status_document())
+        return MockRoutingHttpLayer(post=MockHttpLayer(code, body if code < 400 else None))
+
+    def test_01_batch_merges_metadata_and_by_reference(self):
+        http = self._http()
+        coalescing = CoalescingClient(SWORD3Client(http=http))
+
+        metadata = Metadata()
+        metadata.add_dc_field("creator", "Test")
+        with coalescing.batch():
+            f1 = coalescing.append_metadata(OBJ_URL, metadata)
+            f2 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/a.zip"))
+            f3 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/b.zip", "http://example.com/c.zip"))
+            assert http.requests == []
+
+        posts = http.calls("post")
+        assert len(posts) == 1
+        assert posts[0][3]["Content-Disposition"] == "attachment; metadata=true; by-reference=true"
+
+        body = json.loads(posts[0][2])
+        assert body["metadata"]["dc:creator"] == "Test"
+        assert [f["@id"] for f in body["by-reference"]["byReferenceFiles"]] == [
+            "http://example.com/a.zip", "http://example.com/b.zip", "http://example.com/c.zip"
+        ]
+        assert f1.result() is f2.result() is f3.result()
+        assert f1.result().status_code == 200
+
+    def test_02_by_reference_only(self):
+        http = self._http()
+        coalescing = CoalescingClient(SWORD3Client(http=http))
+        with coalescing.batch():
+            coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/a.zip"))
+            coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/b.zip"))
+            coalescing.append_by_reference("http://example.com/object/2", by_reference("http://example.com/c.zip"))
+
+        posts = http.calls("post")
+        assert len(posts) == 2
+        first = json.loads(posts[0][2])
+        assert first["@type"] == "ByReference"
+        assert len(first["byReferenceFiles"]) == 2
+        assert posts[1][1] == "http://example.com/object/2"
+
+    def test_03_window(self):
+        http = self._http()
+        coalescing = CoalescingClient(SWORD3Client(http=http), window=0.05)
+        f1 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/a.zip"))
+        f2 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/b.zip"))
+        assert http.requests == []
+
+        f1.result(timeout=5)
+        f2.result(timeout=5)
+        assert len(http.calls("post")) == 1
+
+    def test_04_no_window_sends_immediately(self):
+        http = self._http()
+        coalescing = CoalescingClient(SWORD3Client(http=http))
+        metadata = Metadata()
+        metadata.add_dc_field("creator", "Test")
+        future = coalescing.append_metadata(OBJ_URL, metadata)
+        assert future.done()
+        assert http.calls("post")[0][3]["Content-Disposition"] == "attachment; metadata=true"
+
+    def test_05_errors_reach_every_future(self):
+        coalescing = CoalescingClient(SWORD3Client(http=self._http(404)))
+        with coalescing.batch():
+            f1 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/a.zip"))
+            f2 = coalescing.append_by_reference(OBJ_URL, by_reference("http://example.com/b.zip"))
+
+        for future in [f1, f2]:
+            with self.assertRaises(exceptions.NotFound):
+                future.result()
@@ -0,0 +1,101 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.bench import BenchServer
+from sword3client.connection.connection_compression import CompressingHttpLayer, decode, redigest, DEFLATE
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.connection.connection_requests import RequestsHttpLayer
+
+from sword3common import Metadata, ByReference, MetadataAndByReference, constants
+
+import base64
+import hashlib
+
+
+def mdbr(files):
+    md = Metadata()
+    md.add_dc_field("title", "compressed")
+    br = ByReference()
+    for i in range(files):
+        br.add_file("http://example.com/files/{i}/data.csv".format(i=i), "data-{i}.csv".format(i=i), "text/csv", True)
+    return MetadataAndByReference(md, br)
+
+
+def spy(server):
+    """Record the requests the server receives, as (method, headers, body)"""
+    received = []
+    handle = server.handle
+
+    def record(method, url, headers, body):
+        received.append((method, dict(headers), body))
+        return handle(method, url, headers, body)
+    server.handle = record
+    return received
+
+
+class TestCompression(TestCase):
+    def test_01_compressed_requests(self):
+        server = SWORDServer()
+        received = spy(server)
+        client = SWORD3Client(http=CompressingHttpLayer(MemoryHttpLayer(server), threshold=512))
+
+        resp = client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(200))
+        method, headers, body = received[-1]
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Content-Length"] == str(len(body))
+        assert headers["Digest"] == "SHA-256=" + base64.b64encode(hashlib.sha256(body).digest()).decode("ascii")
+        assert len(decode(body, "gzip")) > 10 * len(body)
+        assert len(resp.status_document.list_links([constants.Rel.FileSetFile])) == 200
+
+        # below the threshold
+        client.create_object_with_metadata(server.service_url, mdbr(0).metadata)
+        assert "Content-Encoding" not in received[-1][1]
+        assert received[-1][1]["Accept-Encoding"] == "gzip, deflate"
+
+        # configured per endpoint
+        client.set_http_layer(CompressingHttpLayer(
+            MemoryHttpLayer(server), threshold=512, endpoints={server.base_url: DEFLATE}
+        ))
+        client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(200))
+        assert received[-1][1]["Content-Encoding"] == "deflate"
+
+        assert redigest("SHA-256=x, MD5=y", b"") == \
+            "SHA-256=47DEQpj8HBSa+/TImW+5JCeuQeRkm5NMpJWZG3hSuFU=, MD5=1B2M2Y8AsgTpgAmY7PhCfg=="
+        assert redigest("UNIXsum=1", b"") is None
+
+    def test_02_refused(self):
+        server = SWORDServer(content_encodings=())
+        received = spy(server)
+        http = CompressingHttpLayer(MemoryHttpLayer(server), threshold=512)
+        client = SWORD3Client(http=http)
+
+        resp = client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(200))
+        assert resp.status_code == 201
+        assert [h.get("Content-Encoding") for _, h, _ in received] == ["gzip", None]
+        assert http.encoding_for(server.service_url) is None
+
+        client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(200))
+        assert len(received) == 3
+        assert "Content-Encoding" not in received[-1][1]
+        assert len(server) == 2
+
+    def test_03_compressed_responses(self):
+        with BenchServer(compress_responses=True) as server:
+            http = RequestsHttpLayer()
+            client = SWORD3Client(http=CompressingHttpLayer(http))
+            location = client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(500)).location
+
+            status = client.get_object(location)
+            assert len(status.list_links([constants.Rel.FileSetFile])) == 500
+
+            # the streamed response is decoded as it is parsed
+            status = client.get_object(location, rels=[constants.Rel.FileSetFile])
+            assert len(status.links) == 500
+            http.close()
+
+        server = SWORDServer(compress_responses=True)
+        client = SWORD3Client(http=CompressingHttpLayer(MemoryHttpLayer(server)))
+        location = client.create_object_with_metadata_and_by_reference(server.service_url, mdbr(500)).location
+        code, headers, body = server.handle("GET", location, {"Accept-Encoding": "gzip"}, b"")
+        assert headers["Content-Encoding"] == "gzip"
+        assert len(list(client.iter_links(location, [constants.Rel.FileSetFile]))) == 500
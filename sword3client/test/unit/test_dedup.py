@@ -0,0 +1,126 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.dedup import DedupIndex, COMPACT_MIN
+from sword3client.lib import paths
+
+from sword3common import constants
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+from io import BytesIO
+import os
+import json
+import base64
+import hashlib
+
+OBJ_URL = "http://example.com/object/1"
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+class TestDedup(TestCase):
+    def setUp(self) -> None:
+        self.tmpFiles = []
+
+    def tearDown(self) -> None:
+        for tmpFile in self.tmpFiles:
+            path = paths.rel2abs(__file__, "..", "tmp", tmpFile)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_01_index(self):
+        index = DedupIndex(capacity=8)
+        for i in range(5000):
+            index.add(hashlib.sha256(str(i).encode()).digest(), "http://example.com/object/{x}/file/{x}.bin".format(x=i))
+
+        assert len(index) == 5000
+        assert index.lookup(hashlib.sha256(b"1234").digest()) == "http://example.com/object/1234/file/1234.bin"
+        assert index.lookup(sha256(b"1234")) == "http://example.com/object/1234/file/1234.bin"
+        assert index.lookup(hashlib.sha256(b"not there").digest()) is None
+        assert index.lookup({constants.DIGEST_MD5: "abc"}) is None
+
+        # replacing the url for a digest doesn't add an entry
+        index.add(sha256(b"1"), "file.bin")
+        assert len(index) == 5000
+        assert index.lookup(sha256(b"1")) == "file.bin"
+
+    def test_02_save_and_load(self):
+        filename = "test_dedup.test_02_save_and_load.idx"
+        path = paths.rel2abs(__file__, "..", "tmp", filename)
+        self.tmpFiles.append(filename)
+
+        index = DedupIndex()
+        for i in range(100):
+            index.add(sha256(str(i).encode()), "http://example.com/files/{x}".format(x=i))
+        index.save(path)
+
+        loaded = DedupIndex.load(path)
+        assert len(loaded) == 100
+        for i in range(100):
+            assert loaded.lookup(sha256(str(i).encode())) == "http://example.com/files/{x}".format(x=i)
+
+    def test_03_add_binary_learns_and_dedups(self):
+        data = b"a large dataset"
+        http = MockRoutingHttpLayer(post=MockHttpLayer(
+            200,
+            json.dumps(StatusFixtureFactory.status_document()),
+            {"Location": OBJ_URL + "/files/dataset.csv"}
+        ))
+        index = DedupIndex()
+        client = SWORD3Client(http=http, dedup_index=index)
+
+        # the first copy is uploaded, and remembered
+        client.add_binary(OBJ_URL, BytesIO(data), "dataset.csv", sha256(data), len(data), "text/csv")
+        assert index.lookup(sha256(data)) == OBJ_URL + "/files/dataset.csv"
+        first = http.calls("post")[0]
+        assert first[3]["Content-Disposition"].startswith("attachment; filename=")
+
+        # the second copy, to another object, is sent by reference
+        client.add_binary("http://example.com/object/2", BytesIO(data), "copy.csv", sha256(data), len(data), "text/csv")
+        second = http.calls("post")[1]
+        assert second[1] == "http://example.com/object/2"
+        br = json.loads(second[2])
+        assert br["byReferenceFiles"][0]["@id"] == OBJ_URL + "/files/dataset.csv"
+        assert br["byReferenceFiles"][0]["dereference"] is True
+        assert br["byReferenceFiles"][0]["contentLength"] == len(data)
+
+    def test_04_create_object_with_binary_dedups(self):
+        data = b"supplementary archive"
+        index = DedupIndex()
+        index.add(sha256(data), OBJ_URL + "/files/archive.zip")
+
+        http = MockRoutingHttpLayer(post=MockHttpLayer(
+            201,
+            json.dumps(StatusFixtureFactory.status_document()),
+            {"Location": "http://example.com/object/3"}
+        ))
+        client = SWORD3Client(http=http, dedup_index=index)
+        dr = client.create_object_with_binary("http://example.com/service", BytesIO(data), "archive.zip", sha256(data))
+
+        assert dr.status_code == 201
+        br = json.loads(http.calls("post")[0][2])
+        assert br["byReferenceFiles"][0]["@id"] == OBJ_URL + "/files/archive.zip"
+
+    def test_05_readd(self):
+        index = DedupIndex()
+        for i in range(10):
+            index.add(sha256(str(i).encode()), "http://example.com/files/{x}".format(x=i))
+        size = len(index._urls)
+
+        # adding the same url again stores nothing
+        for i in range(10):
+            index.add(sha256(str(i).encode()), "http://example.com/files/{x}".format(x=i))
+        assert len(index._urls) == size
+
+        # and the urls which are replaced are reclaimed, rather than the buffer growing without end
+        for n in range(5000):
+            index.add(sha256(b"0"), "http://example.com/files/moved-{x}".format(x=n))
+        assert len(index) == 10
+        assert len(index._urls) < 2 * COMPACT_MIN
+        assert index.lookup(sha256(b"0")) == "http://example.com/files/moved-4999"
+        for i in range(1, 10):
+            assert index.lookup(sha256(str(i).encode())) == "http://example.com/files/{x}".format(x=i)
@@ -0,0 +1,89 @@
+from unittest import TestCase
+
+from sword3client.bench import BenchServer
+from sword3client.connection.connection_requests import RequestsHttpLayer
+from sword3client.executor import (
+    DepositExecutor,
+    DepositResult,
+    deposit_binary,
+    deposit_package,
+    deposit_metadata,
+    add_binary,
+)
+from sword3client.lib import paths
+
+from sword3common import Metadata
+
+import os
+import pickle
+import multiprocessing
+
+
+def _session_replaced(layer, conn):
+    conn.send(id(layer._session))
+    conn.close()
+
+
+class TestExecutor(TestCase):
+    def setUp(self) -> None:
+        self.tmpFiles = []
+
+    def tearDown(self) -> None:
+        for tmpFile in self.tmpFiles:
+            path = paths.rel2abs(__file__, "..", "tmp", tmpFile)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _file(self, name, content: bytes):
+        self.tmpFiles.append(name)
+        path = paths.rel2abs(__file__, "..", "tmp", name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_01_deposits(self):
+        files = [self._file("test_executor.test_01_{i}.txt".format(i=i), os.urandom(1000 * (i + 1)))
+                 for i in range(6)]
+        md = Metadata()
+        md.add_dc_field("title", "Executor deposit")
+
+        with BenchServer() as server:
+            with DepositExecutor(max_workers=3) as executor:
+                binaries = list(executor.map(deposit_binary, [server.service_url] * len(files), files))
+                package = executor.submit(deposit_package, server.service_url, files[:2], md.data).result()
+                metadata = executor.submit(deposit_metadata, server.service_url, md.data).result()
+                added = executor.submit(add_binary, binaries[0].location, files[1]).result()
+                missing = executor.submit(add_binary, server.base_url + "/objects/missing", files[1]).result()
+
+            assert [r.source for r in binaries] == files
+            assert all(r.ok and r.status_code == 201 for r in binaries)
+            assert len(set(r.location for r in binaries)) == 6
+            assert package.ok and package.source == files[:2]
+            assert metadata.ok and metadata.status_code == 201
+            assert added.ok
+            assert len(server.sword) == 8
+
+        assert not missing.ok
+        assert missing.error_type == "NotFound"
+        assert missing.location is None
+
+    def test_02_result_is_lightweight(self):
+        result = DepositResult("deposit_binary", "/some/path", location="http://localhost/objects/1",
+                               status_code=201, duration=0.5)
+        copy = pickle.loads(pickle.dumps(result))
+        assert copy.ok
+        assert (copy.task, copy.source, copy.location, copy.status_code) == \
+            ("deposit_binary", "/some/path", "http://localhost/objects/1", 201)
+        assert len(pickle.dumps(result)) < 300
+
+    def test_03_fork_gets_new_pool(self):
+        if not hasattr(os, "fork"):
+            return
+        layer = RequestsHttpLayer()
+        ctx = multiprocessing.get_context("fork")
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_session_replaced, args=(layer, child))
+        proc.start()
+        child_session = parent.recv()
+        proc.join()
+        assert child_session != id(layer._session)
@@ -0,0 +1,174 @@
+from unittest import TestCase, skipUnless
+
+from sword3client import SWORD3Client
+from sword3client.bench import BenchServer
+from sword3client.connection.connection_memory import SWORDServer
+
+from sword3common import Metadata, constants
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import time
+import base64
+import socket
+import hashlib
+import threading
+
+try:
+    from sword3client.connection.connection_httpx import HttpxHttpLayer
+    import h2.config
+    import h2.events
+    import h2.connection
+except ImportError:
+    HttpxHttpLayer = None
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def metadata(title):
+    md = Metadata()
+    md.add_dc_field("title", title)
+    return md
+
+
+class H2Server(object):
+    """Serves a SWORDServer over HTTP/2 with prior knowledge (h2c).  Each request is answered on a thread of its own
+    after ``delay``, and the server records how many connections were made and the most streams open at once"""
+
+    def __init__(self, delay: float = 0.05):
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.base_url = "http://127.0.0.1:{p}".format(p=self._sock.getsockname()[1])
+        self.sword = SWORDServer(self.base_url)
+        self.connections = 0
+        self.max_streams = 0
+        self._open = 0
+        self._delay = delay
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def service_url(self):
+        return self.sword.service_url
+
+    def close(self):
+        self._sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        lock = threading.Lock()
+        with lock:
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+        requests = {}
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            with lock:
+                events = conn.receive_data(data)
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    requests[event.stream_id] = (dict(event.headers), [])
+                elif isinstance(event, h2.events.DataReceived):
+                    requests[event.stream_id][1].append(event.data)
+                    with lock:
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = requests.pop(event.stream_id)
+                    with self._lock:
+                        self._open += 1
+                        self.max_streams = max(self.max_streams, self._open)
+                    threading.Thread(
+                        target=self._respond, args=(sock, conn, lock, event.stream_id, headers, b"".join(body))
+                    ).start()
+            with lock:
+                sock.sendall(conn.data_to_send())
+        sock.close()
+
+    def _respond(self, sock, conn, lock, stream_id, headers, body):
+        time.sleep(self._delay)
+        method, path = headers[":method"], headers[":path"]
+        headers = {k: v for k, v in headers.items() if not k.startswith(":")}
+        code, resp_headers, resp_body = self.sword.handle(method, path, headers, body)
+        with self._lock:
+            self._open -= 1
+        with lock:
+            conn.send_headers(stream_id, [(":status", str(code))] +
+                              [(k.lower(), str(v)) for k, v in resp_headers.items()] +
+                              [("content-length", str(len(resp_body)))])
+            # the responses here are small enough to fit in the initial flow control window
+            size = conn.max_outbound_frame_size
+            for i in range(0, len(resp_body), size):
+                conn.send_data(stream_id, resp_body[i:i + size])
+            conn.end_stream(stream_id)
+            sock.sendall(conn.data_to_send())
+
+
+@skipUnless(HttpxHttpLayer is not None, "httpx is not installed")
+class TestHttpx(TestCase):
+    def test_01_protocol(self):
+        content = b"line one\nline two\n" * 10000
+        with BenchServer() as server:
+            http = HttpxHttpLayer()
+            client = SWORD3Client(http=http)
+
+            obj = client.create_object_with_binary(server.service_url, BytesIO(content), "lines.txt",
+                                                   sha256(content), content_length=len(content))
+            # a plain http:// server is spoken to over HTTP/1.1
+            assert obj._http_response.http_version == "HTTP/1.1"
+
+            file_url = client.get_object(obj.location, rels=[constants.Rel.FileSetFile]).links[0]["@id"]
+            with client.get_file(file_url) as stream:
+                assert stream.read() == content
+
+            # streamed with chunked encoding
+            client.add_binary(obj.location, iter([content[:1000], content[1000:]]), "more.txt", None)
+            assert len(client.get_object(obj.location).list_links([constants.Rel.FileSetFile])) == 2
+            http.close()
+
+    def test_02_threads(self):
+        with BenchServer() as server:
+            http = HttpxHttpLayer(max_connections=8)
+            client = SWORD3Client(http=http)
+
+            def work(i):
+                location = client.create_object_with_metadata(server.service_url, metadata(str(i))).location
+                return client.get_object(location).object_url
+
+            with ThreadPoolExecutor(8) as pool:
+                urls = list(pool.map(work, range(40)))
+            assert len(set(urls)) == 40
+            http.close()
+
+    def test_03_http2_multiplexed(self):
+        server = H2Server()
+        http = HttpxHttpLayer(http1=False)
+        client = SWORD3Client(http=http)
+
+        obj = client.create_object_with_metadata(server.service_url, metadata("h2"))
+        assert obj._http_response.http_version == "HTTP/2"
+
+        # the requests of many threads are sent at once, as streams of the one connection
+        with ThreadPoolExecutor(8) as pool:
+            urls = list(pool.map(lambda i: client.get_object(obj.location).object_url, range(16)))
+        assert set(urls) == {obj.location}
+        assert server.connections == 1
+        assert server.max_streams > 1
+        http.close()
+        server.close()
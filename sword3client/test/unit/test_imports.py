@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from sword3client.lib import paths
+
+import sys
+import json
+import subprocess
+
+ROOT = paths.rel2abs(__file__, "..", "..", "..")
+
+
+def loaded_after(code):
+    """The modules which running ``code`` in a fresh interpreter loads"""
+    script = "import sys, json\nbefore = set(sys.modules)\n{c}\nprint(json.dumps(sorted(set(sys.modules) - before)))"
+    out = subprocess.run([sys.executable, "-c", script.format(c=code)], cwd=ROOT, check=True, stdout=subprocess.PIPE)
+    return set(json.loads(out.stdout.decode("utf-8")))
+
+
+class TestImports(TestCase):
+    def test_01_package_import_is_light(self):
+        loaded = loaded_after("import sword3client")
+        assert "requests" not in loaded
+        assert "sword3common" not in loaded
+        assert "sword3client.client" not in loaded
+
+        loaded = loaded_after("import sword3client\nsword3client.SWORDResponse")
+        assert "sword3client.models.sword_response" in loaded
+        assert "sword3client.client" not in loaded
+
+    def test_02_requests_only_for_default_transport(self):
+        loaded = loaded_after(
+            "from sword3client import SWORD3Client\n"
+            "from sword3client.connection.connection_memory import MemoryHttpLayer\n"
+            "SWORD3Client(http=MemoryHttpLayer())"
+        )
+        assert "sword3client.client" in loaded
+        assert "requests" not in loaded
+        assert "sword3client.sync" not in loaded
+
+        loaded = loaded_after("from sword3client import SWORD3Client\nSWORD3Client()")
+        assert "requests" in loaded
+
+    def test_03_reexports(self):
+        import sword3client
+        from sword3client.client import SWORD3Client
+        from sword3client.models.sword_response import SWORDResponse
+
+        assert sword3client.SWORD3Client is SWORD3Client
+        assert sword3client.SWORDResponse is SWORDResponse
+        assert SWORD3Client.__module__ == "sword3client"
+        assert "SWORD3Client" in dir(sword3client)
+        with self.assertRaises(AttributeError):
+            sword3client.NotAThing
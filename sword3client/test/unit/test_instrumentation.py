@@ -0,0 +1,125 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.instrumentation import InstrumentedHttpLayer
+from sword3client.metrics import MetricsRegistry
+
+from sword3common import Metadata, exceptions
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+from io import BytesIO
+import json
+
+OBJ_URL = "http://example.com/object/1"
+
+
+def reading(layer):
+    """A route which reads the whole request body, as a real HTTP layer would"""
+    def route(url, body):
+        while body is not None and body.read(4):
+            pass
+        return layer
+    return route
+
+
+class TestInstrumentation(TestCase):
+    def test_01_listeners(self):
+        http = MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document()))
+        client = SWORD3Client(http=http)
+        assert client._http is http
+
+        events = []
+        client.add_listener(events.append)
+        assert isinstance(client._http, InstrumentedHttpLayer)
+
+        # switching the http layer keeps the instrumentation
+        client.set_http_layer(http)
+        assert client._http.http is http
+
+        client.remove_listener(events.append)
+        assert client._http is http
+        client.get_object(OBJ_URL)
+        assert events == []
+
+    def test_02_get_object(self):
+        body = json.dumps(StatusFixtureFactory.status_document())
+        client = SWORD3Client(http=MockHttpLayer(200, body))
+        events = []
+        client.add_listener(events.append)
+        client.get_object(OBJ_URL)
+
+        assert [e.event for e in events] == ["start", "headers-built", "request-sent", "response-received", "parsed"]
+        assert all(e.operation == "get_object" for e in events)
+        assert all(e.url == OBJ_URL for e in events)
+        assert events[-1].status_code == 200
+        assert events[-1].bytes_received == len(body)
+        assert events[-1].bytes_sent == 0
+        assert all(e.started == events[0].timestamp for e in events)
+        assert [e.timestamp for e in events] == sorted(e.timestamp for e in events)
+
+    def test_03_upload(self):
+        http = MockRoutingHttpLayer(post=reading(MockHttpLayer(
+            200, json.dumps(StatusFixtureFactory.status_document()), {"Location": OBJ_URL + "/files/1"}
+        )))
+        client = SWORD3Client(http=http)
+        events = []
+        client.add_listener(events.append)
+        client.add_binary(OBJ_URL, BytesIO(b"0123456789"), "test.bin", {"SHA-256": "abc"})
+
+        assert [e.event for e in events] == ["start", "headers-built", "request-sent", "response-received", "parsed"]
+        assert events[2].bytes_sent == 10
+        assert events[-1].operation == "add_binary"
+        assert events[-1].status_code == 200
+
+    def test_04_error(self):
+        client = SWORD3Client(http=MockHttpLayer(404))
+        events = []
+        client.add_listener(events.append)
+        with self.assertRaises(exceptions.NotFound):
+            client.delete_object(OBJ_URL)
+
+        assert events[-1].event == "error"
+        assert events[-1].status_code == 404
+        assert isinstance(events[-1].error, exceptions.NotFound)
+
+    def test_05_one_operation_per_request(self):
+        body = json.dumps(StatusFixtureFactory.status_document())
+        client = SWORD3Client(http=MockHttpLayer(201, body))
+        events = []
+        client.add_listener(events.append)
+        metrics = MetricsRegistry()
+        metrics.attach(client)
+
+        # carried out by create_object_by_reference, but reported once, as what was asked for
+        client.create_object_with_temporary_file(OBJ_URL, "http://example.com/temp/1", "data.csv", "text/csv")
+        assert [e.event for e in events if e.phase is None] == \
+            ["start", "headers-built", "request-sent", "response-received", "parsed"]
+        assert all(e.operation == "create_object_with_temporary_file" for e in events)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["operations"] == {"create_object_with_temporary_file": {"success": 1, "error": 0}}
+        assert snapshot["bytes_sent"]["create_object_with_temporary_file"] == events[-1].bytes_sent > 0
+
+    def test_06_in_memory_body(self):
+        # a body in memory is handed over whole, so request-sent comes before the response, not after it
+        order = []
+
+        def route(layer):
+            def respond(url, body):
+                order.append("http")
+                return layer
+            return respond
+        client = SWORD3Client(http=MockRoutingHttpLayer(
+            get=route(MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document()))),
+            put=route(MockHttpLayer(204))
+        ))
+        client.add_listener(lambda e: order.append(e.event))
+        client.get_object(OBJ_URL)
+        assert order == ["start", "headers-built", "request-sent", "http", "response-received", "parsed"]
+
+        status = client.get_object(OBJ_URL)
+        order.clear()
+        client.replace_metadata(status, Metadata())
+        assert order.index("request-sent") < order.index("http")
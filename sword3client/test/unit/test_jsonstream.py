@@ -0,0 +1,159 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client, SWORDResponse
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer, MemoryHttpResponse, read_body
+from sword3client.lib import jsonstream
+
+from sword3common import Metadata, ByReference, MetadataAndByReference, StatusDocument, constants, exceptions
+
+from io import BytesIO
+
+import json
+import random
+
+
+class _ClosingResponse(MemoryHttpResponse):
+    def __init__(self, *args):
+        super(_ClosingResponse, self).__init__(*args)
+        self.closed = False
+
+    def __exit__(self):
+        self.closed = True
+
+
+class _Tracking(MemoryHttpLayer):
+    """Gives out responses which record whether they have been closed"""
+
+    def __init__(self, server):
+        super(_Tracking, self).__init__(server)
+        self.responses = []
+
+    def _request(self, method, url, data, headers):
+        resp = _ClosingResponse(*self.server.handle(method, url, headers or {}, read_body(data)))
+        self.responses.append(resp)
+        return resp
+
+
+class CountingStream(object):
+    def __init__(self, data: bytes):
+        self._stream = BytesIO(data)
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.read_bytes += len(data)
+        return data
+
+
+def big_object(server, files):
+    md = Metadata()
+    md.add_dc_field("title", "Many files")
+    br = ByReference()
+    for i in range(files):
+        br.add_file("http://example.com/files/{i}".format(i=i), "file{i}.csv".format(i=i), "text/csv", i % 2 == 0)
+    client = SWORD3Client(http=MemoryHttpLayer(server))
+    return client.create_object_with_metadata_and_by_reference(
+        server.service_url, MetadataAndByReference(md, br)
+    ).location
+
+
+class TestJSONStream(TestCase):
+    def test_01_parse(self):
+        rng = random.Random(7)
+        for _ in range(100):
+            doc = {
+                "@id": "http://localhost/objects/1",
+                "number": rng.choice([0, -12, 1234567, 3.25e-7]),
+                "nested": {"list": [1, "two", None, True], "text": "café ☃"},
+                "links": [{"@id": "http://localhost/files/{i}".format(i=i), "rel": ["r{x}".format(x=i % 3)]}
+                          for i in range(rng.randint(0, 20))],
+                "after": False,
+            }
+            text = json.dumps(doc, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+            chunk_size = rng.randint(1, 40)
+            assert jsonstream.load_status(BytesIO(text.encode("utf-8")), chunk_size=chunk_size) == doc
+
+            only = jsonstream.load_status(BytesIO(text.encode("utf-8")), rels=["r1"], chunk_size=chunk_size)
+            assert only["links"] == [l for l in doc["links"] if "r1" in l["rel"]]
+            assert only["nested"] == doc["nested"]
+
+        assert list(jsonstream.iter_links(BytesIO(b'{"links": []}'))) == []
+        assert jsonstream.load_status(BytesIO(b'{}')) == {"links": []}
+        for bad in [b'{"a": 1', b'{"links": [1, 2', b'[1]', b'{"a" 1}']:
+            with self.assertRaises(ValueError):
+                jsonstream.load_status(BytesIO(bad), chunk_size=3)
+
+    def test_02_first_link_early(self):
+        server = SWORDServer()
+        location = big_object(server, 3000)
+        code, headers, body = server.handle("GET", location, {}, b"")
+        assert len(body) > 500000
+
+        stream = CountingStream(body)
+        first = next(jsonstream.iter_links(stream, chunk_size=4096))
+        assert first["@id"] == location + "/files/1"
+        assert stream.read_bytes < 10000
+
+    def test_03_client(self):
+        server = SWORDServer()
+        location = big_object(server, 200)
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+
+        full = client.get_object(location)
+
+        status = client.get_object(location, rels=[constants.Rel.FileSetFile])
+        assert isinstance(status, StatusDocument)
+        assert status.object_url == location
+        assert status.metadata_url == full.metadata_url
+        assert len(status.links) == len(full.links) == 200
+
+        assert list(client.iter_links(location)) == full.links
+        assert list(client.iter_links(location, [constants.Rel.DerivedResource])) == []
+        assert client.get_object(location, rels=[constants.Rel.DerivedResource]).links == []
+
+    def test_04_lazy_response(self):
+        server = SWORDServer()
+        location = big_object(server, 50)
+        resp = MemoryHttpResponse(*server.handle("GET", location, {}, b""))
+
+        response = SWORDResponse(resp, lazy=True)
+        assert response._parsed is False
+        assert len(list(response.iter_links([constants.Rel.FileSetFile]))) == 50
+        assert response._parsed is False
+        assert response.status_document.object_url == location
+        assert len(list(response.iter_links([constants.Rel.FileSetFile]))) == 50
+        assert SWORDResponse(MemoryHttpResponse(204, {}, b"")).status_document is None
+
+        # by default, the document is validated straight away
+        assert SWORDResponse(resp)._parsed is True
+        with self.assertRaises(exceptions.InvalidDataFromServer):
+            SWORDResponse(MemoryHttpResponse(200, {}, b'{"@type": "Status"}'))
+        invalid = SWORDResponse(MemoryHttpResponse(200, {}, b'{"@type": "Status"}'), lazy=True)
+        with self.assertRaises(exceptions.InvalidDataFromServer):
+            invalid.status_document
+
+    def test_05_streamed_errors_close(self):
+        server = SWORDServer()
+        http = _Tracking(server)
+        client = SWORD3Client(http=http)
+        missing = server.base_url + "/objects/missing"
+
+        with self.assertRaises(exceptions.NotFound):
+            client.get_object(missing, rels=[constants.Rel.FileSetFile])
+        with self.assertRaises(exceptions.NotFound):
+            list(client.iter_links(missing))
+        with self.assertRaises(exceptions.NotFound):
+            with client.get_file(missing + "/file.txt"):
+                pass
+        assert len(http.responses) == 3
+        assert all(resp.closed for resp in http.responses)
+
+        # and a file which is being read is closed if the reader fails
+        status = client.get_object(big_object(server, 1))
+        http.responses.clear()
+        with self.assertRaises(RuntimeError):
+            with client.get_file(status.links[0]["@id"]) as stream:
+                stream.read(1)
+                raise RuntimeError("reader failed")
+        assert len(http.responses) == 1
+        assert http.responses[0].closed
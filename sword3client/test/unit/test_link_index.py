@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.models.link_index import LinkIndex, link_index, filename
+
+from sword3common import Metadata, ByReference, MetadataAndByReference, constants
+
+import gc
+
+
+def big_status(files):
+    server = SWORDServer()
+    client = SWORD3Client(http=MemoryHttpLayer(server))
+    br = ByReference()
+    for i in range(files):
+        br.add_file("http://example.com/source/{i}.csv".format(i=i), "{i}.csv".format(i=i), "text/csv", False)
+    location = client.create_object_with_metadata_and_by_reference(
+        server.service_url, MetadataAndByReference(Metadata(), br)
+    ).location
+    return client, client.get_object(location)
+
+
+class TestLinkIndex(TestCase):
+    def test_01_lookups(self):
+        client, status = big_status(500)
+        index = link_index(status)
+
+        assert len(index) == 500
+
+        assert index.with_rel(constants.Rel.FileSetFile) == status.list_links([constants.Rel.FileSetFile])
+        assert index.with_rel(constants.Rel.FileSetFile, constants.Rel.DerivedResource) == status.links
+        assert index.with_rel(constants.Rel.DerivedResource) == []
+
+        link = status.links[42]
+        assert index.get(link["@id"]) is link
+        assert index.get("http://example.com/nothing") is None
+        assert index.by_reference(link["byReference"]) == [link]
+        assert link in index.with_etag(link["eTag"])
+        assert index.with_filename(filename(link["@id"])) == [link]
+        assert filename("http://example.com/files/a%20b.txt/") == "a b.txt"
+
+        # results are copies, so the index can't be changed through them
+        index.with_rel(constants.Rel.FileSetFile).clear()
+        assert len(index.with_rel(constants.Rel.FileSetFile)) == 500
+
+    def test_02_cached(self):
+        client, status = big_status(10)
+        index = link_index(status)
+        assert link_index(status) is index
+        assert client._get_url(status, "metadata_url") == status.metadata_url
+        assert client._get_url(status, "fileset_url") == status.fileset_url
+
+        # the document's own URLs are always current
+        status.data["@id"] = "http://example.com/changed"
+        assert client._get_url(status, "object_url") == "http://example.com/changed"
+
+        # the index is rebuilt if the links change
+        status.links.append({"@id": "http://example.com/extra", "rel": [constants.Rel.DerivedResource]})
+        rebuilt = link_index(status)
+        assert rebuilt is not index
+        assert rebuilt.get("http://example.com/extra") is not None
+
+        # and is dropped along with the document
+        other = LinkIndex(status)
+        del status
+        gc.collect()
+        from sword3client.models import link_index as module
+        assert all(i is not rebuilt for i in module._indexes.values())
+        assert len(other) == 11
@@ -0,0 +1,137 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+
+from sword3common import Metadata, ByReference, constants, exceptions
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import base64
+import hashlib
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def metadata(title):
+    md = Metadata()
+    md.add_dc_field("title", title)
+    return md
+
+
+class TestMemory(TestCase):
+    def setUp(self) -> None:
+        self.server = SWORDServer()
+        self.client = SWORD3Client(http=MemoryHttpLayer(self.server))
+
+    def test_01_deposit_flow(self):
+        client = self.client
+        service = client.get_service(self.server.service_url)
+
+        resp = client.create_object_with_metadata(service, metadata("first"), in_progress=True)
+        assert resp.status_code == 201
+        status = resp.status_document
+        assert status.data["state"][0]["@id"] == constants.DepositState.InProgress
+
+        data = b"some data"
+        resp = client.add_binary(status, BytesIO(data), "data.txt", sha256(data), len(data), "text/plain")
+        file_url = resp.location
+        assert file_url.startswith(status.object_url + "/files/")
+
+        client.append_metadata(status, metadata("second"))
+        assert client.get_metadata(status).data["dc:title"] == "second"
+
+        status = client.get_object(status)
+        assert status.data["state"][0]["@id"] == constants.DepositState.Ingested
+        assert [l["@id"] for l in status.links] == [file_url]
+        with client.get_file(file_url) as stream:
+            assert stream.read() == data
+
+        client.replace_file(file_url, BytesIO(b"new"), "data.txt", sha256(b"new"))
+        with client.get_file(file_url) as stream:
+            assert stream.read() == b"new"
+
+        client.delete_object(status)
+        with self.assertRaises(exceptions.Gone):
+            client.get_object(status)
+        with self.assertRaises(exceptions.NotFound):
+            client.get_object(self.server.base_url + "/objects/999")
+
+    def test_02_segmented_upload(self):
+        client = self.client
+        service = client.get_service(self.server.service_url)
+        data = bytes(range(256)) * 10
+        temporary_url = client.initialise_segmented_upload(service, len(data), 3, 1000, sha256(data)).location
+
+        client.upload_file_segment(temporary_url, BytesIO(data[1000:2000]), 2)
+        info = client.segmented_upload_status(temporary_url)
+        assert info.received == [2]
+        assert info.expecting == [1, 3]
+
+        with self.assertRaises(exceptions.UnexpectedSegment):
+            client.upload_file_segment(temporary_url, BytesIO(data[1000:2000]), 2)
+        with self.assertRaises(exceptions.InvalidSegmentSize):
+            client.upload_file_segment(temporary_url, BytesIO(data[2000:2100]), 3)
+
+        client.upload_file_segment(temporary_url, BytesIO(data[:1000]), 1)
+        client.upload_file_segment(temporary_url, BytesIO(data[2000:]), 3)
+
+        resp = client.create_object_with_temporary_file(service, temporary_url, "big.bin", "application/octet-stream",
+                                                        len(data), digest=sha256(data))
+        file_url = resp.status_document.links[0]["@id"]
+        with client.get_file(file_url) as stream:
+            assert stream.read() == data
+
+    def test_03_errors(self):
+        client = self.client
+        with self.assertRaises(exceptions.DigestMismatch):
+            client.create_object_with_binary(self.server.service_url, BytesIO(b"data"), "a.bin", sha256(b"other"))
+        with self.assertRaises(exceptions.MetadataFormatNotAcceptable):
+            client.create_object_with_metadata(self.server.service_url, metadata("x"), metadata_format="http://other")
+        with self.assertRaises(exceptions.SegmentLimitExceeded):
+            client.initialise_segmented_upload(client.get_service(self.server.service_url), 100000, 2000, 50)
+        assert len(self.server) == 0
+
+        # a file is replaced by exactly one By-Reference file
+        status = client.create_object_with_binary(self.server.service_url, BytesIO(b"data"), "a.bin",
+                                                  sha256(b"data")).status_document
+        file_url = status.links[0]["@id"]
+        with self.assertRaises(exceptions.ValidationFailed):
+            client.replace_file_by_reference(file_url, ByReference())
+        br = ByReference()
+        br.add_file("http://example.com/a.bin", "a.bin", "application/octet-stream", True)
+        br.add_file("http://example.com/b.bin", "b.bin", "application/octet-stream", True)
+        with self.assertRaises(exceptions.ValidationFailed):
+            client.replace_file_by_reference(file_url, br)
+
+    def test_04_pending_and_conditional(self):
+        client = self.client
+        br = ByReference()
+        br.add_file("http://example.com/data.zip", "data.zip", "application/zip", True)
+        status = client.create_object_by_reference(self.server.service_url, br).status_document
+        assert status.links[0]["status"] == constants.FileState.Pending
+
+        etag = status.data["eTag"]
+        assert client.get_object(status, if_none_match=etag) is None
+
+        self.server.ingest_pending()
+        status = client.get_object(status, if_none_match=etag)
+        assert status.links[0]["status"] == constants.FileState.Ingested
+
+    def test_05_concurrent(self):
+        client = self.client
+
+        def deposit(i):
+            data = str(i).encode()
+            obj = client.create_object_with_metadata(self.server.service_url, metadata(str(i))).location
+            client.add_binary(obj, BytesIO(data), "{x}.txt".format(x=i), sha256(data))
+            return client.get_object(obj)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(deposit, range(200)))
+
+        assert len(self.server) == 200
+        assert len(set(s.object_url for s in statuses)) == 200
+        assert all(len(s.links) == 1 for s in statuses)
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.metrics import MetricsRegistry
+from sword3client.lib import paths
+
+from sword3common import exceptions
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import json
+
+OBJ_URL = "http://example.com/object/1"
+
+
+class TestMetrics(TestCase):
+    def setUp(self) -> None:
+        self.tmpFiles = []
+
+    def tearDown(self) -> None:
+        for tmpFile in self.tmpFiles:
+            path = paths.rel2abs(__file__, "..", "tmp", tmpFile)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_01_snapshot(self):
+        body = json.dumps(StatusFixtureFactory.status_document())
+        http = MockRoutingHttpLayer(get=MockHttpLayer(200, body), delete=MockHttpLayer(404))
+        client = SWORD3Client(http=http)
+        metrics = MetricsRegistry(buckets=(0.1, 1.0))
+        metrics.attach(client)
+
+        for i in range(3):
+            client.get_object(OBJ_URL)
+        with self.assertRaises(exceptions.NotFound):
+            client.delete_object(OBJ_URL)
+
+        snap = metrics.snapshot()
+        assert snap["operations"]["get_object"] == {"success": 3, "error": 0}
+        assert snap["operations"]["delete_object"] == {"success": 0, "error": 1}
+        assert snap["responses"]["get_object"] == {200: 3}
+        assert snap["responses"]["delete_object"] == {404: 1}
+        assert snap["latency"]["get_object"]["count"] == 3
+        assert snap["latency"]["get_object"]["buckets"][float("inf")] == 3
+        assert snap["bytes_received"]["get_object"] == 3 * len(body)
+        assert snap["download_bytes_per_second"] > 0
+
+        metrics.detach(client)
+        client.get_object(OBJ_URL)
+        assert metrics.snapshot()["operations"]["get_object"]["success"] == 3
+
+    def test_02_threads(self):
+        client = SWORD3Client(http=MockHttpLayer(204))
+        metrics = MetricsRegistry()
+        metrics.attach(client)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: client.delete_file(OBJ_URL + "/files/" + str(i)), range(2000)))
+
+        snap = metrics.snapshot()
+        assert snap["operations"]["delete_file"]["success"] == 2000
+        assert snap["latency"]["delete_file"]["count"] == 2000
+
+    def test_03_prometheus(self):
+        filename = "test_metrics.test_03_prometheus.prom"
+        path = paths.rel2abs(__file__, "..", "tmp", filename)
+        self.tmpFiles.append(filename)
+
+        client = SWORD3Client(http=MockHttpLayer(204))
+        metrics = MetricsRegistry(buckets=(0.5, 1.0))
+        metrics.attach(client)
+        client.delete_object(OBJ_URL)
+        metrics.write_prometheus(path)
+
+        with open(path) as f:
+            text = f.read()
+        assert '# TYPE sword3client_operation_duration_seconds histogram' in text
+        assert 'sword3client_operations_total{operation="delete_object",outcome="success"} 1' in text
+        assert 'sword3client_responses_total{operation="delete_object",code="204"} 1' in text
+        assert 'sword3client_operation_duration_seconds_bucket{operation="delete_object",le="0.5"} 1' in text
+        assert 'sword3client_operation_duration_seconds_bucket{operation="delete_object",le="+Inf"} 1' in text
+        assert 'sword3client_operation_duration_seconds_count{operation="delete_object"} 1' in text
@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.connection.connection_netem import NetworkEmulationHttpLayer, constant, lognormal
+from sword3client.lib.throttle import TokenBucket, ThrottledReader
+
+from sword3common import Metadata, constants, exceptions
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import time
+import base64
+import hashlib
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def metadata():
+    md = Metadata()
+    md.add_dc_field("title", "netem")
+    return md
+
+
+class TestNetworkEmulation(TestCase):
+    def setUp(self) -> None:
+        self.server = SWORDServer()
+
+    def test_01_token_bucket(self):
+        bucket = TokenBucket(1000000, burst=16384)
+        reader = ThrottledReader(BytesIO(b"x" * 216384), [bucket])
+        start = time.monotonic()
+        assert len(reader.read()) == 216384
+        # 200KB beyond the burst, at 1MB/s
+        assert 0.15 < time.monotonic() - start < 0.6
+
+    def test_02_latency(self):
+        http = NetworkEmulationHttpLayer(MemoryHttpLayer(self.server), latency=constant(0.02))
+        client = SWORD3Client(http=http)
+        start = time.monotonic()
+        for i in range(5):
+            client.get_service(self.server.service_url)
+        assert time.monotonic() - start >= 0.1
+
+    def test_03_seeded_faults(self):
+        def run(seed):
+            http = NetworkEmulationHttpLayer(MemoryHttpLayer(self.server), latency=lognormal(0.0001, 0.5),
+                                             reset_rate=0.1, error_rate=0.2, seed=seed)
+            client = SWORD3Client(http=http)
+            outcomes = []
+            for i in range(100):
+                try:
+                    client.get_service(self.server.service_url)
+                    outcomes.append("ok")
+                except ConnectionResetError:
+                    outcomes.append("reset")
+                except exceptions.SwordException:
+                    outcomes.append("5xx")
+            return outcomes
+
+        first = run(42)
+        assert first == run(42)
+        assert first != run(43)
+        assert 3 <= first.count("reset") <= 20
+        assert 10 <= first.count("5xx") <= 35
+
+    def test_04_bandwidth(self):
+        data = b"x" * 200000
+        http = NetworkEmulationHttpLayer(MemoryHttpLayer(self.server), upload_rate=2000000, total_upload_rate=1000000)
+        client = SWORD3Client(http=http)
+        obj = client.create_object_with_metadata(self.server.service_url, metadata()).location
+
+        # two concurrent uploads share the 1MB/s total, so take at least 0.3s beyond the 100KB burst
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda i: client.add_binary(obj, BytesIO(data), str(i), sha256(data)), range(2)))
+        assert time.monotonic() - start >= 0.3
+
+        http = NetworkEmulationHttpLayer(MemoryHttpLayer(self.server), download_rate=1000000)
+        client = SWORD3Client(http=http)
+        file_url = client.get_object(obj).links[0]["@id"]
+        start = time.monotonic()
+        with client.get_file(file_url) as stream:
+            assert stream.read() == data
+        # 100KB beyond the burst
+        assert time.monotonic() - start >= 0.08
+
+    def test_05_response_bytes(self):
+        # a response which isn't streamed is charged for its bytes as they arrived, not its length as text
+        data = "é".encode("utf-8") * 100000
+        client = SWORD3Client(http=MemoryHttpLayer(self.server))
+        obj = client.create_object_with_binary(self.server.service_url, BytesIO(data), "a.txt", sha256(data))
+        file_url = obj.status_document.links[0]["@id"]
+
+        http = NetworkEmulationHttpLayer(MemoryHttpLayer(self.server), download_rate=1000000)
+        start = time.monotonic()
+        resp = http.get(file_url)
+        assert resp.content == data
+        # 100KB beyond the burst
+        assert time.monotonic() - start >= 0.08
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client, operations
+from sword3client.operations import OperationSpec
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer, MemoryHttpResponse
+
+from sword3common import Metadata, exceptions
+
+import io
+
+
+class _Answer(MemoryHttpLayer):
+    """Records each request, and answers it with the given status"""
+
+    def __init__(self, status_code):
+        super(_Answer, self).__init__()
+        self.status_code = status_code
+        self.requests = []
+
+    def _request(self, method, url, data, headers):
+        self.requests.append((method, url, headers))
+        return MemoryHttpResponse(self.status_code, {}, b"")
+
+
+class TestOperations(TestCase):
+    def test_01_specs(self):
+        specs = [v for v in vars(operations).values() if isinstance(v, OperationSpec)]
+        assert len(specs) > 30
+        for spec in specs:
+            assert isinstance(spec.success, frozenset) and isinstance(spec.errors, frozenset)
+            assert spec.success.isdisjoint(spec.errors)
+            assert spec.method in (operations.GET, operations.PUT, operations.POST, operations.DELETE)
+            # every public method of the client with the spec's name exists
+            assert hasattr(SWORD3Client, spec.name), spec.name
+
+    def test_02_dispatch(self):
+        http = _Answer(204)
+        client = SWORD3Client(http=http)
+
+        client.upload_file_segment("http://localhost/staging/1", io.BytesIO(b"abc"), 1, content_length=3)
+        method, url, headers = http.requests[-1]
+        assert (method, url) == ("POST", "http://localhost/staging/1")
+        assert headers["Content-Type"] == "application/octet-stream"
+        assert headers["Content-Length"] == "3"
+        # the spec's own headers are left alone
+        assert operations.UPLOAD_FILE_SEGMENT.headers == {"Content-Type": "application/octet-stream"}
+
+        # a success code of another operation is unexpected
+        with self.assertRaises(exceptions.UnexpectedSwordException):
+            client.get_metadata("http://localhost/objects/1/metadata")
+
+        # an error the operation may get
+        http.status_code = 404
+        with self.assertRaises(exceptions.NotFound):
+            client.delete_object("http://localhost/objects/1")
+
+        server = SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+        md = Metadata()
+        md.add_dc_field("title", "dispatched")
+        obj = client.create_object_with_metadata(server.service_url, md)
+        # the URL is taken from the document given
+        status = client.get_object(obj.location)
+        assert client.get_metadata(status).data == md.data
@@ -0,0 +1,198 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.packaging import SWORDBagIt, ZipStream, ZipEntry
+from sword3client.packaging.prepare import prepare_entry, remove_temporary_file
+from sword3client.packaging.zipstream import DEFLATED
+from sword3client.lib import paths
+
+from sword3common import Metadata, constants
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer
+
+from io import BytesIO
+import json
+import zipfile
+import hashlib
+import base64
+import os
+import zlib
+import tempfile
+
+
+class TestPackaging(TestCase):
+    def test_01_zip_stream_content_length(self):
+        zs = ZipStream([
+            ZipEntry.from_bytes("one.txt", b"hello"),
+            ZipEntry.from_bytes("dir/two.txt", b"world" * 1000),
+            ZipEntry.from_bytes("ünïcode.txt", b""),
+        ])
+        data = zs.open().read()
+        assert zs.content_length == len(data)
+
+        z = zipfile.ZipFile(BytesIO(data))
+        assert z.testzip() is None
+        assert z.read("one.txt") == b"hello"
+        assert z.read("dir/two.txt") == b"world" * 1000
+        assert z.read("ünïcode.txt") == b""
+
+    def test_02_zip_stream_compressed(self):
+        entry = ZipEntry.from_bytes("big.txt", b"abc" * 100000, compress_type=zipfile.ZIP_DEFLATED)
+        zs = ZipStream([entry])
+        assert zs.content_length is None
+
+        data = b"".join(zs)
+        assert len(data) < 300000
+        z = zipfile.ZipFile(BytesIO(data))
+        assert z.testzip() is None
+        assert z.read("big.txt") == b"abc" * 100000
+
+    def test_03_bagit_package(self):
+        metadata = Metadata()
+        metadata.add_dc_field("creator", "Test")
+
+        bag = SWORDBagIt(metadata)
+        example = paths.rel2abs(__file__, "..", "resources", "SWORDBagIt.zip")
+        bag.add_file(example)
+        bag.add_bytes(b"Hello\n", "hello.txt")
+
+        stream = bag.stream()
+        data = b""
+        while True:
+            chunk = stream.read(1000)
+            if not chunk:
+                break
+            data += chunk
+
+        assert bag.content_length == len(data)
+        expected = base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+        assert bag.digest() == {constants.DIGEST_SHA_256: expected}
+
+        z = zipfile.ZipFile(BytesIO(data))
+        assert z.testzip() is None
+        assert json.loads(z.read("metadata/sword.json")) == metadata.data
+        assert z.read("data/hello.txt") == b"Hello\n"
+
+        manifest = z.read("manifest-sha256.txt").decode("utf-8").splitlines()
+        assert manifest == [
+            paths.sha256(example).hexdigest() + "  data/SWORDBagIt.zip",
+            hashlib.sha256(b"Hello\n").hexdigest() + "  data/hello.txt",
+        ]
+
+        tags = dict(reversed(line.split("  ")) for line in z.read("tagmanifest-sha256.txt").decode("utf-8").splitlines())
+        for name in ["bagit.txt", "bag-info.txt", "metadata/sword.json", "manifest-sha256.txt"]:
+            assert tags[name] == hashlib.sha256(z.read(name)).hexdigest()
+
+        info = z.read("bag-info.txt").decode("utf-8")
+        assert "Payload-Oxum: {x}.2".format(x=z.getinfo("data/SWORDBagIt.zip").file_size + 6) in info
+
+    def test_04_bagit_compressed(self):
+        bag = SWORDBagIt(compress=True)
+        bag.add_bytes(b"0123456789" * 10000, "numbers.txt")
+        assert bag.content_length is None
+
+        data = bag.stream().read()
+        z = zipfile.ZipFile(BytesIO(data))
+        assert z.testzip() is None
+        assert z.getinfo("data/numbers.txt").compress_type == zipfile.ZIP_DEFLATED
+
+    def test_05_create_object_with_package(self):
+        SD_URL = "http://example.com/service-document"
+        BODY = json.dumps(StatusFixtureFactory.status_document())
+        HEADERS = {"Location": "http://example.com/location"}
+
+        client = SWORD3Client(http=MockHttpLayer(201, BODY, HEADERS))
+
+        bag = SWORDBagIt()
+        bag.add_bytes(b"some data", "data.bin")
+        dr = client.create_object_with_package(
+            SD_URL,
+            bag.stream(),
+            "package.zip",
+            bag.digest(),
+            content_length=bag.content_length,
+            content_type=bag.content_type,
+            packaging=bag.packaging,
+        )
+        assert dr.status_code == 201
+
+    def test_06_parallel_matches_sequential(self):
+        example = paths.rel2abs(__file__, "..", "resources", "SWORDBagIt.zip")
+
+        def build(workers):
+            bag = SWORDBagIt(workers=workers)
+            bag._created = (2020, 1, 1, 0, 0, 0, 0, 0, 0)
+            bag.add_file(example)
+            bag.add_bytes(b"Hello\n", "hello.txt")
+            return bag
+
+        sequential = build(None)
+        parallel = build(2)
+        data = parallel.stream().read()
+        assert data == sequential.stream().read()
+        assert parallel.content_length == len(data)
+
+    def test_07_parallel_compression(self):
+        example = paths.rel2abs(__file__, "..", "resources", "SWORDBagIt.zip")
+
+        bag = SWORDBagIt(compress=True, workers=2)
+        bag.add_file(example)
+        bag.add_bytes(b"0123456789" * 10000, "numbers.txt")
+        bag.add_bytes(hashlib.sha256(b"a").digest() + hashlib.sha256(b"b").digest(), "random.bin")
+
+        data = bag.stream().read()
+        expected = base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+        assert bag.digest() == {constants.DIGEST_SHA_256: expected}
+
+        z = zipfile.ZipFile(BytesIO(data))
+        assert z.testzip() is None
+        # already compressed by extension, and incompressible content, are both stored
+        assert z.getinfo("data/SWORDBagIt.zip").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("data/random.bin").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("data/numbers.txt").compress_type == zipfile.ZIP_DEFLATED
+
+        manifest = z.read("manifest-sha256.txt").decode("utf-8").splitlines()
+        assert manifest[1] == hashlib.sha256(b"0123456789" * 10000).hexdigest() + "  data/numbers.txt"
+
+    def test_08_large_entries_spool_to_disk(self):
+        # hex compresses to about half its size
+        text = os.urandom(1500000).hex().encode("ascii")
+
+        result = prepare_entry(text, DEFLATED, ["sha256"], inline_limit=1000)
+        assert result["data"] is None
+        with open(result["path"], "rb") as f:
+            deflated = f.read()
+        assert len(deflated) == result["compressed_size"]
+        assert zlib.decompress(deflated, -15) == text
+        remove_temporary_file(result["path"])
+
+        bag = SWORDBagIt(compress=True, workers=2)
+        bag.add_bytes(text, "hex.txt")
+        digest = bag.digest()
+        assert len(bag._temporary) == 1
+        path = bag._temporary[0]
+
+        # streamed again from what the digest prepared, without compressing it again
+        data = bag.stream().read()
+        assert bag._temporary == [path]
+        assert {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")} == digest
+        assert zipfile.ZipFile(BytesIO(data)).read("data/hex.txt") == text
+
+        bag.close()
+        assert not os.path.exists(path)
+
+    def test_09_changed_after_prepare(self):
+        # stored, and too large to be passed back, so read again from the file when it is streamed
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"a" * 2000000)
+
+        bag = SWORDBagIt(workers=2)
+        bag.add_file(path, "data.bin")
+        bag.digest()
+        with open(path, "r+b") as f:
+            f.write(b"b")
+        with self.assertRaises(ValueError):
+            bag.stream().read()
@@ -0,0 +1,101 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.poller import ObjectPoller
+
+from sword3common import StatusDocument, constants, exceptions
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+import json
+import time
+
+OBJ_URL = "http://example.com/object/1"
+FILE_URL = "http://example.com/object/1/files/data.csv"
+
+
+def status(file_state, etag="1"):
+    links = [{"@id": FILE_URL, "rel": [constants.Rel.FileSetFile], "status": file_state}]
+    data = StatusFixtureFactory.status_document(links)
+    data["eTag"] = etag
+    return data
+
+
+def ingested(s: StatusDocument):
+    return all(l.get("status") == constants.FileState.Ingested for l in s.links if l.get("status") is not None)
+
+
+class TestPoller(TestCase):
+    def test_01_conditional_get_object(self):
+        http = MockRoutingHttpLayer(get=MockHttpLayer(304))
+        client = SWORD3Client(http=http)
+        assert client.get_object(OBJ_URL, if_none_match="1") is None
+        assert http.calls("get")[0][3] == {"If-None-Match": "1"}
+
+    def test_02_resolves_on_change(self):
+        # unchanged (304) twice, then the file is ingested
+        responses = [
+            MockHttpLayer(304),
+            MockHttpLayer(304),
+            MockHttpLayer(200, json.dumps(status(constants.FileState.Ingested, etag="2"))),
+        ]
+        http = MockRoutingHttpLayer(get=lambda url, body: responses.pop(0) if len(responses) > 1 else responses[0])
+        client = SWORD3Client(http=http)
+
+        changes = []
+        with ObjectPoller(client, interval=0.01, max_interval=0.05) as poller:
+            start = StatusDocument(status(constants.FileState.Pending))
+            future = poller.watch(start, on_change=changes.append, until=ingested)
+            result = future.result(timeout=5)
+
+        assert ingested(result)
+        assert len(changes) == 1
+        calls = http.calls("get")
+        assert len(calls) == 3
+        assert all(c[3] == {"If-None-Match": "1"} for c in calls)
+        assert len(poller) == 0
+
+    def test_03_backoff(self):
+        http = MockRoutingHttpLayer(get=MockHttpLayer(200, json.dumps(status(constants.FileState.Pending))))
+        client = SWORD3Client(http=http)
+        poller = ObjectPoller(client, interval=0.01, max_interval=0.04, conditional=False)
+        poller.watch(OBJ_URL)
+        poller.start()
+        time.sleep(0.4)
+        poller.stop()
+
+        # with no backoff there would be ~40 requests; intervals of 0.01, 0.02, 0.04, 0.04, ... give ~10
+        calls = http.calls("get")
+        assert 3 <= len(calls) <= 15
+        assert all(c[3] is None for c in calls)
+
+    def test_04_not_found(self):
+        http = MockRoutingHttpLayer(get=MockHttpLayer(404))
+        client = SWORD3Client(http=http)
+        with ObjectPoller(client) as poller:
+            future = poller.watch(OBJ_URL)
+            with self.assertRaises(exceptions.NotFound):
+                future.result(timeout=5)
+
+    def test_05_errors(self):
+        # a server error is retried, up to max_failures times in a row
+        responses = [MockHttpLayer(503), MockHttpLayer(502), MockHttpLayer(200, json.dumps(status("x", etag="2")))]
+        http = MockRoutingHttpLayer(get=lambda url, body: responses.pop(0) if len(responses) > 1 else responses[0])
+        client = SWORD3Client(http=http)
+        with ObjectPoller(client, interval=0.01, max_interval=0.02, max_failures=3) as poller:
+            result = poller.watch(StatusDocument(status(constants.FileState.Pending))).result(timeout=5)
+            assert result.links[0]["status"] == "x"
+
+            client.set_http_layer(MockRoutingHttpLayer(get=MockHttpLayer(500)))
+            future = poller.watch(OBJ_URL)
+            with self.assertRaises(exceptions.UnexpectedSwordException):
+                future.result(timeout=5)
+            assert len(client._http.calls("get")) == 3
+
+            # a 401 is not
+            client.set_http_layer(MockRoutingHttpLayer(get=MockHttpLayer(401)))
+            future = poller.watch(OBJ_URL)
+            with self.assertRaises(exceptions.NoCredentialsSupplied):
+                future.result(timeout=5)
+            assert len(client._http.calls("get")) == 1
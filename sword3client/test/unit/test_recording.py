@@ -0,0 +1,113 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.connection.connection_netem import NetworkEmulationHttpLayer
+from sword3client.connection.connection_recording import RecordingHttpLayer, ReplayHttpLayer, Cassette
+from sword3client.lib import paths
+
+from sword3common import Metadata, constants, exceptions
+
+from io import BytesIO
+import os
+import time
+import base64
+import hashlib
+
+
+def sha256(data):
+    return {constants.DIGEST_SHA_256: base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")}
+
+
+def flow(client, service_url):
+    """A deposit, returning what the client saw"""
+    md = Metadata()
+    md.add_dc_field("title", "recorded")
+    obj = client.create_object_with_metadata(service_url, md).location
+    data = b"recorded data"
+    file_url = client.add_binary(obj, BytesIO(data), "data.txt", sha256(data)).location
+    client.add_binary(obj, BytesIO(data), "copy.txt", sha256(data))
+    with client.get_file(file_url) as stream:
+        content = stream.read()
+    status = client.get_object(obj)
+    return obj, file_url, content, [l["@id"] for l in status.links]
+
+
+class TestRecording(TestCase):
+    def setUp(self) -> None:
+        self.tmpFiles = []
+
+    def tearDown(self) -> None:
+        for tmpFile in self.tmpFiles:
+            path = paths.rel2abs(__file__, "..", "tmp", tmpFile)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_01_record_and_replay(self):
+        filename = "test_recording.test_01_record_and_replay.json"
+        path = paths.rel2abs(__file__, "..", "tmp", filename)
+        self.tmpFiles.append(filename)
+
+        server = SWORDServer()
+        recorder = RecordingHttpLayer(MemoryHttpLayer(server))
+        recorded = flow(SWORD3Client(http=recorder), server.service_url)
+        recorder.save(path)
+
+        cassette = Cassette.load(path)
+        assert len(cassette) == 5
+        assert cassette.interactions[1]["request"]["size"] == len(b"recorded data")
+        # the two uploads of the same content, and the download of it, share one stored body
+        assert cassette.body(hashlib.sha256(b"recorded data").hexdigest()) == b"recorded data"
+
+        replay = ReplayHttpLayer(path)
+        replayed = flow(SWORD3Client(http=replay), server.service_url)
+        assert replayed == recorded
+        assert replay.remaining == 0
+
+        with self.assertRaises(LookupError):
+            SWORD3Client(http=replay).get_object(recorded[0])
+
+    def test_02_errors_replayed(self):
+        server = SWORDServer()
+        recorder = RecordingHttpLayer(MemoryHttpLayer(server))
+        with self.assertRaises(exceptions.NotFound):
+            SWORD3Client(http=recorder).get_object(server.base_url + "/objects/1")
+
+        with self.assertRaises(exceptions.NotFound):
+            SWORD3Client(http=ReplayHttpLayer(recorder.cassette)).get_object(server.base_url + "/objects/1")
+
+    def test_03_timing(self):
+        server = SWORDServer()
+        recorder = RecordingHttpLayer(NetworkEmulationHttpLayer(MemoryHttpLayer(server), latency=0.05))
+        SWORD3Client(http=recorder).get_service(server.service_url)
+        assert recorder.cassette.interactions[0]["duration"] >= 0.05
+
+        start = time.monotonic()
+        SWORD3Client(http=ReplayHttpLayer(recorder.cassette, timing="original")).get_service(server.service_url)
+        assert time.monotonic() - start >= 0.05
+
+        start = time.monotonic()
+        SWORD3Client(http=ReplayHttpLayer(recorder.cassette)).get_service(server.service_url)
+        assert time.monotonic() - start < 0.05
+
+        # the gap between requests is replayed too, and doubled at half speed
+        time.sleep(0.1)
+        SWORD3Client(http=recorder).get_service(server.service_url)
+        client = SWORD3Client(http=ReplayHttpLayer(recorder.cassette, timing="original", speed=0.5))
+        start = time.monotonic()
+        client.get_service(server.service_url)
+        client.get_service(server.service_url)
+        # ~0.1 latency, 0.2 gap, 0.1 latency
+        assert 0.38 <= time.monotonic() - start < 0.6
+
+    def test_04_binary_response(self):
+        # a response which isn't streamed is recorded as the bytes received, even when they aren't text
+        server = SWORDServer()
+        data = bytes(range(256))
+        status = SWORD3Client(http=MemoryHttpLayer(server)).create_object_with_binary(
+            server.service_url, BytesIO(data), "data.bin", sha256(data)).status_document
+        file_url = status.links[0]["@id"]
+
+        recorder = RecordingHttpLayer(MemoryHttpLayer(server))
+        assert recorder.get(file_url).content == data
+        assert ReplayHttpLayer(recorder.cassette).get(file_url).content == data
@@ -0,0 +1,145 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.lib import paths
+
+from sword3common import StatusDocument, constants
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer, MockRoutingHttpLayer
+
+import os
+import json
+import shutil
+
+OBJ_URL = "http://example.com/object/1"
+
+
+def status_with_files(urls):
+    links = [{"@id": url, "rel": [constants.Rel.FileSetFile], "contentType": "text/plain"} for url in urls]
+    return StatusDocument(StatusFixtureFactory.status_document(links))
+
+
+def file_location(url, body):
+    location = OBJ_URL + "/files/" + os.path.basename(body.name)
+    return MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document()), {"Location": location})
+
+
+class TestSync(TestCase):
+    def setUp(self) -> None:
+        self.dir = paths.rel2abs(__file__, "..", "tmp", "test_sync")
+        os.makedirs(os.path.join(self.dir, "sub"))
+        self._write("a.txt", "first")
+        self._write("sub/b.txt", "second")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dir)
+
+    def _write(self, rel, content):
+        with open(os.path.join(self.dir, *rel.split("/")), "w") as f:
+            f.write(content)
+
+    def _http(self):
+        return MockRoutingHttpLayer(
+            post=file_location,
+            put=MockHttpLayer(204),
+            delete=MockHttpLayer(204)
+        )
+
+    def test_01_initial_sync(self):
+        http = self._http()
+        client = SWORD3Client(http=http)
+        result = client.sync_directory(self.dir, status_with_files([]))
+
+        assert result.ok
+        assert sorted(result.added) == ["a.txt", "sub/b.txt"]
+        assert len(http.calls("post")) == 2
+        assert len(http.calls("put")) == 0
+
+        with open(os.path.join(self.dir, ".sword3sync.json")) as f:
+            state = json.load(f)
+        assert state["files"]["a.txt"]["url"] == OBJ_URL + "/files/a.txt"
+
+    def test_02_incremental_sync(self):
+        client = SWORD3Client(http=self._http())
+        client.sync_directory(self.dir, status_with_files([]))
+        remote = status_with_files([OBJ_URL + "/files/a.txt", OBJ_URL + "/files/b.txt"])
+
+        # nothing has changed, so nothing is sent
+        http = self._http()
+        client.set_http_layer(http)
+        result = client.sync_directory(self.dir, remote)
+        assert sorted(result.unchanged) == ["a.txt", "sub/b.txt"]
+        assert http.requests == []
+
+        # change one, delete one, and add one
+        self._write("a.txt", "changed")
+        os.remove(os.path.join(self.dir, "sub", "b.txt"))
+        self._write("c.txt", "third")
+
+        http = self._http()
+        client.set_http_layer(http)
+        result = client.sync_directory(self.dir, remote)
+
+        assert result.ok
+        assert result.replaced == ["a.txt"]
+        assert result.deleted == ["sub/b.txt"]
+        assert result.added == ["c.txt"]
+        assert [r[1] for r in http.calls("put")] == [OBJ_URL + "/files/a.txt"]
+        assert [r[1] for r in http.calls("delete")] == [OBJ_URL + "/files/b.txt"]
+        assert [r[1] for r in http.calls("post")] == [OBJ_URL]
+
+    def test_03_sync_by_object_url(self):
+        http = self._http()
+        http.routes["get"] = MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document()))
+        client = SWORD3Client(http=http)
+        result = client.sync_directory(self.dir, OBJ_URL)
+
+        assert result.ok
+        assert len(http.calls("get")) == 1
+        assert len(result.added) == 2
+
+    def test_04_fresh_working_copy(self):
+        # a working copy with no state file replaces the files with the same names, rather than adding them again
+        http = self._http()
+        client = SWORD3Client(http=http)
+        remote = status_with_files([OBJ_URL + "/files/a.txt", OBJ_URL + "/files/b.txt", OBJ_URL + "/files/c.txt"])
+        result = client.sync_directory(self.dir, remote)
+
+        assert result.ok
+        assert sorted(result.replaced) == ["a.txt", "sub/b.txt"]
+        assert http.calls("post") == []
+        assert sorted(r[1] for r in http.calls("put")) == [OBJ_URL + "/files/a.txt", OBJ_URL + "/files/b.txt"]
+
+        with open(os.path.join(self.dir, ".sword3sync.json")) as f:
+            state = json.load(f)
+        assert state["files"]["sub/b.txt"]["url"] == OBJ_URL + "/files/b.txt"
+
+    def test_05_location_is_the_object(self):
+        # the server only gives the object's URL, so the new file is found in the Status Document
+        def object_location(url, body):
+            name = os.path.basename(body.name)
+            doc = StatusFixtureFactory.status_document([
+                {"@id": OBJ_URL + "/files/old.txt", "rel": [constants.Rel.FileSetFile]},
+                {"@id": OBJ_URL + "/files/" + name, "rel": [constants.Rel.FileSetFile]},
+            ])
+            return MockHttpLayer(200, json.dumps(doc), {"Location": OBJ_URL})
+
+        http = MockRoutingHttpLayer(post=object_location)
+        client = SWORD3Client(http=http)
+        result = client.sync_directory(self.dir, status_with_files([OBJ_URL + "/files/old.txt"]), max_workers=1)
+        assert result.ok
+        assert sorted(result.added) == ["a.txt", "sub/b.txt"]
+
+        with open(os.path.join(self.dir, ".sword3sync.json")) as f:
+            state = json.load(f)
+        assert state["files"]["a.txt"]["url"] == OBJ_URL + "/files/a.txt"
+        assert state["files"]["sub/b.txt"]["url"] == OBJ_URL + "/files/b.txt"
+
+        # and if it isn't there either, that's an error, rather than a file which is silently forgotten
+        os.remove(os.path.join(self.dir, ".sword3sync.json"))
+        http.routes["post"] = MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document()),
+                                            {"Location": OBJ_URL})
+        result = client.sync_directory(self.dir, status_with_files([]))
+        assert not result.ok
+        assert sorted(result.errors) == ["a.txt", "sub/b.txt"]
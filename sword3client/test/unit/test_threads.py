@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.bench import BenchServer
+from sword3client.connection.connection_memory import SWORDServer, MemoryHttpLayer
+from sword3client.connection.connection_requests import RequestsHttpLayer
+from sword3client.instrumentation import InstrumentedHttpLayer, START
+
+from sword3common import Metadata, exceptions
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def metadata(title):
+    md = Metadata()
+    md.add_dc_field("title", title)
+    return md
+
+
+class TestThreads(TestCase):
+    def test_01_using(self):
+        default, other = SWORDServer(), SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(default))
+
+        with client.using(MemoryHttpLayer(other)) as c:
+            assert c is client
+            obj = client.create_object_with_metadata(other.service_url, metadata("other")).location
+            with client.using(MemoryHttpLayer(default)):
+                with self.assertRaises(exceptions.NotFound):
+                    client.get_object(obj)
+            assert client.get_object(obj).object_url == obj
+
+            # another thread sharing the client doesn't see the override
+            with ThreadPoolExecutor(1) as pool:
+                with self.assertRaises(exceptions.NotFound):
+                    pool.submit(client.get_object, obj).result()
+
+        with self.assertRaises(exceptions.NotFound):
+            client.get_object(obj)
+        assert len(other) == 1
+        assert len(default) == 0
+
+    def test_02_using_per_thread(self):
+        servers = [SWORDServer() for _ in range(4)]
+        client = SWORD3Client(http=MemoryHttpLayer())
+        events = []
+        client.add_listener(events.append)
+
+        def work(i):
+            with client.using(MemoryHttpLayer(servers[i % 4])):
+                assert isinstance(client._http, InstrumentedHttpLayer)
+                obj = client.create_object_with_metadata(servers[i % 4].service_url, metadata(str(i))).location
+                return client.get_object(obj).object_url
+
+        with ThreadPoolExecutor(8) as pool:
+            urls = list(pool.map(work, range(40)))
+
+        assert len(set(urls)) == 10
+        assert [len(s) for s in servers] == [10, 10, 10, 10]
+        assert len([e for e in events if e.event == START]) == 80
+
+    def test_03_shared_listeners(self):
+        server = SWORDServer()
+        client = SWORD3Client(http=MemoryHttpLayer(server))
+        obj = client.create_object_with_metadata(server.service_url, metadata("shared")).location
+
+        def work(i):
+            listener = lambda event: None
+            client.add_listener(listener)
+            client.get_object(obj)
+            client.remove_listener(listener)
+            return client.get_object(obj).object_url
+
+        with ThreadPoolExecutor(8) as pool:
+            assert set(pool.map(work, range(100))) == {obj}
+
+        assert client._listeners == ()
+        assert isinstance(client._http, MemoryHttpLayer)
+
+    def test_04_pooled_requests_layer(self):
+        with BenchServer() as server:
+            http = RequestsHttpLayer(headers={"X-Test": "yes"}, pool_maxsize=4)
+            client = SWORD3Client(http=http)
+
+            def work(i):
+                return client.create_object_with_metadata(server.service_url, metadata(str(i))).location
+
+            with ThreadPoolExecutor(4) as pool:
+                locations = list(pool.map(work, range(20)))
+            http.close()
+
+        assert len(set(locations)) == 20
+        headers = {"Accept": "application/json"}
+        assert http._get_headers(headers) == {"Accept": "application/json", "X-Test": "yes"}
+        assert headers == {"Accept": "application/json"}
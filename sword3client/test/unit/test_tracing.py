@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from sword3client import SWORD3Client
+from sword3client.tracing import Tracer
+from sword3client.lib import paths
+
+from sword3common import Metadata
+from sword3common.test.fixtures import StatusFixtureFactory
+
+from sword3client.test.mocks.connection import MockHttpLayer
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import json
+
+OBJ_URL = "http://example.com/object/1"
+
+
+class TestTracing(TestCase):
+    def setUp(self) -> None:
+        self.tmpFiles = []
+
+    def tearDown(self) -> None:
+        for tmpFile in self.tmpFiles:
+            path = paths.rel2abs(__file__, "..", "tmp", tmpFile)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_01_nested_spans(self):
+        client = SWORD3Client(http=MockHttpLayer(200, json.dumps(StatusFixtureFactory.status_document())))
+        tracer = Tracer()
+        tracer.attach(client)
+        metadata = Metadata()
+        metadata.add_dc_field("title", "The title")
+        client.append_metadata(OBJ_URL, metadata)
+
+        spans = {e["name"]: e for e in tracer.trace_events() if e["ph"] == "X"}
+        assert set(spans.keys()) == {"append_metadata", "serialise", "digest", "transfer", "parse"}
+        op = spans["append_metadata"]
+        for name in ["serialise", "digest", "transfer", "parse"]:
+            assert spans[name]["ts"] >= op["ts"]
+            assert spans[name]["ts"] + spans[name]["dur"] <= op["ts"] + op["dur"] + 0.001
+        assert spans["transfer"]["args"]["status"] == 200
+        assert op["args"]["url"] == OBJ_URL
+
+    def test_02_threads_and_buffer(self):
+        client = SWORD3Client(http=MockHttpLayer(204))
+        tracer = Tracer(max_events=50)
+        tracer.attach(client)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: client.delete_file(OBJ_URL + "/files/" + str(i)), range(100)))
+
+        # each delete is an operation, a transfer and a parse
+        assert len(tracer) == 50
+        assert tracer.dropped == 250
+        names = [e for e in tracer.trace_events() if e["ph"] == "M"]
+        assert len(names) >= 1
+
+    def test_03_write(self):
+        filename = "test_tracing.test_03_write.json"
+        path = paths.rel2abs(__file__, "..", "tmp", filename)
+        self.tmpFiles.append(filename)
+
+        tracer = Tracer()
+        with tracer.span("bulk run", files=3):
+            with tracer.span("hash files"):
+                pass
+        tracer.write(path)
+
+        with open(path) as f:
+            trace = json.load(f)
+        spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert [s["name"] for s in spans] == ["hash files", "bulk run"]
+        assert spans[1]["args"] == {"files": 3}
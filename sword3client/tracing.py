@@ -0,0 +1,134 @@
+from sword3client import instrumentation
+
+from collections import deque
+
+import os
+import json
+import time
+import typing
+import threading
+import contextlib
+
+TRANSFER = "transfer"
+PARSE = "parse"
+
+
+class Tracer(object):
+    """Records a timeline of spans, to be viewed in chrome://tracing or Perfetto.
+
+    Attached to a client as an instrumentation listener, it records a span for every protocol operation, nested
+    within which are spans for its ``digest`` and ``serialise`` phases, the ``transfer`` of each request (from
+    the request being handed to the HTTP layer to the response arriving) and the ``parse`` of the response.  Each
+    span is on the timeline of the thread it happened on, so concurrent operations appear side by side.  Your own
+    work can be added to the timeline with :meth:`span`.
+
+    At most ``max_events`` spans are kept; once the buffer is full the oldest are dropped."""
+
+    def __init__(self, max_events: int = 100000):
+        self._events = deque(maxlen=max_events)
+        self._threads = {}  # type: typing.Dict[int, str]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.monotonic()
+        self._pid = os.getpid()
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def attach(self, client):
+        client.add_listener(self)
+
+    def detach(self, client):
+        client.remove_listener(self)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "user", **args):
+        """Record the enclosed code as a span.  Keyword arguments are shown with the span in the viewer"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(name, category, start, time.monotonic(), args)
+
+    def __call__(self, event: instrumentation.InstrumentationEvent):
+        stack = self._stack()
+        kind = event.event
+        if kind == instrumentation.START:
+            stack.append((event.operation, "operation", event.timestamp))
+        elif kind == instrumentation.PHASE_START:
+            stack.append((event.phase, "phase", event.timestamp))
+        elif kind == instrumentation.PHASE_END:
+            self._close(stack, event.phase, event.timestamp)
+        elif kind == instrumentation.HEADERS_BUILT:
+            self._close(stack, PARSE, event.timestamp)
+            stack.append((TRANSFER, "transfer", event.timestamp))
+        elif kind == instrumentation.RESPONSE_RECEIVED:
+            self._close(stack, TRANSFER, event.timestamp, {"url": event.url, "status": event.status_code})
+            stack.append((PARSE, "phase", event.timestamp))
+        elif kind == instrumentation.PARSED or kind == instrumentation.ERROR:
+            self._close(stack, TRANSFER, event.timestamp)
+            self._close(stack, PARSE, event.timestamp)
+            args = {
+                "url": event.url,
+                "status": event.status_code,
+                "bytes_sent": event.bytes_sent,
+                "bytes_received": event.bytes_received,
+            }
+            if event.error is not None:
+                args["error"] = repr(event.error)
+            self._close(stack, event.operation, event.timestamp, args)
+
+    def trace_events(self) -> typing.List[dict]:
+        """The recorded spans as Chrome trace events, preceded by the names of the threads they were on"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        return names + events
+
+    def write(self, path: str):
+        """Write the trace as a Chrome trace-event JSON file"""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self.dropped = 0
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    def _close(self, stack, name, end, args=None):
+        if len(stack) == 0 or stack[-1][0] != name:
+            return
+        name, category, start = stack.pop()
+        self._record(name, category, start, end, args)
+
+    def _record(self, name, category, start, end, args):
+        tid = threading.get_ident()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self._pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)